@@ -1,5 +1,5 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import fastf1 as ff1
 import threading
 from datetime import datetime
@@ -13,7 +13,27 @@ from pathlib import Path
 # Importa i moduli delle analisi e il nuovo cursore interattivo
 from .modules.box_plot import create_plot as create_box_plot
 from .modules.telemetry_comparison import create_plot as create_telemetry_plot
-from .modules.interactive_cursor import InteractiveCursor
+from .modules.lap_prediction import create_plot as create_prediction_plot
+from .modules.race_pace import create_plot as create_race_pace_plot
+from .modules.tyre_strategy import create_plot as create_strategy_plot
+from .modules.race_gaps import create_plot as create_race_gaps_plot
+from .modules.weather import create_plot as create_weather_plot, ensure_weather
+from .modules.circuit_comparison import create_plot as create_circuit_comparison_plot
+from .modules.season_pace import create_plot as create_season_pace_plot
+from .modules.delta_matrix import create_plot as create_delta_matrix_plot, create_pair_plot
+from .modules.live_replay import LiveReplay
+from .modules.export import (FIGURE_FORMATS, delta_matrix_frame, export_figure, export_frame,
+                             export_telemetry_frames, race_evolution_frame)
+from .modules.box_plot import draw_steps as draw_box_plot_steps, filter_laps
+from .modules.race_pace import stint_degradation
+from .modules.tyre_strategy import stint_table
+from .modules.weather import laps_with_weather
+from .modules.sector_ranking import create_table as create_sector_table, COLUMN_LABELS, format_value, sort_orders
+from .modules.interactive_cursor import InteractiveCursor, RaceGapCursor, DeltaMatrixSelector
+from .modules.memory_tracker import memory_tracker
+from .modules.lap_table import lap_table
+from .modules.cache_manager import cache_manager
+from .config import MEMORY_REFRESH_MS, LOAD_STAGES, REPLAY_SPEED, REPLAY_REFRESH_MS
 
 # --- NUOVO BLOCCO PER L'ICONA SULLA BARRA DELLE APPLICAZIONI (SOLO PER WINDOWS) ---
 try:
@@ -60,9 +80,40 @@ class F1AnalyzerApp:
         self.loaded_session_details = None
         self.driver_list = []
         self.loading_thread = None
+        self.loaded_stage = None
         self.analysis_functions = {
             "Lap Time Distribution (Box Plot)": create_box_plot,
             "Telemetry Comparison": create_telemetry_plot,
+            "Predicted vs Actual Lap Time": create_prediction_plot,
+            "Race Pace & Tyre Degradation": create_race_pace_plot,
+            "Tyre Strategy": create_strategy_plot,
+            "Race Gaps & Positions": create_race_gaps_plot,
+            "Ideal Lap & Sector Ranking": create_sector_table,
+            "Lap Time vs Weather": create_weather_plot,
+            "Cross-Season Circuit Comparison": create_circuit_comparison_plot,
+            "Season Pace Distribution": create_season_pace_plot,
+            "All-Pairs Delta Matrix": create_delta_matrix_plot,
+        }
+        # Analisi che richiedono il meteo: viene caricato solo quando ne viene scelta una
+        self.weather_analyses = {"Lap Time vs Weather"}
+        # Quanti piloti chiede ciascuna analisi (le altre lavorano sull'intera sessione)
+        self.analysis_driver_count = {
+            "Telemetry Comparison": 2,
+            "Race Gaps & Positions": 1,
+        }
+        # Fase di caricamento minima per ciascuna analisi (le altre richiedono i giri)
+        self.analysis_stage = {
+            "Telemetry Comparison": 'telemetry',
+            "Cross-Season Circuit Comparison": 'telemetry',
+            "All-Pairs Delta Matrix": 'telemetry',
+            "Season Pace Distribution": 'results',
+        }
+        # Dati esportabili delle analisi che non li tengono già a schermo (vedi _export_data_thread)
+        self.analysis_data = {
+            "Lap Time Distribution (Box Plot)": filter_laps,
+            "Race Pace & Tyre Degradation": stint_degradation,
+            "Tyre Strategy": lambda session: stint_table(lap_table(session).frame),
+            "Lap Time vs Weather": laps_with_weather,
         }
 
         # Stile UI
@@ -101,7 +152,7 @@ class F1AnalyzerApp:
         # FRAME CONTROLLI ANALISI
         self.analysis_options_frame = ttk.Frame(root, padding="10 10 10 20")
         self.analysis_options_frame.pack(side="top", fill="x")
-        self.analysis_options_frame.grid_columnconfigure((0, 5), weight=1)
+        self.analysis_options_frame.grid_columnconfigure((0, 9), weight=1)
 
         ttk.Label(self.analysis_options_frame, text="Analisi:").grid(row=0, column=1, sticky="w")
         self.analysis_var = tk.StringVar()
@@ -115,47 +166,107 @@ class F1AnalyzerApp:
         self.driver2_label = ttk.Label(self.analysis_options_frame, text="Pilota 2:")
         self.driver2_var = tk.StringVar()
         self.driver2_combo = ttk.Combobox(self.analysis_options_frame, textvariable=self.driver2_var, state="disabled", width=10)
+        self.compare_year_label = ttk.Label(self.analysis_options_frame, text="Anno confronto:")
+        self.compare_year_var = tk.IntVar(value=datetime.now().year - 1)
+        self.compare_year_spinbox = ttk.Spinbox(self.analysis_options_frame, from_=2018, to=datetime.now().year, textvariable=self.compare_year_var, width=8)
         
         self.analyze_button = ttk.Button(self.analysis_options_frame, text="Genera Analisi", command=self.start_analysis_thread, state='disabled')
         self.analyze_button.grid(row=0, column=4, padx=20, sticky="ew")
+
+        # Replay di una registrazione del live timing, indipendente dalla sessione caricata
+        self.export_button = ttk.Button(self.analysis_options_frame, text="Esporta...", command=self.export_current)
+        self.export_button.grid(row=0, column=5, padx=10, sticky="ew")
+
+        ttk.Label(self.analysis_options_frame, text="Velocità replay:").grid(row=0, column=6, sticky="w")
+        self.replay_speed_var = tk.DoubleVar(value=REPLAY_SPEED)
+        ttk.Spinbox(self.analysis_options_frame, values=(0.5, 1, 2, 5, 10, 20), textvariable=self.replay_speed_var, width=5).grid(row=0, column=7, padx=5, sticky="ew")
+        ttk.Button(self.analysis_options_frame, text="Replay Live...", command=self.start_replay).grid(row=0, column=8, padx=10, sticky="ew")
         
         # BARRA DI STATO, FRAME GRAFICO E VARIABILI INTERATTIVE
+        status_frame = ttk.Frame(root)
+        status_frame.pack(side="bottom", fill="x")
         self.status_var = tk.StringVar(value="Benvenuto! Seleziona un anno per iniziare.")
-        ttk.Label(root, textvariable=self.status_var, relief="sunken", anchor="w", font=('Calibri', 11), padding=5).pack(side="bottom", fill="x")
+        ttk.Label(status_frame, textvariable=self.status_var, relief="sunken", anchor="w", font=('Calibri', 11), padding=5).pack(side="left", fill="x", expand=True)
+        self.memory_var = tk.StringVar()
+        ttk.Label(status_frame, textvariable=self.memory_var, relief="sunken", anchor="e", font=('Calibri', 11), padding=5).pack(side="right")
         
         self.plot_frame = ttk.Frame(root)
         self.plot_frame.pack(side="top", fill="both", expand=True, padx=10, pady=10)
         self.canvas = None
+        self.table_frame = None
+        self.current_table = None
         
         self.current_fig = None
         self.interactive_cursor = None
         self.interactive_data = None
+        self.interactive_kind = None
         self.driver_codes = None
+        # Analisi del grafico mostrato, con i suoi dati interattivi: è ciò che esporta "Esporta"
+        self.displayed = None
+        # Box plot in costruzione nel thread Tk, una riga di piloti per callback
+        self.drawing_steps = None
+        self.replay = None
 
         # COLLEGAMENTO EVENTI
         self.event_var.trace_add("write", self.on_event_change)
         self.session_var.trace_add("write", self.on_session_change)
         self.analysis_var.trace_add("write", self.on_analysis_selected)
         
+        # La prima attivazione scorre tutta la cartella di cache: fuori dal thread Tk
+        threading.Thread(target=self._enable_cache_thread, daemon=True).start()
         self.on_year_change()
+        self.refresh_memory_status()
 
     # --- INIZIO SEZIONE METODI ---
 
-    def display_plot(self, fig):
+    def _enable_cache_thread(self):
+        try:
+            cache_manager.enable()
+        except Exception as e:
+            print(f"Errore nell'attivazione della cache: {e}")
+
+    def refresh_memory_status(self):
+        # Aggiorna la contabilità della memoria e applica il limite configurato
+        report = memory_tracker.enforce(keep_fig=self.current_fig, keep_session=self.session)
+        self.memory_var.set(memory_tracker.summary(report))
+        self.root.after(MEMORY_REFRESH_MS, self.refresh_memory_status)
+
+    def clear_display(self):
+        if self.replay:
+            self.replay.stop()
+            self.replay = None
         if self.canvas:
             if self.interactive_cursor:
                 self.interactive_cursor.disconnect()
                 self.interactive_cursor = None
             self.canvas.get_tk_widget().destroy()
+            self.canvas = None
+        if self.table_frame:
+            self.table_frame.destroy()
+            self.table_frame = None
+            self.current_table = None
         if self.current_fig:
             plt.close(self.current_fig)
+            self.current_fig = None
+        self.displayed = None
+
+    def display_plot(self, fig):
+        if fig is self.current_fig and self.canvas:
+            # Figura già mostrata durante il disegno progressivo: basta ridisegnarla
+            self.canvas.draw()
+            return
+        self.clear_display()
 
         self.current_fig = fig
+        self.displayed = (self.interactive_kind, self.interactive_data, self.driver_codes)
+        memory_tracker.mark_displayed(fig)
+        # Chiude anche le figure rimaste orfane (errori, grafici superati da uno più recente)
+        memory_tracker.close_orphan_figures(keep=fig)
         self.canvas = FigureCanvasTkAgg(self.current_fig, master=self.plot_frame)
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(side="top", fill="both", expand=True)
 
-        if self.interactive_data and self.analysis_var.get() == "Telemetry Comparison":
+        if self.interactive_data and self.interactive_kind == "Telemetry Comparison":
             self.interactive_cursor = InteractiveCursor(
                 fig=self.current_fig, # <-- PASSA L'INTERA FIGURA
                 canvas=self.canvas,
@@ -164,6 +275,73 @@ class F1AnalyzerApp:
                 driver_codes=self.driver_codes,
                 status_var=self.status_var
             )
+        elif self.interactive_data and self.interactive_kind == "Race Gaps & Positions":
+            self.interactive_cursor = RaceGapCursor(
+                fig=self.current_fig,
+                canvas=self.canvas,
+                axes=self.current_fig.get_axes(),
+                race_data=self.interactive_data,
+                status_var=self.status_var
+            )
+        elif self.interactive_data and self.interactive_kind == "All-Pairs Delta Matrix":
+            self.interactive_cursor = DeltaMatrixSelector(
+                fig=self.current_fig,
+                canvas=self.canvas,
+                ax=self.current_fig.get_axes()[0],
+                matrix_data=self.interactive_data,
+                status_var=self.status_var,
+                # Il confronto sostituisce la matrice: lo si apre fuori dal gestore del clic
+                on_select=lambda d1, d2: self.root.after(0, self.show_pair_comparison, self.interactive_data, d1, d2)
+            )
+
+    def show_pair_comparison(self, matrix_data, d1, d2):
+        """Confronto telemetrico di una coppia della matrice, dai giri già ricampionati."""
+        try:
+            fig, tel_d1, tel_d2 = create_pair_plot(self.session, matrix_data, d1, d2)
+        except Exception as e:
+            messagebox.showwarning("Analisi Fallita", f"{e}")
+            return
+        self.interactive_kind = "Telemetry Comparison"
+        self.interactive_data = {'d1': tel_d1, 'd2': tel_d2}
+        self.driver_codes = {'d1': d1, 'd2': d2}
+        self.display_plot(fig)
+        self.status_var.set(f"Confronto {d1} vs {d2}. Genera di nuovo la matrice per tornare alla panoramica.")
+
+    def display_table(self, table):
+        self.clear_display()
+        memory_tracker.close_orphan_figures()
+
+        self.current_table = table
+        self.table_frame = ttk.Frame(self.plot_frame)
+        self.table_frame.pack(side="top", fill="both", expand=True)
+        style = ttk.Style()
+        style.configure('Ranking.Treeview', font=('Consolas', 12), rowheight=28)
+        style.configure('Ranking.Treeview.Heading', font=('Calibri', 12, 'bold'))
+
+        columns = list(table.columns)
+        tree = ttk.Treeview(self.table_frame, columns=columns, show='headings', style='Ranking.Treeview')
+        scrollbar = ttk.Scrollbar(self.table_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        tree.pack(side="left", fill="both", expand=True)
+
+        # Righe inserite una volta; il riordino sposta solo gli item esistenti
+        # seguendo gli indici pre-calcolati da sort_orders
+        item_ids = [tree.insert('', 'end', values=[format_value(col, row[col]) for col in columns])
+                    for row in table.to_dict('records')]
+        orders = sort_orders(table)
+        sort_state = {'column': 'Rank', 'descending': False}
+
+        def sort_by(column):
+            descending = sort_state['column'] == column and not sort_state['descending']
+            sort_state.update(column=column, descending=descending)
+            order = orders[column][::-1] if descending else orders[column]
+            for position, row_idx in enumerate(order):
+                tree.move(item_ids[row_idx], '', position)
+
+        for col in columns:
+            tree.heading(col, text=COLUMN_LABELS.get(col, col), command=lambda c=col: sort_by(c))
+            tree.column(col, anchor="center", width=110 if col not in ('Rank', 'Driver') else 70)
 
     def run_analysis(self):
         try:
@@ -176,8 +354,17 @@ class F1AnalyzerApp:
             plot_function = self.analysis_functions[analysis_name]
             fig = None
             self.interactive_data = None
+            self.interactive_kind = analysis_name
+
+            if not self.stage_reached(self.required_stage(analysis_name)):
+                raise ValueError("Dati non ancora disponibili per questa analisi: attendi la fine del caricamento.")
 
-            if analysis_name == "Telemetry Comparison":
+            if analysis_name == "Lap Time Distribution (Box Plot)":
+                # I dati si preparano qui; la figura si costruisce e si mostra solo nel thread Tk
+                steps = draw_box_plot_steps(self.session, filter_laps(self.session))
+                self.root.after(0, self._start_box_plot, steps)
+                return
+            elif analysis_name == "Telemetry Comparison":
                 d1, d2 = self.driver1_var.get(), self.driver2_var.get()
                 if not d1 or not d2 or d1 == d2: raise ValueError("Seleziona due piloti diversi.")
                 fig, tel_d1, tel_d2 = plot_function(self.session, d1, d2)
@@ -185,8 +372,25 @@ class F1AnalyzerApp:
                 if tel_d1 is not None and tel_d2 is not None:
                     self.interactive_data = {'d1': tel_d1, 'd2': tel_d2}
                     self.driver_codes = {'d1': d1, 'd2': d2}
+            elif analysis_name == "Cross-Season Circuit Comparison":
+                compare_year = self.compare_year_var.get()
+                if compare_year == self.loaded_session_details[0]: raise ValueError("Scegli un anno diverso da quello caricato.")
+                fig = plot_function(self.session, [compare_year])
+            elif analysis_name == "Season Pace Distribution":
+                progress = lambda done, total: self.root.after(0, self.status_var.set, f"Stagione: {done}/{total} gare elaborate...")
+                fig = plot_function(self.session, progress=progress)
+            elif analysis_name == "Race Gaps & Positions":
+                fig, race_data = plot_function(self.session, self.driver1_var.get() or None)
+                self.interactive_data = race_data
+            elif analysis_name == "All-Pairs Delta Matrix":
+                fig, matrix_data = plot_function(self.session)
+                self.interactive_data = matrix_data
             else:
                 result = plot_function(self.session)
+                if isinstance(result, pd.DataFrame):
+                    self.root.after(0, self.display_table, result)
+                    self.root.after(0, self.status_var.set, "Tabella generata. Clicca sulle intestazioni per riordinare.")
+                    return
                 if isinstance(result, tuple): fig = result[0]
                 else: fig = result
 
@@ -202,11 +406,46 @@ class F1AnalyzerApp:
         finally:
             self.root.after(0, self.update_button_states)
 
+    def _start_box_plot(self, steps):
+        self.drawing_steps = steps
+        self._draw_box_plot_step(steps)
+
+    def _draw_box_plot_step(self, steps):
+        """Disegna la riga successiva del box plot e riprogramma la seguente, così la GUI resta reattiva."""
+        if steps is not self.drawing_steps:
+            # Superato da un'altra analisi: la figura parziale è già stata chiusa
+            steps.close()
+            return
+        try:
+            fig, done, total = next(steps)
+        except Exception as e:
+            self.drawing_steps = None
+            messagebox.showwarning("Analisi Fallita", f"{e}")
+            self.status_var.set("Analisi fallita.")
+            return
+        self.display_plot(fig)
+        if done < total:
+            self.status_var.set(f"Grafico in costruzione: {done}/{total} piloti...")
+            self.root.after(0, self._draw_box_plot_step, steps)
+        else:
+            self.drawing_steps = None
+            self.status_var.set("Grafico generato.")
+
+    def required_stage(self, analysis_name):
+        return self.analysis_stage.get(analysis_name, 'laps')
+
+    def stage_reached(self, stage):
+        if self.loaded_stage is None:
+            return False
+        return LOAD_STAGES.index(self.loaded_stage) >= LOAD_STAGES.index(stage)
+
     def update_button_states(self):
         data_loaded = self.loaded_session_details == (self.year_var.get(), self.event_var.get(), self.session_var.get())
         can_load = bool(self.session_var.get()) and not data_loaded
+        # L'analisi scelta si sblocca appena arriva la fase di caricamento che le serve
+        can_analyze = data_loaded and (not self.analysis_var.get() or self.stage_reached(self.required_stage(self.analysis_var.get())))
         self.load_button.config(state='normal' if can_load else 'disabled')
-        self.analyze_button.config(state='normal' if data_loaded else 'disabled')
+        self.analyze_button.config(state='normal' if can_analyze else 'disabled')
 
     def on_year_change(self, *args):
         self.status_var.set(f"Recupero calendario per il {self.year_var.get()}...")
@@ -214,6 +453,8 @@ class F1AnalyzerApp:
 
     def _update_event_list_thread(self):
         try:
+            # Attende l'attivazione della cache, altrimenti fastf1 userebbe la sua cartella predefinita
+            cache_manager.enable()
             self.schedule = ff1.get_event_schedule(self.year_var.get(), include_testing=True)
             event_names = self.schedule['EventName'].tolist()
             self.root.after(0, self.update_event_ui, event_names)
@@ -262,22 +503,121 @@ class F1AnalyzerApp:
         self.on_session_change()
 
     def on_session_change(self, *args):
+        memory_tracker.release_session(self.session)
         self.session = None; self.driver_list = []
         self.driver1_combo.config(state='disabled', values=[]); self.driver1_var.set('')
         self.driver2_combo.config(state='disabled', values=[]); self.driver2_var.set('')
         if self.loaded_session_details != (self.year_var.get(), self.event_var.get(), self.session_var.get()):
             self.loaded_session_details = None
+            self.loaded_stage = None
         self.update_button_states()
         self.on_analysis_selected()
 
     def on_analysis_selected(self, *args):
-        is_telemetry = self.analysis_var.get() == "Telemetry Comparison"
-        if is_telemetry:
+        drivers_needed = self.analysis_driver_count.get(self.analysis_var.get(), 0)
+        if drivers_needed >= 1:
+            self.driver1_label.config(text="Pilota 1:" if drivers_needed == 2 else "Riferimento:")
             self.driver1_label.grid(row=1, column=1, pady=10, sticky="w"); self.driver1_combo.grid(row=1, column=2, padx=5, pady=10, sticky="ew")
-            self.driver2_label.grid(row=2, column=1, sticky="w"); self.driver2_combo.grid(row=2, column=2, padx=5, sticky="ew")
         else:
             self.driver1_label.grid_forget(); self.driver1_combo.grid_forget()
+        if drivers_needed >= 2:
+            self.driver2_label.grid(row=2, column=1, sticky="w"); self.driver2_combo.grid(row=2, column=2, padx=5, sticky="ew")
+        else:
             self.driver2_label.grid_forget(); self.driver2_combo.grid_forget()
+        if self.analysis_var.get() == "Cross-Season Circuit Comparison":
+            self.compare_year_label.grid(row=1, column=1, pady=10, sticky="w"); self.compare_year_spinbox.grid(row=1, column=2, padx=5, pady=10, sticky="ew")
+        else:
+            self.compare_year_label.grid_forget(); self.compare_year_spinbox.grid_forget()
+        if self.analysis_var.get() in self.weather_analyses and self.session is not None:
+            threading.Thread(target=self._prefetch_weather_thread, args=(self.session,), daemon=True).start()
+        self.update_button_states()
+
+    def _prefetch_weather_thread(self, session):
+        try:
+            ensure_weather(session)
+        except Exception as e:
+            print(f"Meteo non disponibile: {e}")
+
+    def export_current(self):
+        filetypes = [("Immagine PNG", "*.png"), ("PDF", "*.pdf"), ("SVG", "*.svg"), ("CSV", "*.csv"), ("Parquet", "*.parquet")]
+        path = filedialog.asksaveasfilename(title="Esporta grafico o dati", defaultextension=".png", filetypes=filetypes)
+        if not path: return
+        if os.path.splitext(path)[1].lower() in FIGURE_FORMATS:
+            # Il grafico è mostrato dal canvas Tk: lo si salva dal thread della GUI
+            try:
+                if self.current_fig is None: raise ValueError("Nessun grafico da esportare.")
+                export_figure(self.current_fig, path)
+                self.status_var.set(f"Grafico salvato in {path}")
+            except Exception as e:
+                messagebox.showwarning("Esportazione Fallita", f"{e}")
+            return
+        self.export_button.config(state='disabled')
+        self.status_var.set("Esportazione dati in corso...")
+        threading.Thread(target=self._export_data_thread, args=(path, self.displayed, self.current_table), daemon=True).start()
+
+    def _export_data_thread(self, path, displayed, table):
+        """
+        Dati dell'analisi mostrata: la tabella, i dati interattivi del grafico
+        (telemetria allineata, evoluzione della gara, matrice dei distacchi) o
+        quelli ricalcolati dalla sessione. Le altre analisi non si esportano.
+        """
+        try:
+            analysis_name, data, driver_codes = displayed or (None, None, None)
+            if table is not None:
+                rows = export_frame(table, path)
+            elif analysis_name is None:
+                raise ValueError("Nessun grafico o tabella da esportare.")
+            elif analysis_name == "Telemetry Comparison" and data:
+                rows = export_telemetry_frames(data['d1'], data['d2'], driver_codes['d1'], driver_codes['d2'], path)
+            elif analysis_name == "Race Gaps & Positions" and data:
+                rows = export_frame(race_evolution_frame(data), path)
+            elif analysis_name == "All-Pairs Delta Matrix" and data:
+                rows = export_frame(delta_matrix_frame(data), path)
+            elif analysis_name in self.analysis_data:
+                if not self.session or not self.stage_reached('laps'): raise ValueError("Dati della sessione non caricati.")
+                rows = export_frame(self.analysis_data[analysis_name](self.session), path)
+            else:
+                raise ValueError(f"Esportazione dati non disponibile per \"{analysis_name}\": salva il grafico come PNG, PDF o SVG.")
+            self.root.after(0, self.status_var.set, f"Esportate {rows} righe in {path}")
+        except Exception as e:
+            self.root.after(0, messagebox.showwarning, "Esportazione Fallita", f"{e}")
+            self.root.after(0, self.status_var.set, f"Esportazione fallita: {e}")
+        finally:
+            self.root.after(0, lambda: self.export_button.config(state='normal'))
+
+    def start_replay(self):
+        path = filedialog.askopenfilename(title="Registrazione live timing", filetypes=[("Live timing", "*.txt"), ("Tutti i file", "*.*")])
+        if not path: return
+        try:
+            speed = self.replay_speed_var.get()
+            if speed <= 0: raise ValueError
+        except (tk.TclError, ValueError):
+            messagebox.showwarning("Replay Live", "Velocità di replay non valida."); return
+        replay = LiveReplay(path, speed=speed, title=f"Replay Live Timing - {os.path.basename(path)} (x{speed:g})")
+        self.interactive_data = None
+        self.interactive_kind = None
+        self.display_plot(replay.fig)
+        self.replay = replay
+        replay.start()
+        self.status_var.set("Replay live: lettura della registrazione...")
+        self.root.after(REPLAY_REFRESH_MS, self._poll_replay, replay)
+
+    def _poll_replay(self, replay):
+        # Il replay è stato fermato o sostituito da un altro grafico
+        if replay is not self.replay: return
+        if replay.poll():
+            self.canvas.draw_idle()
+        if replay.source.error:
+            self.replay = None
+            messagebox.showerror("Replay Live", f"Impossibile leggere la registrazione: {replay.source.error}")
+            self.status_var.set("Replay fallito.")
+            return
+        if replay.done:
+            self.replay = None
+            self.status_var.set(f"{replay.status()} (replay terminato)")
+            return
+        self.status_var.set(replay.status())
+        self.root.after(REPLAY_REFRESH_MS, self._poll_replay, replay)
 
     def load_session_data(self):
         if self.loading_thread and self.loading_thread.is_alive(): return
@@ -287,28 +627,100 @@ class F1AnalyzerApp:
         self.loading_thread.start()
 
     def _load_session_thread(self):
+        """
+        Caricamento a fasi: risultati, poi tempi sul giro, poi telemetria. Ogni
+        fase viene pubblicata appena arriva e sblocca le analisi che le bastano.
+        """
+        stage = None
         try:
             year, event, session_type = self.year_var.get(), self.event_var.get(), self.session_var.get()
-            ff1.Cache.enable_cache(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache'))
-            self.session = ff1.get_session(year, event, session_type)
-            self.session.load(laps=True, telemetry=True, weather=False, messages=False)
-            if self.session.laps is None or self.session.laps.empty:
+            details = (year, event, session_type)
+            old_session, self.session = self.session, None
+            memory_tracker.release_session(old_session)
+            del old_session
+            cache_manager.enable()
+            session = ff1.get_session(year, event, session_type)
+            self.session = session
+            cache_manager.prepare(session)
+
+            # Fase 1: informazioni sulla sessione e risultati (pochi KB)
+            session.load(laps=False, telemetry=False, weather=False, messages=False)
+            try:
+                drivers = sorted(session.results['Abbreviation'].dropna().unique())
+            except Exception:
+                drivers = []
+            stage = 'results'
+            self.root.after(0, self.on_stage_loaded, session, stage, details, drivers)
+
+            # Fase 2: tempi sul giro (risultati e info sessione vengono dalla cache)
+            session.load(laps=True, telemetry=False, weather=False, messages=False)
+            if session.laps is None or session.laps.empty:
                 raise ValueError(f"Dati non trovati per {event} - {session_type}.")
-            self.loaded_session_details = (year, event, session_type)
-            self.driver_list = sorted(self.session.laps['Driver'].unique())
-            self.root.after(0, self.on_load_success)
+            memory_tracker.track_session(session)
+            # Tabella compatta dei giri: costruita qui una volta, poi condivisa da tutte le analisi
+            table = lap_table(session)
+            stage = 'laps'
+            self.root.after(0, self.on_stage_loaded, session, stage, details, table.drivers)
+
+            # Fase 3: telemetria. L'API la fornisce in un unico flusso per tutti i piloti.
+            # La sessione è di questo thread finché la fase non viene pubblicata sul thread Tk;
+            # le analisi già sbloccate lavorano sulla tabella dei giri costruita sopra.
+            # fastf1 non solleva eccezioni (soft_exceptions): si controlla che sia arrivata
+            try:
+                session.load(laps=False, telemetry=True, weather=False, messages=False)
+            except Exception as e:
+                print(f"Telemetria non disponibile: {e}")
+            if self._has_telemetry(session):
+                # Misura i nuovi dati qui, non nel controllo periodico sul thread Tk
+                memory_tracker.track_session(session)
+                stage = 'telemetry'
+                self.root.after(0, self.on_stage_loaded, session, stage, details, None)
+            else:
+                self.root.after(0, self.status_var.set, "Telemetria non disponibile: analisi sui tempi sul giro disponibili.")
         except Exception as e:
-            self.root.after(0, lambda: self.on_load_fail(e))
+            # Fallisce il caricamento solo se non è stato pubblicato nulla di utilizzabile
+            if stage in (None, 'results'):
+                self.root.after(0, self.on_load_fail, e)
+            else:
+                print(f"Errore durante il caricamento: {e}")
+            return
+
+        # Manutenzione della cache: un errore qui non invalida la sessione già caricata
+        try:
+            cache_manager.touch(session)
+            cache_manager.enforce_budget(protect={cache_manager.entry_key(session)})
+        except Exception as e:
+            print(f"Manutenzione della cache non riuscita: {e}")
 
-    def on_load_success(self):
-        self.update_driver_combos()
-        self.status_var.set("Dati caricati. Seleziona un'analisi e genera il grafico.")
+    @staticmethod
+    def _has_telemetry(session):
+        try:
+            return bool(session.car_data) or bool(session.pos_data)
+        except Exception:
+            return False
+
+    def on_stage_loaded(self, session, stage, details, drivers):
+        if session is not self.session:
+            # La selezione è cambiata durante il caricamento
+            return
+        self.loaded_session_details = details
+        self.loaded_stage = stage
+        if drivers and drivers != self.driver_list:
+            self.driver_list = drivers
+            self.update_driver_combos()
+        messages = {
+            'results': "Risultati caricati. Caricamento tempi sul giro in corso...",
+            'laps': "Tempi sul giro caricati: analisi disponibili. Caricamento telemetria in corso...",
+            'telemetry': "Dati caricati. Seleziona un'analisi e genera il grafico.",
+        }
+        self.status_var.set(messages[stage])
         self.update_button_states()
 
     def on_load_fail(self, exc):
         messagebox.showerror("Errore di Caricamento", f"Impossibile caricare i dati: {exc}")
         self.status_var.set("Caricamento fallito.")
         self.loaded_session_details = None
+        self.loaded_stage = None
         self.update_button_states()
 
     def update_driver_combos(self):
@@ -320,5 +732,6 @@ class F1AnalyzerApp:
 
     def start_analysis_thread(self):
         self.analyze_button['state'] = 'disabled'
+        self.drawing_steps = None
         self.status_var.set("Generazione grafico in corso...")
         threading.Thread(target=self.run_analysis, daemon=True).start()
\ No newline at end of file
@@ -0,0 +1,186 @@
+# File: f1_analyzer/batch.py
+"""
+Comandi batch senza interfaccia grafica.
+
+Esempi:
+    python -m f1_analyzer.batch dataset --years 2023 2024
+    python -m f1_analyzer.batch dataset --years 2024 --rebuild --workers 8
+    python -m f1_analyzer.batch train --cv
+    python -m f1_analyzer.batch export laps --year 2024 --event Monza --session Race --output giri.parquet
+    python -m f1_analyzer.batch export telemetry --year 2024 --event Monza --session Q --drivers LEC NOR --output tel.csv
+    python -m f1_analyzer.batch enqueue --years 2022 2023 2024 --analyses dataset box-plot
+    python -m f1_analyzer.batch worker --workers 4
+"""
+
+import argparse
+import os
+
+import fastf1 as ff1
+
+from .config import DATASET_DIR, MODELS_DIR, QUEUE_DIR, REPORTS_DIR, RIDGE_ALPHA
+
+
+def _cmd_dataset(args):
+    from .ml.dataset import build_dataset
+    workers = args.workers or (os.cpu_count() if args.rebuild else 1)
+    results = build_dataset(args.years, root=args.output, session_names=args.sessions,
+                            workers=workers, rebuild=args.rebuild)
+    failed = [unit for unit, result in results.items() if isinstance(result, Exception)]
+    print(f"Completate {len(results) - len(failed)} sessioni, fallite {len(failed)}.")
+    return 1 if failed else 0
+
+
+def _cmd_train(args):
+    from .ml.lap_model import cross_validate, data_version, get_model
+    if args.cv:
+        for season, score in sorted(cross_validate(args.dataset, alpha=args.alpha, workers=args.workers).items()):
+            print(f"  {season}: MAE {score['mae']:.3f}s  RMSE {score['rmse']:.3f}s  ({score['n']} giri)")
+    get_model(args.dataset, models_dir=args.output, alpha=args.alpha)
+    print(f"Modello pronto per la versione del dataset {data_version(args.dataset)}.")
+    return 0
+
+
+EXPORT_KINDS = ('laps', 'telemetry', 'session-telemetry', 'box-plot', 'telemetry-plot')
+
+
+def _load_session(year, event, session_name, telemetry):
+    from .modules.cache_manager import cache_manager
+    cache_manager.enable()
+    session = ff1.get_session(year, event, session_name)
+    cache_manager.prepare(session)
+    session.load(laps=True, telemetry=telemetry, weather=False, messages=False)
+    cache_manager.touch(session)
+    return session
+
+
+def _cmd_export(args):
+    # Nessuna finestra: i grafici vengono solo salvati su file
+    import matplotlib
+    matplotlib.use('Agg')
+    from .modules import export
+
+    needs_drivers = args.what in ('telemetry', 'telemetry-plot')
+    if needs_drivers and (not args.drivers or len(args.drivers) != 2):
+        print("Indica due piloti con --drivers.")
+        return 2
+    session = _load_session(args.year, args.event, args.session, telemetry=args.what not in ('laps', 'box-plot'))
+
+    if args.what == 'laps':
+        rows = export.export_laps(session, args.output)
+    elif args.what == 'telemetry':
+        rows = export.export_aligned_telemetry(session, *args.drivers, args.output)
+    elif args.what == 'session-telemetry':
+        rows = export.export_session_telemetry(session, args.output, drivers=args.drivers)
+    else:
+        if args.what == 'box-plot':
+            from .modules.box_plot import create_plot
+            fig = create_plot(session)
+        else:
+            from .modules.telemetry_comparison import create_plot
+            fig, _, _ = create_plot(session, *args.drivers)
+        # Le analisi fallite disegnano il messaggio d'errore invece di sollevare: niente file
+        error = getattr(fig, 'analysis_error', None)
+        if error is not None:
+            import matplotlib.pyplot as plt
+            plt.close(fig)
+            print(f"Analisi fallita: {error}")
+            return 1
+        export.export_figure(fig, args.output)
+        print(f"Grafico salvato in {args.output}.")
+        return 0
+    print(f"Esportate {rows} righe in {args.output}.")
+    return 0
+
+
+def _cmd_enqueue(args):
+    from .work_queue import WorkQueue, build_units
+    units = build_units(args.years, session_names=args.sessions, analyses=args.analyses)
+    added = WorkQueue(args.queue).enqueue(units, force=args.force)
+    print(f"Accodate {added} unità su {len(units)}.")
+    return 0
+
+
+def _cmd_worker(args):
+    from .work_queue import run_worker
+    if args.workers == 1:
+        done, failed = run_worker(args.queue, reports_dir=args.reports, dataset_dir=args.dataset)
+    else:
+        # Più worker locali: stessa coda, stessi rename atomici dei worker su altre macchine
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(run_worker, args.queue, args.reports, args.dataset) for _ in range(args.workers)]
+            results = [future.result() for future in futures]
+        done, failed = sum(r[0] for r in results), sum(r[1] for r in results)
+    print(f"Completate {done} unità, errori {failed}.")
+    return 0
+
+
+def _cmd_status(args):
+    from .work_queue import WorkQueue
+    queue = WorkQueue(args.queue)
+    print("  ".join(f"{state}: {count}" for state, count in queue.counts().items()))
+    for uid, error in queue.failures().items():
+        print(f"  {uid}: {error}")
+    return 1 if queue.failures() else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m f1_analyzer.batch", description="F1 Analysis Hub - comandi batch")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    dataset = subparsers.add_parser("dataset", help="Aggiorna il dataset di feature per giro (Parquet).")
+    dataset.add_argument("--years", type=int, nargs="+", required=True)
+    dataset.add_argument("--sessions", nargs="+", default=["Race"], help="Nomi delle sessioni (es. Race Sprint).")
+    dataset.add_argument("--output", default=DATASET_DIR)
+    dataset.add_argument("--workers", type=int, default=None, help="Processi paralleli (default: tutti i core con --rebuild, altrimenti 1).")
+    dataset.add_argument("--rebuild", action="store_true", help="Rielabora anche le sessioni già presenti.")
+    dataset.set_defaults(func=_cmd_dataset)
+
+    train = subparsers.add_parser("train", help="Addestra il modello di predizione del tempo sul giro.")
+    train.add_argument("--dataset", default=DATASET_DIR)
+    train.add_argument("--output", default=MODELS_DIR)
+    train.add_argument("--alpha", type=float, default=RIDGE_ALPHA, help="Regolarizzazione ridge.")
+    train.add_argument("--cv", action="store_true", help="Validazione incrociata leave-one-season-out.")
+    train.add_argument("--workers", type=int, default=None)
+    train.set_defaults(func=_cmd_train)
+
+    export = subparsers.add_parser("export", help="Esporta giri, telemetria o grafici di una sessione (CSV/Parquet, PNG/PDF/SVG).")
+    export.add_argument("what", choices=EXPORT_KINDS)
+    export.add_argument("--year", type=int, required=True)
+    export.add_argument("--event", required=True)
+    export.add_argument("--session", default="Race")
+    export.add_argument("--drivers", nargs="+", help="Piloti (due per telemetry e telemetry-plot).")
+    export.add_argument("--output", required=True, help="File di destinazione; il formato segue l'estensione.")
+    export.set_defaults(func=_cmd_export)
+
+    from .work_queue import ANALYSES
+    enqueue = subparsers.add_parser("enqueue", help="Accoda le unità (anno, evento, sessione, analisi) di una o più stagioni.")
+    enqueue.add_argument("--years", type=int, nargs="+", required=True)
+    enqueue.add_argument("--sessions", nargs="+", default=["Race"])
+    enqueue.add_argument("--analyses", nargs="+", default=list(ANALYSES), choices=list(ANALYSES))
+    enqueue.add_argument("--queue", default=QUEUE_DIR, help="Cartella della coda (condivisa tra le macchine).")
+    enqueue.add_argument("--force", action="store_true", help="Riaccoda anche le unità completate o fallite.")
+    enqueue.set_defaults(func=_cmd_enqueue)
+
+    worker = subparsers.add_parser("worker", help="Elabora le unità in coda finché non è vuota.")
+    worker.add_argument("--queue", default=QUEUE_DIR)
+    worker.add_argument("--workers", type=int, default=1, help="Processi worker su questa macchina.")
+    worker.add_argument("--reports", default=REPORTS_DIR)
+    worker.add_argument("--dataset", default=DATASET_DIR)
+    worker.set_defaults(func=_cmd_worker)
+
+    status = subparsers.add_parser("status", help="Stato della coda ed errori delle unità fallite.")
+    status.add_argument("--queue", default=QUEUE_DIR)
+    status.set_defaults(func=_cmd_status)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    ff1.set_log_level('WARNING')
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,7 +1,74 @@
 # File: f1_analyzer/config.py
 
+import os
+from pathlib import Path
+
 COMPOUND_COLORS = { 
     'SOFT': '#FF3333', 'MEDIUM': '#FFF200', 'HARD': '#EBEBEB', 
     'INTERMEDIATE': '#43B02A', 'WET': '#0090FF', 'UNKNOWN': '#808080' 
 }
-CANONICAL_COMPOUND_ORDER = ['SOFT', 'MEDIUM', 'HARD', 'INTERMEDIATE', 'WET']
\ No newline at end of file
+CANONICAL_COMPOUND_ORDER = ['SOFT', 'MEDIUM', 'HARD', 'INTERMEDIATE', 'WET']
+
+# Memoria: oltre questa soglia (dati delle sessioni più cache dei dati derivati)
+# vengono chiuse le figure orfane e svuotate le cache. Si libera fino a
+# scendere sotto MEMORY_LOW_WATERMARK del limite, e tra due interventi
+# passano almeno MEMORY_ENFORCE_COOLDOWN_S secondi.
+MEMORY_LIMIT_MB = 2048
+MEMORY_LOW_WATERMARK = 0.8
+MEMORY_ENFORCE_COOLDOWN_S = 30
+MEMORY_REFRESH_MS = 5000
+
+# Cache fastf1 condivisa tra app desktop e demo Streamlit. La variabile
+# d'ambiente F1_ANALYZER_CACHE permette di puntare a una cartella comune.
+CACHE_DIR = os.environ.get('F1_ANALYZER_CACHE', str(Path(__file__).resolve().parent.parent / 'cache'))
+CACHE_MAX_SIZE_GB = 10
+CACHE_COLD_DAYS = 30
+# Compressione delle voci fredde: disattivata di default perché fastf1 non legge
+# i file compressi, e chi usa la cartella senza `cache_manager.prepare()` li
+# riscaricherebbe
+CACHE_COMPRESS_COLD = False
+# Le voci usate da meno di così non vengono eliminate: possono essere in
+# caricamento in un altro processo che condivide la cache
+CACHE_IN_USE_GRACE_S = 3600
+# Tetto del database HTTP di fastf1 (fastf1_http_cache.sqlite)
+CACHE_HTTP_MAX_MB = 512
+
+# Dataset di feature per il machine learning (Parquet partizionato per stagione/evento/sessione)
+DATASET_DIR = str(Path(__file__).resolve().parent.parent / 'data' / 'laps')
+# Carburante stimato a inizio gara (kg), usato come proxy lineare del carico
+FUEL_START_KG = 110.0
+
+# Modelli di predizione del tempo sul giro, salvati per versione del dataset
+MODELS_DIR = str(Path(__file__).resolve().parent.parent / 'data' / 'models')
+RIDGE_ALPHA = 1.0
+
+# Effetto del carburante sul tempo sul giro (s per kg), per la correzione del passo gara
+FUEL_EFFECT_S_PER_KG = 0.03
+
+# Processi usati per scorrere le gare di una stagione (una sessione in memoria per processo)
+SEASON_WORKERS = 2
+# Scarto relativo massimo tra la lunghezza di un giro e quella del tracciato di riferimento
+# (le distanze integrate dalla velocità sbagliano di pochi metri): oltre, il layout è cambiato.
+# Modifiche più piccole (es. una chicane rimossa) si riconoscono dal numero di curve ufficiali
+CIRCUIT_LENGTH_TOLERANCE = 0.01
+
+# Fasi del caricamento progressivo di una sessione, nell'ordine in cui arrivano
+LOAD_STAGES = ('results', 'laps', 'telemetry')
+
+# Replay di una registrazione del live timing: velocità di default e intervallo di aggiornamento della GUI
+REPLAY_SPEED = 1.0
+REPLAY_REFRESH_MS = 200
+
+# Esportazione: righe per chunk scritto su disco e risoluzione delle immagini
+EXPORT_CHUNK_ROWS = 65536
+EXPORT_DPI = 150
+
+# Coda di lavoro su file system condiviso (report e dataset di intere stagioni)
+QUEUE_DIR = os.environ.get('F1_ANALYZER_QUEUE', str(Path(__file__).resolve().parent.parent / 'data' / 'queue'))
+REPORTS_DIR = str(Path(__file__).resolve().parent.parent / 'data' / 'reports')
+# Un lease non rinnovato entro il timeout torna in coda; il worker lo rinnova ogni LEASE_HEARTBEAT_S
+LEASE_TIMEOUT_S = 600
+LEASE_HEARTBEAT_S = 30
+QUEUE_MAX_ATTEMPTS = 3
+# Attesa prima di un nuovo tentativo, moltiplicata per il numero di tentativi già fatti
+QUEUE_RETRY_DELAY_S = 60
@@ -0,0 +1,129 @@
+import gc
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fastf1 as ff1
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ..config import DATASET_DIR
+from ..modules.cache_manager import cache_manager
+from .features import lap_features
+
+SUCCESS_MARKER = '_SUCCESS'
+PARTITIONING = ds.partitioning(
+    pa.schema([('season', pa.int16()), ('event', pa.string()), ('session', pa.string())]),
+    flavor='hive',
+)
+
+
+def slug(name):
+    """Nome di evento o sessione ridotto a caratteri sicuri per cartelle e file (partizioni, coda, report)."""
+    return re.sub(r'[^0-9A-Za-z]+', '_', str(name)).strip('_')
+
+
+def partition_dir(root, year, event_name, session_name):
+    return os.path.join(root, f"season={year}", f"event={slug(event_name)}", f"session={slug(session_name)}")
+
+
+def is_present(root, year, event_name, session_name):
+    """Una partizione esiste solo se la scrittura è arrivata fino al marker finale."""
+    return os.path.isfile(os.path.join(partition_dir(root, year, event_name, session_name), SUCCESS_MARKER))
+
+
+def write_partition(features, part_dir):
+    """
+    Scrive una partizione in una cartella temporanea e la rende visibile con un
+    rename: un processo interrotto non lascia mai una partizione a metà.
+    """
+    # Il prefisso '.' fa sì che pyarrow ignori la cartella durante la scrittura
+    parent, name = os.path.split(part_dir)
+    tmp_dir = os.path.join(parent, f".tmp-{name}-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    table = pa.Table.from_pandas(features, preserve_index=False)
+    pq.write_table(table, os.path.join(tmp_dir, 'part-0.parquet'), compression='zstd')
+    open(os.path.join(tmp_dir, SUCCESS_MARKER), 'w').close()
+    shutil.rmtree(part_dir, ignore_errors=True)
+    os.replace(tmp_dir, part_dir)
+    return table.num_rows
+
+
+def season_sessions(year, session_names=('Race',), held_only=False):
+    """
+    Elenco (anno, evento, sessione) delle sessioni di campionato di una
+    stagione; con `held_only` solo gli eventi già disputati.
+    """
+    schedule = ff1.get_event_schedule(year, include_testing=False)
+    if held_only:
+        schedule = schedule[schedule['EventDate'] <= pd.Timestamp.now()]
+    units = []
+    for _, event in schedule.iterrows():
+        available = {event[f'Session{i}'] for i in range(1, 6) if pd.notna(event[f'Session{i}'])}
+        for session_name in session_names:
+            if session_name in available:
+                units.append((year, event['EventName'], session_name))
+    return units
+
+
+def process_session(year, event_name, session_name, root=DATASET_DIR):
+    """
+    Carica una singola sessione (solo i giri), ne calcola le feature e scrive
+    la partizione. La sessione viene rilasciata prima di ritornare, così la
+    memoria resta limitata a una sessione per processo.
+    """
+    cache_manager.enable()
+    session = ff1.get_session(year, event_name, session_name)
+    cache_manager.prepare(session)
+    session.load(laps=True, telemetry=False, weather=False, messages=False)
+    cache_manager.touch(session)
+    features = lap_features(session)
+    del session
+    rows = write_partition(features, partition_dir(root, year, event_name, session_name))
+    del features
+    gc.collect()
+    return rows
+
+
+def build_dataset(years, root=DATASET_DIR, session_names=('Race',), workers=1, rebuild=False, progress=print,
+                  held_only=True):
+    """
+    Aggiorna il dataset elaborando solo le sessioni non ancora presenti
+    (oppure tutte, con `rebuild=True`). Con `workers > 1` le sessioni vengono
+    distribuite su più processi, ognuno dei quali ne tiene in memoria una alla volta.
+    Con `held_only` (predefinito) la stagione in corso si ferma all'ultimo evento disputato.
+    Ritorna un dizionario {(anno, evento, sessione): righe scritte o eccezione}.
+    """
+    units = [unit for year in years for unit in season_sessions(year, session_names, held_only=held_only)]
+    todo = [unit for unit in units if rebuild or not is_present(root, *unit)]
+    progress(f"Dataset: {len(todo)} sessioni da elaborare su {len(units)}.")
+
+    results = {}
+    if workers <= 1:
+        for unit in todo:
+            try:
+                results[unit] = process_session(*unit, root=root)
+            except Exception as e:
+                results[unit] = e
+            progress(f"  {unit}: {results[unit]}")
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_session, *unit, root=root): unit for unit in todo}
+        for future in as_completed(futures):
+            unit = futures[future]
+            try:
+                results[unit] = future.result()
+            except Exception as e:
+                results[unit] = e
+            progress(f"  {unit}: {results[unit]}")
+    return results
+
+
+def open_dataset(root=DATASET_DIR):
+    """Dataset pyarrow (lazy) con le partizioni season/event/session."""
+    return ds.dataset(root, format='parquet', partitioning=PARTITIONING)
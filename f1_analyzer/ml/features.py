@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from ..config import FUEL_START_KG
+
+# Colonne prodotte da `lap_features`, nell'ordine in cui vengono scritte su disco
+FEATURE_COLUMNS = [
+    'Year', 'EventName', 'RoundNumber', 'SessionName',
+    'Driver', 'Team', 'LapNumber', 'Stint', 'Compound', 'TyreLife', 'FreshTyre',
+    'Sector1Seconds', 'Sector2Seconds', 'Sector3Seconds',
+    'TrackStatus', 'IsGreen', 'IsPitLap', 'FuelLoadKg',
+    'LapTimeSeconds', 'GapToFastest',
+]
+
+
+def _seconds(series):
+    return series.dt.total_seconds().astype('float32')
+
+
+def fuel_load_kg(lap_number, total_laps):
+    """Proxy del carburante: decresce linearmente da FUEL_START_KG a zero lungo la gara."""
+    return np.clip(1.0 - (lap_number - 1) / total_laps, 0.0, 1.0) * FUEL_START_KG
+
+
+def lap_features(session):
+    """
+    Trasforma `session.laps` in una tabella di feature per giro, pronta per
+    essere scritta nel dataset. Una riga per ogni giro con tempo valido.
+    """
+    laps = session.laps
+    if laps is None or laps.empty:
+        raise ValueError("Dati dei giri non disponibili per questa sessione.")
+
+    laps = laps.dropna(subset=['LapTime', 'LapNumber'])
+    lap_number = laps['LapNumber'].astype('int16')
+
+    total_laps = getattr(session, 'total_laps', None) or int(lap_number.max())
+
+    lap_time = _seconds(laps['LapTime'])
+    track_status = laps['TrackStatus'].fillna('').astype(str)
+
+    features = pd.DataFrame({
+        'Year': np.int16(session.event.year),
+        'EventName': session.event['EventName'],
+        'RoundNumber': np.int16(session.event['RoundNumber']),
+        'SessionName': session.name,
+        'Driver': laps['Driver'].astype(str),
+        'Team': laps['Team'].astype(str),
+        'LapNumber': lap_number,
+        'Stint': laps['Stint'].fillna(0).astype('int8'),
+        'Compound': laps['Compound'].fillna('UNKNOWN').astype(str),
+        'TyreLife': laps['TyreLife'].astype('float32'),
+        'FreshTyre': laps['FreshTyre'].fillna(False).astype(bool),
+        'Sector1Seconds': _seconds(laps['Sector1Time']),
+        'Sector2Seconds': _seconds(laps['Sector2Time']),
+        'Sector3Seconds': _seconds(laps['Sector3Time']),
+        'TrackStatus': track_status,
+        # '1' = pista libera: qualsiasi altro codice indica bandiere o safety car
+        'IsGreen': track_status.eq('1'),
+        'IsPitLap': laps['PitInTime'].notna() | laps['PitOutTime'].notna(),
+        'FuelLoadKg': fuel_load_kg(lap_number, total_laps).astype('float32'),
+        'LapTimeSeconds': lap_time,
+        'GapToFastest': (lap_time - lap_time.min()).astype('float32'),
+    }, columns=FEATURE_COLUMNS)
+    return features.reset_index(drop=True)
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from ..config import DATASET_DIR, MODELS_DIR, RIDGE_ALPHA
+from .dataset import open_dataset
+
+NUMERIC_FEATURES = ['TyreLife', 'FuelLoadKg', 'LapNumber', 'Stint', 'IsGreen', 'IsPitLap']
+CATEGORICAL_FEATURES = ['EventName', 'Compound', 'Driver']
+# La degradazione dipende dalla mescola: TyreLife viene moltiplicato per l'one-hot della mescola
+INTERACTION = ('TyreLife', 'Compound')
+TARGET = 'LapTimeSeconds'
+TRAINING_COLUMNS = NUMERIC_FEATURES + CATEGORICAL_FEATURES + [TARGET, 'GapToFastest', 'Year']
+MODEL_FILE = 'lap_time_ridge-{spec}.npz'
+
+
+def data_version(root=DATASET_DIR):
+    """Hash di percorso, dimensione e mtime di ogni file Parquet del dataset."""
+    if not os.path.isdir(root):
+        raise ValueError("Dataset non trovato: esegui prima 'python -m f1_analyzer.batch dataset'.")
+    digest = hashlib.sha1()
+    for path in sorted(open_dataset(root).files):
+        stat = os.stat(path)
+        digest.update(f"{os.path.relpath(path, root)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def model_spec(alpha):
+    """Hash degli iperparametri e delle feature: modelli con impostazioni diverse non si scambiano."""
+    spec = {'alpha': float(alpha), 'numeric': NUMERIC_FEATURES, 'categorical': CATEGORICAL_FEATURES,
+            'interaction': list(INTERACTION), 'target': TARGET}
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def dataset_seasons(root=DATASET_DIR):
+    """Stagioni presenti nel dataset, lette dai nomi delle partizioni season=<anno>."""
+    if not os.path.isdir(root):
+        raise ValueError("Dataset non trovato: esegui prima 'python -m f1_analyzer.batch dataset'.")
+    return sorted(int(name.split('=', 1)[1]) for name in os.listdir(root)
+                  if name.startswith('season=') and os.path.isdir(os.path.join(root, name)))
+
+
+def load_training_laps(root=DATASET_DIR, filter=None):
+    """
+    Giri usati per l'addestramento: pista libera, niente giri ai box e, come
+    nel box plot, solo i giri entro il 107% del più veloce della sessione.
+    """
+    clean = (ds.field('IsGreen') == True) & (ds.field('IsPitLap') == False)  # noqa: E712
+    if filter is not None:
+        clean = clean & filter
+    table = open_dataset(root).to_table(columns=TRAINING_COLUMNS, filter=clean)
+    laps = table.to_pandas()
+    fastest = laps[TARGET] - laps['GapToFastest']
+    return laps[laps[TARGET] <= fastest * 1.07].reset_index(drop=True)
+
+
+class FeatureEncoder:
+    """Standardizza le feature numeriche e codifica one-hot quelle categoriche."""
+    def __init__(self, means=None, stds=None, categories=None):
+        self.means = means
+        self.stds = stds
+        self.categories = categories or {}
+
+    def fit(self, laps):
+        numeric = laps[NUMERIC_FEATURES].to_numpy(dtype=np.float64)
+        self.means = np.nanmean(numeric, axis=0)
+        self.stds = np.nanstd(numeric, axis=0)
+        self.stds[self.stds == 0] = 1.0
+        self.categories = {col: sorted(laps[col].dropna().astype(str).unique()) for col in CATEGORICAL_FEATURES}
+        return self
+
+    @property
+    def n_features(self):
+        n_compounds = len(self.categories[INTERACTION[1]])
+        return len(NUMERIC_FEATURES) + sum(len(c) for c in self.categories.values()) + n_compounds
+
+    def transform(self, laps):
+        """Matrice di design densa; le categorie mai viste restano a zero."""
+        n = len(laps)
+        X = np.zeros((n, self.n_features), dtype=np.float64)
+        numeric = laps[NUMERIC_FEATURES].to_numpy(dtype=np.float64)
+        numeric = np.where(np.isnan(numeric), self.means, numeric)
+        X[:, :len(NUMERIC_FEATURES)] = (numeric - self.means) / self.stds
+
+        rows = np.arange(n)
+        offset = len(NUMERIC_FEATURES)
+        codes_by_col = {}
+        for col in CATEGORICAL_FEATURES:
+            codes = pd.Categorical(laps[col].astype(str), categories=self.categories[col]).codes
+            known = codes >= 0
+            X[rows[known], offset + codes[known]] = 1.0
+            codes_by_col[col] = codes
+            offset += len(self.categories[col])
+
+        num_col, cat_col = INTERACTION
+        codes = codes_by_col[cat_col]
+        known = codes >= 0
+        X[rows[known], offset + codes[known]] = X[rows[known], NUMERIC_FEATURES.index(num_col)]
+        return X
+
+    def to_json(self):
+        return json.dumps(self.categories)
+
+
+class LapTimeModel:
+    """Regressione ridge (forma chiusa) sul tempo sul giro."""
+    def __init__(self, alpha=RIDGE_ALPHA, encoder=None, coef=None, intercept=0.0):
+        self.alpha = alpha
+        self.encoder = encoder or FeatureEncoder()
+        self.coef = coef
+        self.intercept = intercept
+
+    def fit(self, laps):
+        X = self.encoder.fit(laps).transform(laps)
+        y = laps[TARGET].to_numpy(dtype=np.float64)
+        self.intercept = y.mean()
+        # (XᵀX + αI) w = Xᵀ(y - ȳ): il bias non viene regolarizzato
+        gram = X.T @ X
+        gram[np.diag_indices_from(gram)] += self.alpha
+        self.coef = np.linalg.solve(gram, X.T @ (y - self.intercept))
+        return self
+
+    def predict(self, laps):
+        """Predizione vettoriale per tutti i giri in un'unica moltiplicazione matrice-vettore."""
+        return self.encoder.transform(laps) @ self.coef + self.intercept
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, coef=self.coef, intercept=self.intercept, alpha=self.alpha,
+                 means=self.encoder.means, stds=self.encoder.stds,
+                 categories=np.array(self.encoder.to_json()), spec=np.array(model_spec(self.alpha)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, alpha=None):
+        """Ritorna None se il file è stato salvato con altri iperparametri o altre feature."""
+        with np.load(path, allow_pickle=False) as data:
+            saved_spec = str(data['spec']) if 'spec' in data.files else None
+            if saved_spec != model_spec(float(data['alpha']) if alpha is None else alpha):
+                return None
+            encoder = FeatureEncoder(data['means'], data['stds'], json.loads(str(data['categories'])))
+            return cls(float(data['alpha']), encoder, data['coef'], float(data['intercept']))
+
+
+def _score(y_true, y_pred):
+    err = y_pred - y_true
+    return {'mae': float(np.mean(np.abs(err))), 'rmse': float(np.sqrt(np.mean(err ** 2))), 'n': int(len(err))}
+
+
+def _cv_fold(root, season, alpha):
+    train = load_training_laps(root, filter=ds.field('Year') != season)
+    test = load_training_laps(root, filter=ds.field('Year') == season)
+    model = LapTimeModel(alpha).fit(train)
+    return season, _score(test[TARGET].to_numpy(), model.predict(test))
+
+
+def cross_validate(root=DATASET_DIR, alpha=RIDGE_ALPHA, workers=None):
+    """Validazione leave-one-season-out, una stagione per processo."""
+    seasons = dataset_seasons(root)
+    if len(seasons) < 2:
+        raise ValueError("Servono almeno due stagioni nel dataset per la validazione incrociata.")
+    with ProcessPoolExecutor(max_workers=workers or min(len(seasons), os.cpu_count())) as pool:
+        folds = pool.map(_cv_fold, [root] * len(seasons), seasons, [alpha] * len(seasons))
+        return dict(folds)
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(root=DATASET_DIR, models_dir=MODELS_DIR, alpha=RIDGE_ALPHA):
+    """
+    Ritorna il modello per la versione corrente del dataset e per gli
+    iperparametri richiesti: dalla memoria, dal disco
+    (<models_dir>/<versione>/lap_time_ridge-<spec>.npz) oppure addestrandolo da zero.
+    """
+    version = data_version(root)
+    spec = model_spec(alpha)
+    key = (version, spec)
+    with _models_lock:
+        if key in _models:
+            return _models[key]
+        path = os.path.join(models_dir, version, MODEL_FILE.format(spec=spec))
+        model = LapTimeModel.load(path, alpha) if os.path.isfile(path) else None
+        if model is None:
+            laps = load_training_laps(root)
+            if laps.empty:
+                raise ValueError("Dataset vuoto: esegui prima 'python -m f1_analyzer.batch dataset'.")
+            model = LapTimeModel(alpha).fit(laps)
+            model.save(path)
+        _models[key] = model
+        return model
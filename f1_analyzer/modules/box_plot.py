@@ -1,85 +1,104 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
-import pandas as pd
+import numpy as np
 import mplcyberpunk
 
 # Le costanti usate da questa specifica analisi
 from ..config import COMPOUND_COLORS, CANONICAL_COMPOUND_ORDER
+from .lap_table import lap_table
 
-def create_plot(session):
+def filter_laps(session):
     """
-    Funzione specializzata: prende un oggetto sessione, analizza i dati
-    e ritorna una figura Matplotlib con i box plot in stile "neon".
+    Giri usati dal box plot: tempi validi entro il 107% del giro più veloce
+    dello stesso pilota con la stessa mescola. Sono righe della tabella
+    compatta dei giri, quindi con i tempi già in secondi.
     """
-    plt.style.use("cyberpunk")
-    
-    try:
-        laps = session.laps
-        if laps.empty:
-            raise ValueError("Dati dei giri non disponibili per questa analisi.")
+    laps = lap_table(session).frame
+    laps = laps[laps['LapTime'].notna()]
+    fastest_lap = laps.groupby(['Driver', 'Compound'], observed=True)['LapTime'].transform('min')
+    laps_filtered = laps[laps['LapTime'] <= fastest_lap * 1.07].reset_index(drop=True)
 
-        # Preparazione dati
-        laps_clean = laps.dropna(subset=['LapTime']).copy()
-        laps_clean['LapTimeSeconds'] = laps_clean['LapTime'].dt.total_seconds()
+    if laps_filtered.empty:
+        raise ValueError("Nessun giro consistente trovato dopo il filtraggio.")
+    return laps_filtered
 
-        def filter_outliers(df):
-            fastest_lap = df['LapTimeSeconds'].min()
-            return df[df['LapTimeSeconds'] <= fastest_lap * 1.07]
 
-        laps_filtered = laps_clean.groupby(['Driver', 'Compound']).apply(filter_outliers).reset_index(drop=True)
+def _draw_driver(ax, driver, driver_laps):
+    compound_groups = driver_laps.groupby('Compound', observed=True)
+    compounds_used = set(compound_groups.groups)
+    dynamic_order = [c for c in CANONICAL_COMPOUND_ORDER if c in compounds_used]
 
-        if laps_filtered.empty:
-            raise ValueError("Nessun giro consistente trovato dopo il filtraggio.")
+    for compound in dynamic_order:
+        compound_laps = compound_groups.get_group(compound)
+        color = COMPOUND_COLORS.get(compound, 'white') # Prende il colore dal dizionario
 
-        # Creazione della griglia di grafici
-        drivers_to_plot = sorted(laps_filtered['Driver'].unique()) # Ordina i piloti alfabeticamente
-        ncols = 4
-        nrows = (len(drivers_to_plot) + ncols - 1) // ncols
-        fig, axes = plt.subplots(nrows=nrows, ncols=ncols, figsize=(16, 4 * nrows), sharey=True)
-        axes_flat = axes.flatten()
+        sns.boxplot(
+            x=np.full(len(compound_laps), compound),
+            y=compound_laps['LapTime'].to_numpy(),
+            ax=ax,
+            # Proprietà per creare l'effetto "neon outline"
+            boxprops={'facecolor':'none', 'edgecolor':color, 'linewidth':1.5},
+            whiskerprops={'color':color, 'linewidth':1.5},
+            capprops={'color':color, 'linewidth':1.5},
+            medianprops={'color':'#FF55A3', 'linewidth':2}, # Mediana di un colore diverso per risaltare
+            # Non mostriamo gli outlier individuali, il box plot è sufficiente
+            showfliers=False
+        )
 
-        for i, driver in enumerate(drivers_to_plot):
-            ax = axes_flat[i]
-            driver_laps = laps_filtered[laps_filtered['Driver'] == driver]
-            compounds_used = driver_laps['Compound'].unique()
-            dynamic_order = [c for c in CANONICAL_COMPOUND_ORDER if c in compounds_used]
-            
-            for compound in dynamic_order:
-                compound_laps = driver_laps[driver_laps['Compound'] == compound]
-                color = COMPOUND_COLORS.get(compound, 'white') # Prende il colore dal dizionario
-                
-                sns.boxplot(
-                    data=compound_laps,
-                    x='Compound',
-                    y='LapTimeSeconds',
-                    ax=ax,
-                    # Proprietà per creare l'effetto "neon outline"
-                    boxprops={'facecolor':'none', 'edgecolor':color, 'linewidth':1.5},
-                    whiskerprops={'color':color, 'linewidth':1.5},
-                    capprops={'color':color, 'linewidth':1.5},
-                    medianprops={'color':'#FF55A3', 'linewidth':2}, # Mediana di un colore diverso per risaltare
-                    # Non mostriamo gli outlier individuali, il box plot è sufficiente
-                    showfliers=False 
-                )
-            
-            ax.set_title(driver, fontsize=12, fontweight='bold')
-            ax.set_xlabel('')
-            ax.set_ylabel('')
-            ax.tick_params(axis='x', labelsize=9)
-            # Assicura che l'ordine sull'asse X sia corretto anche se disegniamo uno alla volta
-            ax.set_xlim(-0.5, len(dynamic_order) - 0.5)
-            ax.set_xticks(range(len(dynamic_order)))
-            ax.set_xticklabels(dynamic_order)
-
-        for i in range(len(drivers_to_plot), len(axes_flat)):
-            axes_flat[i].set_visible(False)
+    ax.set_title(driver, fontsize=12, fontweight='bold')
+    ax.set_xlabel('')
+    ax.set_ylabel('')
+    ax.tick_params(axis='x', labelsize=9)
+    # Assicura che l'ordine sull'asse X sia corretto anche se disegniamo uno alla volta
+    ax.set_xlim(-0.5, len(dynamic_order) - 0.5)
+    ax.set_xticks(range(len(dynamic_order)))
+    ax.set_xticklabels(dynamic_order)
 
+
+def draw_steps(session, laps_filtered):
+    """
+    Disegna il box plot una riga di piloti alla volta: dopo ogni riga produce
+    (figura, piloti fatti, totale), l'ultima volta con la figura completa.
+    Tutto il lavoro sulla figura avviene in chi consuma il generatore (nell'app,
+    il thread Tk che la mostra). Se il disegno fallisce la figura viene chiusa.
+    """
+    plt.style.use("cyberpunk")
+    # Creazione della griglia di grafici (piloti in ordine alfabetico, come le categorie)
+    driver_groups = laps_filtered.groupby('Driver', observed=True, sort=True)
+    drivers_to_plot = list(driver_groups.groups)
+    ncols = 4
+    nrows = (len(drivers_to_plot) + ncols - 1) // ncols
+    fig, axes = plt.subplots(nrows=nrows, ncols=ncols, figsize=(16, 4 * nrows), sharey=True)
+    try:
+        axes_flat = axes.flatten()
         fig.suptitle(f"{session.event['EventName']} {session.event.year} - {session.name}\nDistribuzione Tempi sul Giro", fontsize=14, y=1.0)
         fig.text(0.01, 0.5, 'Tempo sul Giro (secondi)', va='center', rotation='vertical', fontsize=12)
-        
+        for ax in axes_flat[len(drivers_to_plot):]:
+            ax.set_visible(False)
         fig.subplots_adjust(hspace=0.6)
-        fig.tight_layout(rect=[0.02, 0, 1, 0.96])
-        
+
+        for i, (driver, driver_laps) in enumerate(driver_groups):
+            _draw_driver(axes_flat[i], driver, driver_laps)
+            if i + 1 == len(drivers_to_plot):
+                fig.tight_layout(rect=[0.02, 0, 1, 0.96])
+            if (i + 1) % ncols == 0 or i + 1 == len(drivers_to_plot):
+                yield fig, i + 1, len(drivers_to_plot)
+    except Exception:
+        plt.close(fig)
+        raise
+
+
+def create_plot(session):
+    """
+    Funzione specializzata: prende un oggetto sessione, analizza i dati
+    e ritorna una figura Matplotlib con i box plot in stile "neon".
+    """
+    plt.style.use("cyberpunk")
+
+    try:
+        laps_filtered = filter_laps(session)
+        for fig, _, _ in draw_steps(session, laps_filtered):
+            pass
         return fig
 
     except Exception as e:
@@ -88,5 +107,6 @@ def create_plot(session):
         plt.style.use("cyberpunk")
         fig, ax = plt.subplots(figsize=(16, 8))
         ax.text(0.5, 0.5, f"Errore nella creazione del grafico:\n{e}", ha='center', va='center', fontsize=16, wrap=True)
+        fig.analysis_error = str(e)
 
-        return fig
\ No newline at end of file
+        return fig
@@ -0,0 +1,369 @@
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import fastf1 as ff1
+
+from ..config import (CACHE_DIR, CACHE_MAX_SIZE_GB, CACHE_COLD_DAYS, CACHE_COMPRESS_COLD, CACHE_HTTP_MAX_MB,
+                      CACHE_IN_USE_GRACE_S)
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: lock sul primo byte del file con msvcrt
+    fcntl = None
+    import msvcrt
+
+INDEX_FILE = 'cache_index.json'
+LOCK_FILE = 'cache_index.lock'
+HTTP_CACHE_FILE = 'fastf1_http_cache.sqlite'
+PICKLE_EXT = '.ff1pkl'
+COMPRESSED_EXT = PICKLE_EXT + '.gz'
+GB = 1024 ** 3
+MB = 1024 ** 2
+
+
+def _crc32(path, chunk_size=1024 * 1024):
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def _pickle_looks_complete(path):
+    """Un pickle integro termina sempre con l'opcode STOP ('.')."""
+    try:
+        size = os.path.getsize(path)
+        if size == 0:
+            return False
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'.'
+    except OSError:
+        return False
+
+
+class CacheManager:
+    """
+    Gestisce la cartella di cache di fastf1: tiene un indice delle sessioni in
+    cache (dimensione, ultimo accesso, checksum dei file), comprime a richiesta
+    le voci non usate da CACHE_COLD_DAYS giorni ed elimina le meno usate di
+    recente quando si supera CACHE_MAX_SIZE_GB.
+
+    Una "voce" è la cartella che fastf1 crea per ogni sessione
+    (<cache>/<anno>/<evento>/<sessione>/*.ff1pkl). Il database HTTP di fastf1
+    (fastf1_http_cache.sqlite) non è una voce: viene sfoltito a parte quando
+    supera CACHE_HTTP_MAX_MB.
+
+    Più processi possono condividere la cartella: le modifiche all'indice e
+    le eliminazioni avvengono sotto un lock su file (cache_index.lock).
+    """
+    def __init__(self, cache_dir=CACHE_DIR, max_size_gb=CACHE_MAX_SIZE_GB, cold_days=CACHE_COLD_DAYS,
+                 compress_cold=CACHE_COMPRESS_COLD, in_use_grace_s=CACHE_IN_USE_GRACE_S,
+                 http_max_mb=CACHE_HTTP_MAX_MB):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size_bytes = int(max_size_gb * GB)
+        self.cold_seconds = cold_days * 24 * 3600
+        self.compress_cold = compress_cold
+        self.in_use_grace_s = in_use_grace_s
+        self.http_max_bytes = int(http_max_mb * MB)
+        self.index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        self.lock_path = os.path.join(self.cache_dir, LOCK_FILE)
+        self.http_cache_path = os.path.join(self.cache_dir, HTTP_CACHE_FILE)
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        self._enabled = False
+
+    @contextmanager
+    def _locked(self):
+        """
+        Lock tra thread (RLock) e tra processi (lock sul file), rientrante:
+        il lock sul file viene preso solo dalla chiamata più esterna.
+        """
+        with self._lock:
+            if self._lock_depth == 0:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self._lock_file = open(self.lock_path, 'a+')
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+                else:
+                    self._lock_file.seek(0)
+                    while True:
+                        try:
+                            msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            # LK_LOCK rinuncia dopo 10 s: si riprova finché l'altro processo non finisce
+                            continue
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    if fcntl is not None:
+                        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    else:
+                        self._lock_file.seek(0)
+                        msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    # --- Indice ---
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                return json.load(f).get('entries', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, entries):
+        # Scrittura atomica: più processi possono condividere la stessa cache
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'entries': entries}, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def entry_key(self, session):
+        # fastf1 salva i file in <cache>/<api_path senza '/static/'>
+        return session.api_path[8:].strip('/')
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, *key.split('/'))
+
+    def _scan_entry(self, key, previous=None, checksum=False):
+        """
+        Legge le dimensioni dei file di una voce, riusando i CRC dei file
+        invariati. I CRC dei file nuovi o riscritti si calcolano solo con
+        `checksum=True` (dopo un caricamento), altrimenti restano da calcolare.
+        """
+        entry_dir = self._entry_dir(key)
+        old_files = (previous or {}).get('files', {})
+        files = {}
+        for name in sorted(os.listdir(entry_dir)):
+            if not name.endswith((PICKLE_EXT, COMPRESSED_EXT)):
+                continue
+            path = os.path.join(entry_dir, name)
+            stat = os.stat(path)
+            old = old_files.get(name)
+            if old and old['size'] == stat.st_size and old['mtime'] == stat.st_mtime:
+                crc = old.get('crc32')
+            else:
+                crc = None
+            if crc is None and checksum:
+                crc = _crc32(path)
+            files[name] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'crc32': crc}
+        return {
+            'size': sum(f['size'] for f in files.values()),
+            'last_access': (previous or {}).get('last_access', time.time()),
+            'compressed': any(name.endswith(COMPRESSED_EXT) for name in files),
+            'files': files,
+        }
+
+    def reindex(self):
+        """Allinea l'indice al contenuto reale della cartella (solo dimensioni, nessun CRC)."""
+        with self._locked():
+            entries = self._read_index()
+            found = {}
+            for dirpath, _, filenames in os.walk(self.cache_dir):
+                if any(name.endswith((PICKLE_EXT, COMPRESSED_EXT)) for name in filenames):
+                    key = os.path.relpath(dirpath, self.cache_dir).replace(os.sep, '/')
+                    found[key] = self._scan_entry(key, entries.get(key))
+            self._write_index(found)
+            return found
+
+    # --- Ciclo di vita di una sessione ---
+
+    def enable(self):
+        """
+        Attiva la cache di fastf1 sulla cartella gestita (idempotente). La
+        prima chiamata scorre la cartella: l'app la esegue in background.
+        """
+        with self._lock:
+            if self._enabled:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            ff1.Cache.enable_cache(self.cache_dir)
+            self.reindex()
+            self._enabled = True
+
+    def prepare(self, session):
+        """
+        Da chiamare prima di `session.load()`: decomprime una voce fredda e
+        rimuove i file corrotti, così fastf1 li riscarica invece di fallire.
+        Ritorna il numero di file rimossi.
+        """
+        key = self.entry_key(session)
+        entry_dir = self._entry_dir(key)
+        if not os.path.isdir(entry_dir):
+            return 0
+        with self._locked():
+            removed = 0
+            for name in os.listdir(entry_dir):
+                if name.endswith(COMPRESSED_EXT) and not self._decompress(os.path.join(entry_dir, name)):
+                    removed += 1
+            removed += len(self.verify(key, repair=True))
+            # Segna la voce come in uso: un altro processo non la elimina durante il caricamento
+            entries = self._read_index()
+            if key in entries:
+                entries[key]['last_access'] = time.time()
+                self._write_index(entries)
+            return removed
+
+    def touch(self, session):
+        """
+        Da chiamare dopo `session.load()`: aggiorna dimensione e ultimo accesso
+        e calcola i CRC dei soli file di questa voce.
+        """
+        key = self.entry_key(session)
+        if not os.path.isdir(self._entry_dir(key)):
+            return
+        with self._locked():
+            entries = self._read_index()
+            entry = self._scan_entry(key, entries.get(key), checksum=True)
+            entry['last_access'] = time.time()
+            entries[key] = entry
+            self._write_index(entries)
+
+    # --- Integrità ---
+
+    def verify(self, key, deep=False, repair=False):
+        """
+        Controlla i pickle di una voce. Il controllo rapido verifica che il file
+        non sia vuoto o troncato; con `deep=True` confronta anche il CRC32
+        registrato nell'indice (solo se presente e se dimensione e mtime non sono
+        cambiati, altrimenti il file è stato legittimamente riscritto da fastf1).
+        Ritorna la lista dei file corrotti; con `repair=True` li elimina.
+        """
+        entry_dir = self._entry_dir(key)
+        recorded = self._read_index().get(key, {}).get('files', {})
+        corrupt = []
+        for name in os.listdir(entry_dir):
+            if not name.endswith(PICKLE_EXT):
+                continue
+            path = os.path.join(entry_dir, name)
+            ok = _pickle_looks_complete(path)
+            old = recorded.get(name)
+            if ok and deep and old and old.get('crc32') is not None:
+                stat = os.stat(path)
+                if old['size'] == stat.st_size and old['mtime'] == stat.st_mtime:
+                    ok = _crc32(path) == old['crc32']
+            if not ok:
+                corrupt.append(name)
+                if repair:
+                    print(f"Cache: file corrotto rimosso {key}/{name}")
+                    os.remove(path)
+        return corrupt
+
+    def verify_all(self, deep=False, repair=False):
+        return {key: bad for key in self.reindex()
+                if (bad := self.verify(key, deep=deep, repair=repair))}
+
+    # --- Compressione ed eviction ---
+
+    def _compress(self, path):
+        tmp_path = path + '.gz.tmp'
+        with open(path, 'rb') as src, gzip.open(tmp_path, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, path + '.gz')
+        os.remove(path)
+
+    def _decompress(self, path):
+        """Ritorna False se l'archivio è corrotto (e in tal caso lo elimina)."""
+        target = path[:-len('.gz')]
+        tmp_path = target + '.tmp'
+        try:
+            with gzip.open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        except (OSError, EOFError, zlib.error):
+            print(f"Cache: archivio corrotto rimosso {path}")
+            for p in (path, tmp_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            return False
+        os.replace(tmp_path, target)
+        os.remove(path)
+        return True
+
+    def _trim_http_cache(self):
+        """
+        Sfoltisce il database HTTP di fastf1 oltre CACHE_HTTP_MAX_MB: prima le
+        risposte scadute, poi, se non basta, tutto. Passa dalla sessione
+        requests-cache di fastf1, che tiene aperto il file.
+        """
+        if not os.path.exists(self.http_cache_path) or os.path.getsize(self.http_cache_path) <= self.http_max_bytes:
+            return
+        requests_session = getattr(ff1.Cache, '_requests_session_cached', None)
+        if requests_session is None:
+            return
+        try:
+            requests_session.cache.delete(expired=True)
+            if os.path.getsize(self.http_cache_path) > self.http_max_bytes:
+                requests_session.cache.clear()
+                requests_session.cache.responses.vacuum()
+            print(f"Cache: database HTTP ridotto a {os.path.getsize(self.http_cache_path) / MB:.0f} MB.")
+        except Exception as e:
+            print(f"Cache: impossibile ridurre il database HTTP: {e}")
+
+    def enforce_budget(self, protect=()):
+        """
+        Comprime le voci fredde (se attivato) e poi elimina le voci meno usate
+        di recente finché la cache, database HTTP compreso, non rientra in
+        CACHE_MAX_SIZE_GB. Le chiavi in `protect` (es. la sessione appena
+        caricata) e le voci usate da meno di CACHE_IN_USE_GRACE_S non vengono
+        toccate. Ritorna la lista delle voci eliminate.
+        """
+        with self._locked():
+            self._trim_http_cache()
+            entries = self.reindex()
+            now = time.time()
+            for key, entry in entries.items():
+                if (not self.compress_cold or key in protect or entry['compressed']
+                        or now - entry['last_access'] < self.cold_seconds):
+                    continue
+                entry_dir = self._entry_dir(key)
+                for name in entry['files']:
+                    if name.endswith(PICKLE_EXT):
+                        self._compress(os.path.join(entry_dir, name))
+                entries[key] = self._scan_entry(key, entry)
+
+            evicted = []
+            total = sum(entry['size'] for entry in entries.values()) + self.http_cache_size()
+            for key in sorted(entries, key=lambda k: entries[k]['last_access']):
+                if total <= self.max_size_bytes:
+                    break
+                if key in protect or now - entries[key]['last_access'] < self.in_use_grace_s:
+                    continue
+                shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+                try:
+                    # Rimuove anche le cartelle di evento/anno rimaste vuote
+                    os.removedirs(os.path.dirname(self._entry_dir(key)))
+                except OSError:
+                    pass
+                total -= entries.pop(key)['size']
+                evicted.append(key)
+            self._write_index(entries)
+            if evicted:
+                print(f"Cache: eliminate {len(evicted)} sessioni per rientrare in {self.max_size_bytes / GB:.1f} GB.")
+            return evicted
+
+    def http_cache_size(self):
+        try:
+            return os.path.getsize(self.http_cache_path)
+        except OSError:
+            return 0
+
+    def total_size(self):
+        return sum(entry['size'] for entry in self._read_index().values()) + self.http_cache_size()
+
+
+# Istanza condivisa: app desktop e demo usano la stessa cartella configurata
+cache_manager = CacheManager()
@@ -0,0 +1,296 @@
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import fastf1 as ff1
+import fastf1.plotting
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+import mplcyberpunk
+
+from ..config import CACHE_DIR, CIRCUIT_LENGTH_TOLERANCE, SEASON_WORKERS
+from .cache_manager import cache_manager
+from .lap_table import fastest_lap
+
+# Passo della griglia di distanza di riferimento (m)
+GRID_STEP_M = 5.0
+CHANNELS = ['Speed', 'Throttle', 'Brake', 'nGear', 'RPM']
+CIRCUITS_DIR = os.path.join(CACHE_DIR, 'circuits')
+
+
+def circuit_key(session):
+    """Nome breve del circuito, oppure la località dell'evento."""
+    try:
+        name = session.session_info['Meeting']['Circuit']['ShortName']
+    except Exception:
+        name = session.event['Location']
+    return re.sub(r'[^0-9A-Za-z]+', '_', str(name)).strip('_')
+
+
+def official_corner_count(session):
+    """Numero di curve ufficiali (MultiViewer) del circuito, None se non disponibili."""
+    try:
+        return len(session.get_circuit_info().corners)
+    except Exception:
+        return None
+
+
+class CircuitReference:
+    """
+    Tracciato di riferimento di un circuito: griglia di distanza regolare con
+    le coordinate X/Y corrispondenti e l'indice delle curve. Viene costruito
+    una volta dai dati di posizione e salvato su disco. Il tracciato può
+    cambiare tra le stagioni (es. Barcellona 2023): lunghezza e numero di
+    curve ufficiali fanno da firma del layout (vedi `matches`).
+    """
+    def __init__(self, key, distance, x, y, corner_distance, corner_labels, official_corners=None):
+        self.key = key
+        self.distance = distance
+        self.x = x
+        self.y = y
+        self.corner_distance = corner_distance
+        self.corner_labels = list(corner_labels)
+        self.official_corners = official_corners
+        self._tree = cKDTree(np.column_stack([x, y]))
+
+    @property
+    def length(self):
+        return self.distance[-1]
+
+    def matches(self, length, official_corners=None):
+        """Vero se un giro lungo `length` con quelle curve ufficiali percorre questo stesso layout."""
+        if abs(length - self.length) > CIRCUIT_LENGTH_TOLERANCE * self.length:
+            return False
+        return official_corners is None or self.official_corners is None or official_corners == self.official_corners
+
+    # --- Costruzione e persistenza ---
+
+    @classmethod
+    def from_lap(cls, key, lap, session=None):
+        telemetry = lap.get_telemetry()
+        distance = telemetry['Distance'].to_numpy(dtype=np.float64)
+        grid = np.arange(0.0, distance.max(), GRID_STEP_M)
+        x = np.interp(grid, distance, telemetry['X'].to_numpy(dtype=np.float64))
+        y = np.interp(grid, distance, telemetry['Y'].to_numpy(dtype=np.float64))
+        reference = cls(key, grid, x, y, np.array([]), [])
+        reference.corner_distance, reference.corner_labels, official = reference._find_corners(session)
+        if official:
+            reference.official_corners = len(reference.corner_labels)
+        return reference
+
+    def _find_corners(self, session):
+        # Curve ufficiali (MultiViewer) proiettate sul tracciato, se disponibili
+        try:
+            corners = session.get_circuit_info().corners
+            distance = self.project(corners['X'].to_numpy(), corners['Y'].to_numpy())
+            labels = (corners['Number'].astype(str) + corners['Letter'].fillna('').astype(str)).tolist()
+            order = np.argsort(distance)
+            return distance[order], [labels[i] for i in order], True
+        except Exception:
+            pass
+        # Altrimenti picchi di curvatura del tracciato di riferimento
+        heading = np.unwrap(np.arctan2(np.gradient(self.y), np.gradient(self.x)))
+        window = max(1, int(50 / GRID_STEP_M))
+        curvature = np.abs(np.convolve(np.gradient(heading), np.ones(window) / window, mode='same'))
+        threshold = np.deg2rad(1.5)
+        peaks = np.flatnonzero((curvature[1:-1] > threshold)
+                               & (curvature[1:-1] >= curvature[:-2]) & (curvature[1:-1] > curvature[2:])) + 1
+        selected = []
+        for idx in peaks[np.argsort(-curvature[peaks])]:
+            if all(abs(self.distance[idx] - self.distance[j]) > 150 for j in selected):
+                selected.append(idx)
+        selected.sort()
+        return self.distance[selected], [str(i + 1) for i in range(len(selected))], False
+
+    def save(self, directory=CIRCUITS_DIR):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.key}.npz")
+        tmp_path = path + '.tmp.npz'
+        # -1: curve ufficiali non disponibili (npz senza pickle non salva None)
+        np.savez(tmp_path, distance=self.distance, x=self.x, y=self.y,
+                 corner_distance=self.corner_distance, corner_labels=np.array(self.corner_labels, dtype=str),
+                 official_corners=np.array(-1 if self.official_corners is None else self.official_corners))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, key, directory=CIRCUITS_DIR):
+        path = os.path.join(directory, f"{key}.npz")
+        if not os.path.isfile(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            official = int(data['official_corners']) if 'official_corners' in data.files else -1
+            return cls(key, data['distance'], data['x'], data['y'], data['corner_distance'], data['corner_labels'].tolist(),
+                       None if official < 0 else official)
+
+    # --- Proiezione ---
+
+    def project(self, x, y):
+        """Distanza sul riferimento del punto più vicino a ogni coppia (x, y)."""
+        _, idx = self._tree.query(np.column_stack([x, y]))
+        return self.distance[idx]
+
+    def align(self, telemetry):
+        """
+        Porta una telemetria (con X, Y, Time) sulla griglia di riferimento:
+        ritorna un DataFrame indicizzato per distanza con tempo trascorso e canali.
+        """
+        projected = self.project(telemetry['X'].to_numpy(dtype=np.float64), telemetry['Y'].to_numpy(dtype=np.float64))
+        # I primi campioni del giro possono proiettarsi sulla fine del tracciato (traguardo)
+        head = np.arange(len(projected)) < len(projected) // 10
+        projected = np.where(head & (projected > 0.9 * self.length), projected - self.length, projected)
+        projected = np.maximum.accumulate(projected)
+        # np.interp vuole ascisse strettamente crescenti: dei tratti piatti resta il primo campione
+        keep = np.concatenate([[True], np.diff(projected) > 0])
+        projected = projected[keep]
+
+        elapsed = (telemetry['Time'] - telemetry['Time'].iloc[0]).dt.total_seconds().to_numpy()[keep]
+        aligned = {'Distance': self.distance, 'Time': np.interp(self.distance, projected, elapsed)}
+        for channel in CHANNELS:
+            aligned[channel] = np.interp(self.distance, projected, telemetry[channel].to_numpy(dtype=np.float64)[keep])
+        return pd.DataFrame(aligned)
+
+
+_reference_lock = threading.Lock()
+_references = {}
+
+
+def get_reference(session, lap, length=None):
+    """
+    Riferimento del circuito: dalla memoria o dal disco se la firma del layout
+    corrisponde al giro `lap` (lungo `length`), altrimenti ricostruito da `lap`.
+    """
+    key = circuit_key(session)
+    if length is None:
+        length = float(lap.get_telemetry()['Distance'].max())
+    official_corners = official_corner_count(session)
+    with _reference_lock:
+        reference = _references.get(key) or CircuitReference.load(key)
+        if reference is None or not reference.matches(length, official_corners):
+            reference = CircuitReference.from_lap(key, lap, session)
+            reference.save()
+        _references[key] = reference
+        return reference
+
+
+def _fastest_lap_slice(session, driver=None):
+    """Il giro più veloce (di un pilota o assoluto) e la sola telemetria che serve."""
+    lap = fastest_lap(session, driver)
+    if lap is None or pd.isna(lap['LapTime']):
+        raise ValueError(f"Nessun giro valido in {session.event.year} {session.event['EventName']}.")
+    telemetry = lap.get_telemetry()[['Time', 'X', 'Y', 'Distance'] + CHANNELS].copy()
+    return {
+        'year': session.event.year,
+        'driver': lap['Driver'],
+        'team': lap['Team'],
+        'lap_time': lap['LapTime'],
+        'length': float(telemetry['Distance'].max()),
+        'official_corners': official_corner_count(session),
+        'telemetry': telemetry,
+    }, lap
+
+
+def _load_fastest_lap(year, location, session_name, driver=None):
+    cache_manager.enable()
+    session = ff1.get_session(year, location, session_name)
+    cache_manager.prepare(session)
+    session.load(laps=True, telemetry=True, weather=False, messages=False)
+    cache_manager.touch(session)
+    lap_slice, _ = _fastest_lap_slice(session, driver)
+    # La sessione intera viene rilasciata qui: resta solo la fetta del giro veloce
+    return lap_slice
+
+
+def compare_seasons(session, other_years, driver=None, workers=SEASON_WORKERS):
+    """
+    Allinea il giro più veloce della sessione corrente e quelli della stessa
+    sessione sullo stesso circuito negli anni indicati sulla griglia di
+    riferimento del circuito. Le altre sessioni si caricano in parallelo su
+    processi separati (lo stato di fastf1 non regge più thread) e ne torna
+    solo la fetta del giro veloce. Un anno con un layout diverso non si
+    confronta: proiettarlo su questo tracciato darebbe distanze sbagliate.
+    """
+    current, current_lap = _fastest_lap_slice(session, driver)
+    reference = get_reference(session, current_lap, current['length'])
+
+    location = session.event['Location']
+    others = []
+    if other_years:
+        # 'spawn': i processi non ereditano lo stato di Tk e dei thread dell'app (fork non è sicuro)
+        with ProcessPoolExecutor(max_workers=min(workers, len(other_years)),
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            others = list(pool.map(_load_fastest_lap, other_years, [location] * len(other_years),
+                                   [session.name] * len(other_years), [driver] * len(other_years)))
+    for lap_slice in others:
+        if not reference.matches(lap_slice['length'], lap_slice['official_corners']):
+            raise ValueError(f"Il tracciato di {location} nel {lap_slice['year']} è diverso da quello del "
+                             f"{current['year']}: i giri non sono confrontabili.")
+
+    laps = [current] + others
+    for lap_slice in laps:
+        lap_slice['aligned'] = reference.align(lap_slice.pop('telemetry'))
+    return reference, laps
+
+
+def create_plot(session, other_years, driver=None):
+    """
+    Confronto tra stagioni sullo stesso circuito: delta tempo rispetto al
+    giro della sessione corrente e canali di telemetria per distanza,
+    con le curve indicate sull'asse superiore.
+    """
+    plt.style.use("cyberpunk")
+    fig = None
+
+    try:
+        fastf1.plotting.setup_mpl()
+        reference, laps = compare_seasons(session, other_years, driver)
+        base = laps[0]['aligned']
+
+        plot_ratios = [1, 3, 2, 1, 1]
+        fig, axes = plt.subplots(5, 1, figsize=(16, 16), gridspec_kw={'height_ratios': plot_ratios}, sharex=True)
+
+        for lap_slice in laps:
+            aligned = lap_slice['aligned']
+            lap_time = str(lap_slice['lap_time']).split(' ')[-1][:-3]
+            label = f"{lap_slice['year']} {lap_slice['driver']} ({lap_time})"
+            line, = axes[0].plot(aligned['Distance'], aligned['Time'] - base['Time'], label=label)
+            color = line.get_color()
+            axes[1].plot(aligned['Distance'], aligned['Speed'], color=color)
+            axes[2].plot(aligned['Distance'], aligned['Throttle'], color=color)
+            axes[3].plot(aligned['Distance'], aligned['Brake'], color=color)
+            axes[4].plot(aligned['Distance'], aligned['nGear'], color=color)
+
+        axes[0].axhline(0, color='white', linestyle='--', linewidth=0.8)
+        axes[0].set_ylabel(f"Gap vs {laps[0]['year']} (s)")
+        axes[0].legend(loc="upper left", frameon=True, facecolor='black', framealpha=0.7)
+        for ax, label in zip(axes[1:], ['Velocità', 'Acceleratore', 'Freno', 'Marcia']):
+            ax.set_ylabel(label)
+        for ax in axes:
+            for corner in reference.corner_distance:
+                ax.axvline(corner, color='grey', linestyle=':', linewidth=0.6)
+
+        corner_axis = axes[0].secondary_xaxis('top')
+        corner_axis.set_xticks(reference.corner_distance)
+        corner_axis.set_xticklabels(reference.corner_labels, fontsize=8)
+
+        axes[-1].set_xlabel('Distanza sul tracciato di riferimento (m)')
+        years = ' vs '.join(str(lap_slice['year']) for lap_slice in laps)
+        fig.suptitle(f"{session.event['EventName']} - {session.name}\nConfronto Stagioni {years}", fontsize=16)
+        fig.tight_layout(rect=[0, 0, 1, 0.96])
+
+        return fig
+
+    except Exception as e:
+        print(f"Errore durante la creazione del confronto tra stagioni: {e}")
+        # Chiude l'eventuale figura parziale, altrimenti resterebbe orfana in pyplot
+        if fig is not None:
+            plt.close(fig)
+        plt.style.use("cyberpunk")
+        fig, ax = plt.subplots(figsize=(15, 10))
+        ax.text(0.5, 0.5, f"Impossibile generare il grafico:\n{e}",
+                ha='center', va='center', fontsize=16, wrap=True)
+        fig.analysis_error = str(e)
+        return fig
@@ -0,0 +1,198 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import mplcyberpunk
+
+from .lap_table import fastest_lap, lap_table
+from .memory_tracker import SessionCache
+from .telemetry_comparison import draw_comparison
+
+# Passo della griglia di distanza comune a tutti i giri (m)
+GRID_STEP_M = 5.0
+CHANNELS = ['Speed', 'Throttle', 'Brake', 'nGear', 'RPM', 'DRS']
+# Canali a valori discreti: si prende il campione precedente invece di interpolare
+DISCRETE_CHANNELS = {'Brake', 'nGear', 'DRS'}
+
+# Giri più veloci di tutti i piloti ricampionati sulla griglia comune, una volta per sessione
+_resampled_cache = SessionCache('delta_matrix')
+
+
+def _lap_samples(lap):
+    """Distanza, tempo trascorso (s) e canali dei campioni della telemetria del giro."""
+    telemetry = lap.get_car_data().add_distance()
+    distance = telemetry['Distance'].to_numpy(dtype=np.float64)
+    elapsed = (telemetry['Time'] - telemetry['Time'].iloc[0]).dt.total_seconds().to_numpy()
+    channels = {channel: telemetry[channel].to_numpy(dtype=np.float64) for channel in CHANNELS}
+    return distance, elapsed, channels
+
+
+def _corner_bounds(session, lap, length):
+    """
+    Curve del circuito (dal riferimento del confronto tra stagioni) riportate
+    sulla lunghezza della griglia, e confini dei tratti di ciascuna curva:
+    i punti medi tra curve consecutive, più partenza e traguardo.
+    """
+    from .circuit_comparison import get_reference
+    try:
+        reference = get_reference(session, lap, length)
+        corner_distance = reference.corner_distance * (length / reference.length)
+        labels = reference.corner_labels
+    except Exception as e:
+        print(f"Curve non disponibili: {e}")
+        corner_distance, labels = np.array([]), []
+    bounds = np.concatenate([[0.0], (corner_distance[1:] + corner_distance[:-1]) / 2, [length]])
+    return labels, bounds
+
+
+def _resample_fastest_laps(session):
+    laps, samples = [], []
+    for driver in lap_table(session).drivers:
+        lap = fastest_lap(session, driver)
+        if lap is None:
+            continue
+        try:
+            samples.append(_lap_samples(lap))
+            laps.append(lap)
+        except Exception as e:
+            print(f"Telemetria non disponibile per {driver}: {e}")
+    if len(laps) < 2:
+        raise ValueError("Servono almeno due piloti con un giro veloce e la telemetria.")
+
+    # Le distanze integrate dalla velocità differiscono di qualche metro tra i giri:
+    # ognuna viene scalata sulla lunghezza mediana, così tutti i giri finiscono insieme
+    length = float(np.median([distance[-1] for distance, _, _ in samples]))
+    distance = np.linspace(0.0, length, int(length // GRID_STEP_M) + 1)
+    time = np.empty((len(laps), len(distance)))
+    channels = {channel: np.empty((len(laps), len(distance))) for channel in CHANNELS}
+    for i, (lap_distance, elapsed, lap_channels) in enumerate(samples):
+        lap_distance = lap_distance * (length / lap_distance[-1])
+        time[i] = np.interp(distance, lap_distance, elapsed)
+        previous = np.clip(np.searchsorted(lap_distance, distance, side='right') - 1, 0, len(lap_distance) - 1)
+        for channel, values in lap_channels.items():
+            channels[channel][i] = values[previous] if channel in DISCRETE_CHANNELS else np.interp(distance, lap_distance, values)
+
+    # Piloti ordinati dal giro più veloce
+    lap_time = np.array([lap['LapTime'].total_seconds() for lap in laps])
+    order = np.argsort(lap_time, kind='stable')
+    corner_labels, bounds = _corner_bounds(session, laps[order[0]], length)
+    return {
+        'drivers': [laps[i]['Driver'] for i in order],
+        'laps': [laps[i] for i in order],
+        'lap_time': lap_time[order],
+        'distance': distance,
+        'time': time[order],
+        'channels': {channel: values[order] for channel, values in channels.items()},
+        'corner_labels': corner_labels,
+        'bound_idx': np.searchsorted(distance, bounds).clip(0, len(distance) - 1),
+    }
+
+
+def resampled_laps(session):
+    """Giri più veloci di tutti i piloti sulla stessa griglia di distanza (in cache per sessione)."""
+    return _resampled_cache.get_or_compute(session, lambda: _resample_fastest_laps(session))
+
+
+def delta_matrices(data):
+    """
+    Gap tra tutte le coppie di piloti in un solo passaggio vettoriale:
+    `final[i, j]` è il distacco sul giro di i da j (positivo se i è più lento),
+    `corners[i, j, c]` il tempo perso da i rispetto a j nel tratto della curva c.
+    """
+    lap_time = data['lap_time']
+    final = lap_time[:, None] - lap_time[None, :]
+    # (piloti, piloti, confini): gap cumulato di ogni coppia ai confini dei tratti
+    cumulative = data['time'][:, None, data['bound_idx']] - data['time'][None, :, data['bound_idx']]
+    corners = np.diff(cumulative, axis=-1)
+    return final, corners
+
+
+def pair_telemetry(data, driver1_code, driver2_code):
+    """
+    Argomenti per `draw_comparison` presi dai giri già ricampionati: i due
+    giri, `ref_tel` del pilota 1 e `com_tel` del pilota 2 con DeltaTime.
+    """
+    drivers = data['drivers']
+    i, j = drivers.index(driver1_code), drivers.index(driver2_code)
+    ref_tel = pd.DataFrame({'Distance': data['distance'],
+                            **{channel: values[i] for channel, values in data['channels'].items()}})
+    com_tel = pd.DataFrame({'Distance': data['distance'],
+                            **{channel: values[j] for channel, values in data['channels'].items()}})
+    com_tel['DeltaTime'] = data['time'][j] - data['time'][i]
+    return data['laps'][i], data['laps'][j], ref_tel, com_tel
+
+
+def create_pair_plot(session, data, driver1_code, driver2_code):
+    """Confronto telemetrico di due piloti della matrice, senza ricalcolare l'allineamento."""
+    plt.style.use("cyberpunk")
+    fastest_d1, fastest_d2, ref_tel, com_tel = pair_telemetry(data, driver1_code, driver2_code)
+    fig = draw_comparison(session, driver1_code, driver2_code, fastest_d1, fastest_d2, ref_tel, com_tel)
+    return fig, ref_tel, com_tel
+
+
+def create_plot(session):
+    """
+    Matrice dei distacchi tra tutte le coppie di piloti sul giro più veloce e
+    tempo perso curva per curva rispetto al più veloce. Ritorna la figura e i
+    dati per il selettore interattivo (clic su una cella: confronto telemetrico).
+    """
+    plt.style.use("cyberpunk")
+    fig = None
+
+    try:
+        data = resampled_laps(session)
+        final, corners = delta_matrices(data)
+        drivers = data['drivers']
+        n = len(drivers)
+
+        fig, (ax_matrix, ax_corners) = plt.subplots(1, 2, figsize=(18, 9), gridspec_kw={'width_ratios': [1, 1.3]})
+        limit = max(np.abs(final).max(), 1e-3)
+        image = ax_matrix.imshow(final, cmap='coolwarm', vmin=-limit, vmax=limit)
+        ax_matrix.set_xticks(range(n))
+        ax_matrix.set_xticklabels(drivers, rotation=90, fontsize=9)
+        ax_matrix.set_yticks(range(n))
+        ax_matrix.set_yticklabels(drivers, fontsize=9)
+        ax_matrix.set_xlabel('Confronto con')
+        ax_matrix.set_ylabel('Pilota')
+        ax_matrix.grid(False)
+        ax_matrix.set_title('Distacco sul giro più veloce (s)', fontsize=12)
+        if n <= 20:
+            for i in range(n):
+                for j in range(n):
+                    if i != j:
+                        ax_matrix.text(j, i, f"{final[i, j]:+.2f}", ha='center', va='center', fontsize=6, color='black')
+        fig.colorbar(image, ax=ax_matrix, fraction=0.046, pad=0.04)
+
+        if corners.shape[-1] > 1:
+            # Riga del più veloce (indice 0): tempo perso da ogni pilota curva per curva
+            lost = corners[:, 0, :]
+            corner_limit = max(np.abs(lost).max(), 1e-3)
+            image = ax_corners.imshow(lost, cmap='coolwarm', vmin=-corner_limit, vmax=corner_limit, aspect='auto')
+            ax_corners.set_xticks(range(len(data['corner_labels'])))
+            ax_corners.set_xticklabels(data['corner_labels'], fontsize=8)
+            ax_corners.set_yticks(range(n))
+            ax_corners.set_yticklabels(drivers, fontsize=9)
+            ax_corners.set_xlabel('Curva')
+            ax_corners.grid(False)
+            fig.colorbar(image, ax=ax_corners, fraction=0.046, pad=0.04)
+        else:
+            ax_corners.text(0.5, 0.5, "Curve del circuito non disponibili", ha='center', va='center', fontsize=12)
+            ax_corners.set_axis_off()
+        ax_corners.set_title(f"Tempo perso per curva rispetto a {drivers[0]} (s)", fontsize=12)
+
+        fig.suptitle(f"{session.event.year} {session.event['EventName']} - {session.name}\n"
+                     f"Distacchi tra tutti i piloti (clic su una cella per il confronto telemetrico)", fontsize=14)
+        fig.tight_layout()
+
+        return fig, {**data, 'final': final, 'corners': corners}
+
+    except Exception as e:
+        print(f"Errore durante la creazione della matrice dei distacchi: {e}")
+        # Chiude l'eventuale figura parziale, altrimenti resterebbe orfana in pyplot
+        if fig is not None:
+            plt.close(fig)
+        plt.style.use("cyberpunk")
+        fig, ax = plt.subplots(figsize=(16, 8))
+        ax.text(0.5, 0.5, f"Impossibile generare il grafico:\n{e}",
+                ha='center', va='center', fontsize=16, wrap=True)
+        fig.analysis_error = str(e)
+        return fig, None
@@ -0,0 +1,156 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from ..config import EXPORT_CHUNK_ROWS, EXPORT_DPI
+
+DATA_FORMATS = ('.csv', '.parquet')
+FIGURE_FORMATS = ('.png', '.pdf', '.svg')
+
+
+def frame_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS, **constants):
+    """
+    Converte un DataFrame in tabelle Arrow di al più `chunk_rows` righe. Le
+    colonne costanti (es. Driver) vengono aggiunte ai soli chunk Arrow, senza
+    copiare il DataFrame di partenza.
+    """
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    # Colonne object tutte vuote (es. DriverAhead): stringhe, così lo schema resta uguale tra i chunk
+    schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema],
+                       metadata=schema.metadata)
+    for start in range(0, len(df), chunk_rows):
+        table = pa.Table.from_pandas(df.iloc[start:start + chunk_rows], schema=schema, preserve_index=False)
+        for name, value in constants.items():
+            table = table.append_column(name, pa.repeat(value, table.num_rows))
+        yield table
+
+
+def _csv_friendly(table):
+    # Le durate in CSV diventano secondi: i nanosecondi interi non sono leggibili
+    for i, field in enumerate(table.schema):
+        if pa.types.is_duration(field.type):
+            seconds = pc.divide(pc.cast(table.column(i), pa.int64()), 1e9)
+            table = table.set_column(i, field.name, seconds)
+    return table.replace_schema_metadata(None)
+
+
+def write_chunks(chunks, path):
+    """
+    Scrive una sequenza di tabelle Arrow in CSV o Parquet (dall'estensione) un
+    chunk alla volta, in un file temporaneo rinominato alla fine: in memoria
+    resta solo il chunk corrente e un export interrotto non lascia file a metà.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in DATA_FORMATS:
+        raise ValueError(f"Formato non supportato: {extension or path} (usa {', '.join(DATA_FORMATS)}).")
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    writer, rows = None, 0
+    try:
+        for table in chunks:
+            if extension == '.csv':
+                table = _csv_friendly(table)
+            if writer is None:
+                schema = table.schema
+                writer = (pa_csv.CSVWriter(tmp_path, schema) if extension == '.csv'
+                          else pq.ParquetWriter(tmp_path, schema, compression='zstd'))
+            elif not table.schema.equals(schema):
+                table = table.cast(schema)
+            writer.write_table(table)
+            rows += table.num_rows
+        if writer is None:
+            raise ValueError("Nessun dato da esportare.")
+        writer.close()
+        writer = None
+        os.replace(tmp_path, path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
+
+
+def export_frame(df, path):
+    return write_chunks(frame_chunks(df), path)
+
+
+def export_laps(session, path):
+    """Giri filtrati come nel box plot."""
+    from .box_plot import filter_laps
+    return export_frame(filter_laps(session), path)
+
+
+def export_telemetry_frames(ref_tel, com_tel, driver1_code, driver2_code, path):
+    """Telemetria già allineata di due piloti (`ref_tel` e `com_tel` con DeltaTime) in un unico file."""
+    def chunks():
+        # Il gap del pilota di riferimento rispetto a se stesso è zero
+        yield from frame_chunks(ref_tel, DeltaTime=0.0, Driver=driver1_code)
+        yield from frame_chunks(com_tel, Driver=driver2_code)
+
+    return write_chunks(chunks(), path)
+
+
+def export_aligned_telemetry(session, driver1_code, driver2_code, path):
+    """Telemetria allineata dei giri più veloci dei due piloti, come nel confronto telemetrico."""
+    from .telemetry_comparison import align_telemetry
+    _, _, ref_tel, com_tel = align_telemetry(session, driver1_code, driver2_code)
+    return export_telemetry_frames(ref_tel, com_tel, driver1_code, driver2_code, path)
+
+
+def race_evolution_frame(race_data):
+    """Matrici piloti × giri dell'evoluzione della gara in formato lungo (una riga per pilota e giro)."""
+    drivers, laps = race_data['drivers'], race_data['laps']
+    frame = pd.DataFrame({
+        'Driver': np.repeat(drivers, len(laps)),
+        'LapNumber': np.tile(laps, len(drivers)),
+        'RaceTime': race_data['race_time'].ravel(),
+        'GapToLeader': race_data['gap_to_leader'].ravel(),
+        'GapAhead': race_data['gap_ahead'].ravel(),
+        'Position': race_data['position'].ravel(),
+    })
+    if race_data['gap_to_reference'] is not None:
+        frame[f"GapTo{race_data['reference']}"] = race_data['gap_to_reference'].ravel()
+    return frame[frame['RaceTime'].notna()].reset_index(drop=True)
+
+
+def delta_matrix_frame(matrix_data):
+    """Distacchi tra tutte le coppie di piloti: una riga per coppia e una colonna per curva."""
+    drivers = np.asarray(matrix_data['drivers'])
+    n = len(drivers)
+    frame = pd.DataFrame({
+        'Driver': np.repeat(drivers, n),
+        'Versus': np.tile(drivers, n),
+        'Gap': matrix_data['final'].ravel(),
+    })
+    corners = matrix_data['corners'].reshape(n * n, -1)
+    if len(matrix_data['corner_labels']) == corners.shape[1]:
+        for c, label in enumerate(matrix_data['corner_labels']):
+            frame[f"Corner{label}"] = corners[:, c]
+    return frame[frame['Driver'] != frame['Versus']].reset_index(drop=True)
+
+
+def export_session_telemetry(session, path, drivers=None):
+    """
+    Telemetria dell'intera sessione, un pilota alla volta: la memoria usata
+    dall'export non cresce con il numero di piloti.
+    """
+    numbers = {session.get_driver(code)['DriverNumber']: code for code in drivers} if drivers else \
+        {number: session.get_driver(number)['Abbreviation'] for number in session.car_data}
+
+    def chunks():
+        for number, code in numbers.items():
+            yield from frame_chunks(session.car_data[number], Driver=code)
+
+    return write_chunks(chunks(), path)
+
+
+def export_figure(fig, path, dpi=EXPORT_DPI):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FIGURE_FORMATS:
+        raise ValueError(f"Formato non supportato: {extension or path} (usa {', '.join(FIGURE_FORMATS)}).")
+    fig.savefig(path, dpi=dpi, facecolor=fig.get_facecolor(), bbox_inches='tight')
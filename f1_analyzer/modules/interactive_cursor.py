@@ -81,4 +81,140 @@ class InteractiveCursor:
     def disconnect(self):
         if self.cid:
             self.canvas.mpl_disconnect(self.cid)
-            self.cid = None
\ No newline at end of file
+            self.cid = None
+
+class RaceGapCursor:
+    """
+    Cursore per l'evoluzione della gara: segue il giro sotto il mouse e mostra
+    la classifica a quel giro con i distacchi, leggendo le matrici già calcolate.
+    """
+    def __init__(self, fig, canvas, axes, race_data, status_var, max_rows=10):
+        self.fig = fig
+        self.canvas = canvas
+        self.axes = axes
+        self.race_data = race_data
+        self.status_var = status_var
+        self.max_rows = max_rows
+        self.lines = []
+        self.tooltip = self.fig.text(
+            0.08, 0.93, "",
+            ha='left', va='top',
+            bbox=dict(boxstyle='round,pad=0.4', fc='#191925', ec='cyan', lw=1, alpha=0.9),
+            color='white', fontsize=10, fontfamily='monospace', visible=False
+        )
+        for ax in self.axes:
+            line = ax.axvline(x=1, color='cyan', linestyle='--', linewidth=1, visible=False)
+            self.lines.append(line)
+        self.cid = self.canvas.mpl_connect('motion_notify_event', self.on_mouse_move)
+
+    def on_mouse_move(self, event):
+        try:
+            if not event.inaxes:
+                if self.tooltip.get_visible():
+                    for line in self.lines:
+                        line.set_visible(False)
+                    self.tooltip.set_visible(False)
+                    self.canvas.draw_idle()
+                return
+
+            laps = self.race_data['laps']
+            lap_idx = int(np.clip(round(event.xdata) - 1, 0, len(laps) - 1))
+            for line in self.lines:
+                line.set_visible(True)
+                line.set_xdata([lap_idx + 1, lap_idx + 1])
+
+            drivers = self.race_data['drivers']
+            position = self.race_data['position'][:, lap_idx]
+            gap_leader = self.race_data['gap_to_leader'][:, lap_idx]
+            gap_ahead = self.race_data['gap_ahead'][:, lap_idx]
+            ranked = [i for i in np.argsort(position) if not np.isnan(position[i])]
+
+            rows = [f"Giro {lap_idx + 1}", "----------------------", f"{'P':>2} {'':<4} {'Leader':>7} {'Davanti':>7}"]
+            for i in ranked[:self.max_rows]:
+                ahead = f"{gap_ahead[i]:+7.2f}" if not np.isnan(gap_ahead[i]) else f"{'-':>7}"
+                rows.append(f"{position[i]:>2.0f} {drivers[i]:<4} {gap_leader[i]:+7.2f} {ahead}")
+            self.tooltip.set_text("\n".join(rows))
+            self.tooltip.set_visible(True)
+
+            status_bar_text = f"Giro {lap_idx + 1}"
+            reference = self.race_data.get('reference')
+            if reference:
+                ref = drivers.index(reference)
+                status_bar_text += (f" | {reference}: P{position[ref]:.0f}, "
+                                    f"{gap_leader[ref]:+.2f}s dal leader, {gap_ahead[ref]:+.2f}s dall'auto davanti")
+            self.status_var.set(status_bar_text)
+
+            self.canvas.draw_idle()
+        except Exception as e:
+            print(f"Errore nel cursore interattivo: {e}")
+
+    def disconnect(self):
+        if self.cid:
+            self.canvas.mpl_disconnect(self.cid)
+            self.cid = None
+
+class DeltaMatrixSelector:
+    """
+    Selettore per la matrice dei distacchi: al passaggio del mouse mostra il
+    gap della coppia sotto il cursore, al clic su una cella chiama
+    `on_select(pilota, confronto)` per aprire il confronto telemetrico.
+    """
+    def __init__(self, fig, canvas, ax, matrix_data, status_var, on_select):
+        self.fig = fig
+        self.canvas = canvas
+        self.ax = ax
+        self.matrix_data = matrix_data
+        self.status_var = status_var
+        self.on_select = on_select
+        self.highlight = self.ax.add_patch(plt.Rectangle((-0.5, -0.5), 1, 1, fill=False, ec='cyan', lw=2, visible=False))
+        self.cids = [
+            self.canvas.mpl_connect('motion_notify_event', self.on_mouse_move),
+            self.canvas.mpl_connect('button_press_event', self.on_click),
+        ]
+
+    def _cell(self, event):
+        if event.inaxes is not self.ax:
+            return None
+        n = len(self.matrix_data['drivers'])
+        i, j = int(round(event.ydata)), int(round(event.xdata))
+        if not (0 <= i < n and 0 <= j < n) or i == j:
+            return None
+        return i, j
+
+    def on_mouse_move(self, event):
+        try:
+            cell = self._cell(event)
+            if cell is None:
+                if self.highlight.get_visible():
+                    self.highlight.set_visible(False)
+                    self.canvas.draw_idle()
+                return
+
+            i, j = cell
+            drivers = self.matrix_data['drivers']
+            self.highlight.set_xy((j - 0.5, i - 0.5))
+            self.highlight.set_visible(True)
+
+            status_bar_text = f"{drivers[i]} vs {drivers[j]}: {self.matrix_data['final'][i, j]:+.3f}s"
+            corners = self.matrix_data['corners'][i, j]
+            labels = self.matrix_data['corner_labels']
+            if len(labels) == len(corners) and len(corners):
+                worst = int(np.argmax(corners))
+                status_bar_text += f" | Curva peggiore: {labels[worst]} ({corners[worst]:+.3f}s)"
+            self.status_var.set(status_bar_text + " | Clic per il confronto telemetrico")
+
+            self.canvas.draw_idle()
+        except Exception as e:
+            print(f"Errore nel cursore interattivo: {e}")
+
+    def on_click(self, event):
+        cell = self._cell(event)
+        if cell is None:
+            return
+        drivers = self.matrix_data['drivers']
+        self.on_select(drivers[cell[0]], drivers[cell[1]])
+
+    def disconnect(self):
+        for cid in self.cids:
+            self.canvas.mpl_disconnect(cid)
+        self.cids = []
@@ -0,0 +1,65 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import mplcyberpunk
+
+from ..config import COMPOUND_COLORS
+from ..ml.features import lap_features
+from ..ml.lap_model import get_model
+
+
+def create_plot(session):
+    """
+    Confronta i tempi sul giro reali con quelli predetti dal modello di base:
+    a sinistra predetto vs reale per ogni giro, a destra lo scarto medio per pilota.
+    """
+    plt.style.use("cyberpunk")
+    fig = None
+
+    try:
+        features = lap_features(session)
+        # Stesso filtro usato in addestramento: pista libera, niente box, entro il 107%
+        features = features[features['IsGreen'] & ~features['IsPitLap']]
+        features = features[features['LapTimeSeconds'] <= features['LapTimeSeconds'].min() * 1.07]
+        if features.empty:
+            raise ValueError("Nessun giro valido da confrontare con il modello.")
+
+        model = get_model()
+        predicted = model.predict(features)
+        actual = features['LapTimeSeconds'].to_numpy(dtype=np.float64)
+        residual = actual - predicted
+        mae = np.mean(np.abs(residual))
+
+        fig, (ax_scatter, ax_bar) = plt.subplots(1, 2, figsize=(16, 8), gridspec_kw={'width_ratios': [3, 2]})
+
+        colors = features['Compound'].map(COMPOUND_COLORS).fillna(COMPOUND_COLORS['UNKNOWN']).to_numpy()
+        ax_scatter.scatter(predicted, actual, c=colors, s=12, alpha=0.7)
+        lims = [min(predicted.min(), actual.min()), max(predicted.max(), actual.max())]
+        ax_scatter.plot(lims, lims, color='white', linestyle='--', linewidth=0.8)
+        ax_scatter.set_xlabel('Tempo predetto (s)')
+        ax_scatter.set_ylabel('Tempo reale (s)')
+        ax_scatter.set_title(f"Predetto vs Reale (MAE {mae:.3f}s)")
+
+        # Scarto medio per pilota: positivo = più lento di quanto previsto
+        by_driver = features.assign(Residual=residual).groupby('Driver')['Residual'].mean().sort_values()
+        bar_colors = np.where(by_driver.to_numpy() > 0, '#FF3333', '#43B02A')
+        ax_bar.barh(by_driver.index, by_driver.to_numpy(), color=bar_colors)
+        ax_bar.axvline(0, color='white', linewidth=0.8)
+        ax_bar.set_xlabel('Scarto medio reale - predetto (s)')
+        ax_bar.set_title('Rendimento rispetto al modello')
+
+        fig.suptitle(f"{session.event['EventName']} {session.event.year} - {session.name}\nPredizione Tempi sul Giro", fontsize=14)
+        fig.tight_layout(rect=[0, 0, 1, 0.94])
+
+        return fig
+
+    except Exception as e:
+        print(f"Errore durante la creazione del grafico di predizione: {e}")
+        # Chiude l'eventuale figura parziale, altrimenti resterebbe orfana in pyplot
+        if fig is not None:
+            plt.close(fig)
+        plt.style.use("cyberpunk")
+        fig, ax = plt.subplots(figsize=(16, 8))
+        ax.text(0.5, 0.5, f"Errore nella creazione del grafico:\n{e}", ha='center', va='center', fontsize=16, wrap=True)
+        fig.analysis_error = str(e)
+
+        return fig
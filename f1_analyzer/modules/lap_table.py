@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from ..config import CANONICAL_COMPOUND_ORDER
+from .memory_tracker import SessionCache, object_bytes
+
+# Durate (tempi sul giro e settori) in secondi float32: bastano per il millesimo
+DURATION_COLUMNS = ['LapTime', 'Sector1Time', 'Sector2Time', 'Sector3Time']
+# Istanti di sessione in secondi float64: ne servono le differenze (gap) al millesimo
+SESSION_TIME_COLUMNS = ['Time', 'LapStartTime']
+SPEED_COLUMNS = ['SpeedI1', 'SpeedI2', 'SpeedFL', 'SpeedST']
+FLAG_COLUMNS = ['IsPersonalBest', 'FastF1Generated', 'Deleted', 'IsAccurate']
+
+# Tabella compatta dei giri, costruita una volta per sessione e condivisa dalle analisi
+_lap_table_cache = SessionCache('lap_table')
+
+
+def _seconds(series, dtype):
+    return (series.dt.total_seconds() if pd.api.types.is_timedelta64_dtype(series) else series).to_numpy(dtype=dtype)
+
+
+def _small_int(series, dtype):
+    # -1 al posto dei valori mancanti, per restare su interi piccoli
+    return series.fillna(-1).to_numpy().astype(dtype)
+
+
+class LapTable:
+    """
+    Giri di una sessione in forma compatta: pilota, team e mescola come
+    categorie, tempi in secondi, giro/stint/vita gomma come interi piccoli.
+    Le righe sono ordinate per pilota e giro, così i giri di un pilota sono
+    una fetta contigua; `Row` è la posizione del giro in `session.laps`.
+    """
+    def __init__(self, frame, starts, ends):
+        self.frame = frame
+        self._slices = {driver: slice(start, end) for driver, start, end
+                        in zip(frame['Driver'].cat.categories, starts, ends)}
+
+    @classmethod
+    def from_laps(cls, laps):
+        if laps is not None:
+            # Un giro senza pilota avrebbe codice -1 e finirebbe in testa all'ordinamento,
+            # spostando le fette di tutti i piloti. I giri senza tempo restano: gap e
+            # strategie usano anche quelli (es. primo giro, giri interrotti)
+            rows = np.flatnonzero(laps['Driver'].notna().to_numpy())
+            laps = laps.iloc[rows]
+        if laps is None or laps.empty:
+            raise ValueError("Dati dei giri non disponibili per questa analisi.")
+
+        compounds_present = set(laps['Compound'].dropna())
+        compound_order = ([c for c in CANONICAL_COMPOUND_ORDER if c in compounds_present]
+                          + sorted(compounds_present - set(CANONICAL_COMPOUND_ORDER)))
+        track_status = laps['TrackStatus'].astype(str)
+        columns = {
+            'Driver': pd.Categorical(laps['Driver']),
+            'Team': pd.Categorical(laps['Team']),
+            'Compound': pd.Categorical(laps['Compound'], categories=compound_order),
+            'LapNumber': _small_int(laps['LapNumber'], np.int16),
+            'Stint': _small_int(laps['Stint'], np.int8),
+            'TyreLife': _small_int(laps['TyreLife'], np.int16),
+            'IsGreen': track_status.eq('1').to_numpy(),
+            'PitInLap': laps['PitInTime'].notna().to_numpy(),
+            'PitOutLap': laps['PitOutTime'].notna().to_numpy(),
+            'Row': rows.astype(np.int32),
+        }
+        for col in DURATION_COLUMNS:
+            columns[col] = _seconds(laps[col], np.float32)
+        for col in SESSION_TIME_COLUMNS:
+            columns[col] = _seconds(laps[col], np.float64)
+        for col in SPEED_COLUMNS:
+            columns[col] = laps[col].to_numpy(dtype=np.float32)
+        for col in FLAG_COLUMNS:
+            columns[col] = laps[col].fillna(False).to_numpy(dtype=bool) if col in laps.columns else np.zeros(len(laps), dtype=bool)
+        frame = pd.DataFrame(columns)
+
+        # Ordinamento per pilota e giro: un solo lexsort sui codici interi
+        codes = frame['Driver'].cat.codes.to_numpy()
+        order = np.lexsort((frame['LapNumber'].to_numpy(), codes))
+        frame = frame.iloc[order].reset_index(drop=True)
+        counts = np.bincount(codes[order], minlength=len(frame['Driver'].cat.categories))
+        ends = np.cumsum(counts)
+        return cls(frame, ends - counts, ends)
+
+    @property
+    def drivers(self):
+        return list(self._slices)
+
+    def driver_rows(self, driver):
+        """Fetta delle righe del pilota (vuota se il pilota non ha giri)."""
+        return self._slices.get(driver, slice(0, 0))
+
+    def driver(self, driver):
+        return self.frame.iloc[self.driver_rows(driver)]
+
+    def fastest_row(self, driver=None):
+        """
+        Riga del giro più veloce (del pilota o assoluto) con lo stesso criterio
+        di `Laps.pick_fastest`: solo giri marcati come miglior giro personale.
+        """
+        frame = self.driver(driver) if driver else self.frame
+        candidates = frame[frame['IsPersonalBest'] & frame['LapTime'].notna()]
+        if candidates.empty:
+            return None
+        return candidates.loc[candidates['LapTime'].idxmin()]
+
+    @property
+    def nbytes(self):
+        return object_bytes(self.frame)
+
+
+def lap_table(session):
+    """Tabella compatta dei giri della sessione (calcolata alla prima richiesta e poi in cache)."""
+    return _lap_table_cache.get_or_compute(session, lambda: LapTable.from_laps(session.laps))
+
+
+def fastest_lap(session, driver=None):
+    """Il giro più veloce come oggetto `Lap` di fastf1 (per la telemetria), oppure None."""
+    row = lap_table(session).fastest_row(driver)
+    return None if row is None else session.laps.iloc[int(row['Row'])]
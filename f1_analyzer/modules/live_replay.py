@@ -0,0 +1,342 @@
+import bisect
+import heapq
+import queue
+import threading
+import time
+
+import matplotlib.pyplot as plt
+from matplotlib.lines import Line2D
+import numpy as np
+import pandas as pd
+from fastf1._api import parse as parse_livetiming
+from fastf1.livetiming.data import LiveTimingData
+from fastf1.utils import to_timedelta
+import mplcyberpunk
+
+from ..config import COMPOUND_COLORS, REPLAY_SPEED
+
+# Categorie del feed live usate dal replay
+CATEGORIES = ('DriverList', 'TimingData', 'TimingAppData', 'CarData.z')
+# Canali della telemetria nel messaggio compresso CarData.z
+CAR_CHANNELS = {'RPM': '0', 'Speed': '2', 'nGear': '3', 'Throttle': '4', 'Brake': '5'}
+# Finestra della traccia di velocità mostrata (s)
+SPEED_WINDOW_S = 60.0
+
+
+class GrowableArray:
+    """Array numpy a righe con capacità che raddoppia: append ammortizzato O(1), lettura senza copie."""
+    def __init__(self, columns, capacity=256, dtype=np.float64):
+        self._data = np.empty((capacity, columns), dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, size):
+        if size > len(self._data):
+            grown = np.empty((max(size, 2 * len(self._data)), self._data.shape[1]), dtype=self._data.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+
+    def append(self, row):
+        self._reserve(self._size + 1)
+        self._data[self._size] = row
+        self._size += 1
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=self._data.dtype)
+        self._reserve(self._size + len(rows))
+        self._data[self._size:self._size + len(rows)] = rows
+        self._size += len(rows)
+
+    @property
+    def values(self):
+        return self._data[:self._size]
+
+
+class RunningStats:
+    """Media e deviazione standard aggiornate un valore alla volta (algoritmo di Welford)."""
+    __slots__ = ('count', 'mean', '_m2', 'best')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.best = np.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.best = min(self.best, value)
+
+    @property
+    def std(self):
+        return np.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class ReplaySource(threading.Thread):
+    """
+    Rilegge una registrazione del live timing (file di SignalRClient) alla
+    velocità indicata e mette i messaggi in coda, come farebbe il feed live.
+    """
+    def __init__(self, path, speed=REPLAY_SPEED):
+        super().__init__(daemon=True)
+        self.path = path
+        self.speed = speed
+        self.messages = queue.Queue()
+        self.finished = False
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        try:
+            livedata = LiveTimingData(self.path)
+            streams = [[(td, category, msg) for td, msg in livedata.get(category)]
+                       for category in CATEGORIES if livedata.has(category)]
+            # Le categorie sono già in ordine di tempo: basta fonderle
+            merged = heapq.merge(*streams, key=lambda item: item[0])
+            start_wall, start_td = time.monotonic(), None
+            for td, category, msg in merged:
+                if start_td is None:
+                    start_td = td
+                delay = (td - start_td).total_seconds() / self.speed - (time.monotonic() - start_wall)
+                if delay > 0 and self._stop_event.wait(delay):
+                    break
+                if self._stop_event.is_set():
+                    break
+                self.messages.put((td.total_seconds(), category, msg))
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+
+
+class LiveSessionState:
+    """
+    Stato della sessione costruito messaggio per messaggio: giri e telemetria
+    accodati in array crescenti, statistiche dei giri aggiornate solo per il
+    pilota che ha appena chiuso un giro.
+    """
+    def __init__(self):
+        self.names = {}
+        self.compound = {}
+        self.laps = {}           # pilota -> GrowableArray [giro, tempo sul giro, tempo di sessione]
+        self.sorted_laps = {}    # pilota -> tempi sul giro ordinati, per i quartili
+        self.stats = {}          # pilota -> RunningStats
+        self.gaps = {}           # pilota -> GrowableArray [giro, gap dal leader]
+        self.telemetry = {}      # pilota -> GrowableArray [tempo di sessione, canali...]
+        self._lap_count = {}
+        self._last_lap_value = {}
+        self._leader_time = {}   # giro -> tempo di sessione del primo pilota a chiuderlo
+        self.session_time = 0.0
+
+    def name(self, number):
+        return self.names.get(number, number)
+
+    def apply(self, session_time, category, msg):
+        """Applica un messaggio e ritorna l'insieme dei piloti i cui dati di giro sono cambiati."""
+        self.session_time = session_time
+        if category == 'DriverList':
+            for number, info in msg.items():
+                if isinstance(info, dict) and 'Tla' in info:
+                    self.names[number] = info['Tla']
+        elif category == 'TimingAppData':
+            for number, line in msg.get('Lines', {}).items():
+                stints = line.get('Stints') if isinstance(line, dict) else None
+                stints = stints.values() if isinstance(stints, dict) else (stints or [])
+                for stint in stints:
+                    if isinstance(stint, dict) and stint.get('Compound'):
+                        self.compound[number] = stint['Compound']
+        elif category == 'TimingData':
+            return self._apply_timing(session_time, msg)
+        elif category == 'CarData.z':
+            self._apply_car_data(session_time, parse_livetiming(msg, zipped=True))
+        return set()
+
+    def _apply_timing(self, session_time, msg):
+        changed = set()
+        for number, line in msg.get('Lines', {}).items():
+            if not isinstance(line, dict):
+                continue
+            lap_count = line.get('NumberOfLaps')
+            if lap_count is not None and lap_count > self._lap_count.get(number, 0):
+                self._lap_count[number] = lap_count
+                # Il primo a chiudere il giro è il leader: i gap degli altri sono definitivi
+                leader_time = self._leader_time.setdefault(lap_count, session_time)
+                self.gaps.setdefault(number, GrowableArray(2)).append((lap_count, session_time - leader_time))
+                changed.add(number)
+
+            last_lap = line.get('LastLapTime')
+            value = last_lap.get('Value') if isinstance(last_lap, dict) else None
+            if value and value != self._last_lap_value.get(number):
+                self._last_lap_value[number] = value
+                lap_time = to_timedelta(value)
+                if lap_time is not None and not pd.isna(lap_time):
+                    seconds = lap_time.total_seconds()
+                    self.laps.setdefault(number, GrowableArray(3)).append((self._lap_count.get(number, 0), seconds, session_time))
+                    bisect.insort(self.sorted_laps.setdefault(number, []), seconds)
+                    self.stats.setdefault(number, RunningStats()).add(seconds)
+                    changed.add(number)
+        return changed
+
+    def _apply_car_data(self, session_time, data):
+        entries = data.get('Entries', [])
+        if not entries:
+            return
+        # Timestamp dei campioni riportati al tempo di sessione del messaggio
+        utc = pd.to_datetime([entry['Utc'] for entry in entries], utc=True, format='ISO8601')
+        offsets = (utc - utc[-1]).total_seconds().to_numpy() + session_time
+        samples = {}
+        for offset, entry in zip(offsets, entries):
+            for number, car in entry.get('Cars', {}).items():
+                channels = car.get('Channels', {})
+                samples.setdefault(number, []).append(
+                    [offset] + [channels.get(code, np.nan) for code in CAR_CHANNELS.values()])
+        for number, rows in samples.items():
+            self.telemetry.setdefault(number, GrowableArray(1 + len(CAR_CHANNELS), capacity=4096)).extend(rows)
+
+    def box_stats(self, number):
+        """Quartili e baffi dei giri del pilota entro il 107% del suo migliore."""
+        lap_times = self.sorted_laps.get(number)
+        if not lap_times:
+            return None
+        cutoff = bisect.bisect_right(lap_times, lap_times[0] * 1.07)
+        values = np.asarray(lap_times[:cutoff])
+        q1, med, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+        return q1, med, q3, inside.min(), inside.max()
+
+    def leader(self):
+        if not self._lap_count:
+            return None
+        lap = max(self._lap_count.values())
+        leading = [number for number, count in self._lap_count.items() if count == lap]
+        return min(leading, key=lambda number: self.gaps[number].values[-1, 1]) if leading else None
+
+
+class LiveReplayView:
+    """
+    Figura del replay: box plot dei tempi per pilota, gap dal leader giro per
+    giro e velocità del leader. Gli artisti di ogni pilota vengono creati una
+    volta e poi aggiornati con `set_data` solo quando i suoi dati cambiano.
+    """
+    def __init__(self, title):
+        plt.style.use("cyberpunk")
+        self.fig, (self.ax_box, self.ax_gap, self.ax_speed) = plt.subplots(
+            3, 1, figsize=(16, 14), gridspec_kw={'height_ratios': [3, 3, 1]})
+        self.fig.suptitle(title, fontsize=14)
+        self.ax_box.set_ylabel('Tempo sul giro (s)')
+        self.ax_gap.set_ylabel('Gap dal leader (s)')
+        self.ax_gap.set_xlabel('Giro')
+        self.ax_gap.invert_yaxis()
+        self.ax_speed.set_ylabel('Velocità leader')
+        self.ax_speed.set_xlabel('Tempo di sessione (s)')
+        self._speed_line, = self.ax_speed.plot([], [], color='#FF55A3', linewidth=1.2)
+        self._mean_line, = self.ax_box.plot([], [], linestyle='', marker='o', markersize=4, color='white')
+        self._order = []
+        self._artists = {}
+        self.fig.tight_layout(rect=[0, 0, 1, 0.96])
+
+    def _driver_artists(self, state, number):
+        if number not in self._artists:
+            x = len(self._order)
+            self._order.append(number)
+            self._artists[number] = {
+                'box': self.ax_box.add_line(Line2D([], [], linewidth=1.5)),
+                'whiskers': self.ax_box.add_line(Line2D([], [], linewidth=1.5)),
+                'median': self.ax_box.add_line(Line2D([], [], color='#FF55A3', linewidth=2)),
+                'gap': self.ax_gap.plot([], [], linewidth=1.2, label=state.name(number))[0],
+                'x': x,
+            }
+            self.ax_box.set_xticks(range(len(self._order)))
+            self.ax_box.set_xticklabels([state.name(n) for n in self._order], fontsize=9)
+            self.ax_box.set_xlim(-0.6, len(self._order) - 0.4)
+        return self._artists[number]
+
+    def update(self, state, changed):
+        """Aggiorna solo gli artisti dei piloti in `changed`; ritorna True se la figura va ridisegnata."""
+        for number in changed:
+            artists = self._driver_artists(state, number)
+            x = artists['x']
+            color = COMPOUND_COLORS.get(state.compound.get(number), COMPOUND_COLORS['UNKNOWN'])
+            stats = state.box_stats(number)
+            if stats is not None:
+                q1, med, q3, low, high = stats
+                artists['box'].set_data([x - 0.3, x + 0.3, x + 0.3, x - 0.3, x - 0.3], [q1, q1, q3, q3, q1])
+                artists['whiskers'].set_data([x, x, np.nan, x, x], [low, q1, np.nan, q3, high])
+                artists['median'].set_data([x - 0.3, x + 0.3], [med, med])
+                artists['box'].set_color(color)
+                artists['whiskers'].set_color(color)
+            if number in state.gaps:
+                gaps = state.gaps[number].values
+                artists['gap'].set_data(gaps[:, 0], gaps[:, 1])
+        if changed:
+            means = [state.stats[n].mean if n in state.stats else np.nan for n in self._order]
+            self._mean_line.set_data(range(len(self._order)), means)
+            for ax in (self.ax_box, self.ax_gap):
+                ax.relim()
+                ax.autoscale_view()
+
+        leader = state.leader()
+        if leader in state.telemetry:
+            telemetry = state.telemetry[leader].values
+            start = np.searchsorted(telemetry[:, 0], state.session_time - SPEED_WINDOW_S)
+            window = telemetry[start:]
+            self._speed_line.set_data(window[:, 0], window[:, 2])
+            self.ax_speed.set_xlim(state.session_time - SPEED_WINDOW_S, state.session_time + 1)
+            self.ax_speed.set_ylim(0, max(350, np.nanmax(window[:, 2]) + 10) if len(window) else 350)
+            self.ax_speed.set_ylabel(f"Velocità {state.name(leader)}")
+            return True
+        return bool(changed)
+
+
+class LiveReplay:
+    """Collega sorgente, stato e figura: `poll` va chiamato periodicamente dal thread della GUI."""
+    def __init__(self, path, speed=REPLAY_SPEED, title="Replay Live Timing"):
+        self.source = ReplaySource(path, speed)
+        self.state = LiveSessionState()
+        self.view = LiveReplayView(title)
+
+    @property
+    def fig(self):
+        return self.view.fig
+
+    def start(self):
+        self.source.start()
+
+    def stop(self):
+        self.source.stop()
+
+    @property
+    def done(self):
+        return self.source.finished and self.source.messages.empty()
+
+    def poll(self, max_messages=5000):
+        """Consuma i messaggi arrivati e aggiorna la figura. Ritorna True se va ridisegnata."""
+        changed = set()
+        for _ in range(max_messages):
+            try:
+                session_time, category, msg = self.source.messages.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                changed |= self.state.apply(session_time, category, msg)
+            except Exception as e:
+                # Messaggi incompleti del feed: si saltano senza fermare il replay
+                print(f"Messaggio live ignorato ({category}): {e}")
+        return self.view.update(self.state, changed)
+
+    def status(self):
+        leader = self.state.leader()
+        if leader is None:
+            return "Replay live: in attesa dei primi giri..."
+        lap = int(self.state.gaps[leader].values[-1, 0])
+        stats = self.state.stats.get(leader)
+        best = f" - miglior giro {stats.best:.3f}s, media {stats.mean:.3f}s" if stats else ""
+        return f"Replay live: giro {lap}, leader {self.state.name(leader)}{best}"
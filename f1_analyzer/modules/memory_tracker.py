@@ -0,0 +1,241 @@
+import gc
+import os
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from ..config import MEMORY_ENFORCE_COOLDOWN_S, MEMORY_LIMIT_MB, MEMORY_LOW_WATERMARK
+
+# psutil è opzionale: se manca si legge /proc (Linux) oppure si usa
+# solo la stima calcolata sugli oggetti tracciati.
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 1024 * 1024
+
+
+def _loaded(session, attr):
+    """Ritorna un attributo della sessione solo se è già stato caricato."""
+    try:
+        return getattr(session, attr)
+    except Exception:
+        return None
+
+
+def object_bytes(obj):
+    """Stima l'occupazione in byte di DataFrame, array e contenitori annidati."""
+    if obj is None:
+        return 0
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sum(object_bytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(object_bytes(v) for v in obj)
+    nbytes = getattr(obj, 'nbytes', None)
+    return int(nbytes) if isinstance(nbytes, (int, np.integer)) else 0
+
+
+SESSION_DATA_ATTRS = ('laps', 'car_data', 'pos_data', 'weather_data')
+
+
+def session_bytes(session):
+    """Byte occupati da giri, telemetria e meteo di una sessione fastf1."""
+    return sum(object_bytes(_loaded(session, attr)) for attr in SESSION_DATA_ATTRS)
+
+
+def process_rss_bytes():
+    """RSS del processo corrente, oppure None se non misurabile."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class SessionCache:
+    """
+    Cache di dati derivati da una sessione (matrici, join, tabelle compatte).
+    Le chiavi sono riferimenti deboli alla sessione: quando la sessione viene
+    rilasciata, i dati derivati spariscono con lei.
+    """
+    def __init__(self, name, tracker=None):
+        self.name = name
+        self._data = weakref.WeakKeyDictionary()
+        # Byte di ogni voce, misurati una volta all'inserimento dal thread che la calcola:
+        # il controllo periodico della memoria si limita a sommarli
+        self._sizes = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        (tracker or memory_tracker).register_cache(self)
+
+    def get(self, session, key=None):
+        with self._lock:
+            return self._data.get(session, {}).get(key)
+
+    def set(self, session, value, key=None):
+        size = object_bytes(value)
+        with self._lock:
+            self._data.setdefault(session, {})[key] = value
+            self._sizes.setdefault(session, {})[key] = size
+        return value
+
+    def get_or_compute(self, session, builder, key=None):
+        value = self.get(session, key)
+        if value is None:
+            value = self.set(session, builder(), key)
+        return value
+
+    def discard(self, session):
+        with self._lock:
+            self._data.pop(session, None)
+            self._sizes.pop(session, None)
+
+    def clear(self, keep_session=None):
+        """Svuota la cache, tranne eventualmente i dati di `keep_session`."""
+        with self._lock:
+            for session in list(self._data.keys()):
+                if session is not keep_session:
+                    self._data.pop(session, None)
+                    self._sizes.pop(session, None)
+
+    def nbytes(self):
+        with self._lock:
+            return sum(sum(sizes.values()) for sizes in self._sizes.values())
+
+
+class MemoryTracker:
+    """
+    Contabilità della memoria dell'applicazione: figure vive, sessioni caricate,
+    byte di telemetria e cache registrate. Applica un tetto chiudendo le figure
+    orfane e svuotando le cache quando i dati tracciati superano il limite.
+    L'RSS è solo mostrato: dopo che Python libera memoria raramente scende,
+    e usato come soglia terrebbe le cache svuotate per sempre.
+    """
+    def __init__(self, limit_mb=MEMORY_LIMIT_MB, low_watermark=MEMORY_LOW_WATERMARK,
+                 cooldown_s=MEMORY_ENFORCE_COOLDOWN_S):
+        self.limit_bytes = limit_mb * MB
+        self.low_bytes = low_watermark * self.limit_bytes
+        self.cooldown_s = cooldown_s
+        self._last_enforce = None
+        self._sessions = weakref.WeakSet()
+        # Figure già mostrate: le sole che possono diventare orfane. Le altre
+        # possono essere ancora in costruzione in un thread di analisi
+        self._displayed = weakref.WeakSet()
+        # Dimensione calcolata una sola volta per ogni combinazione di dati caricati
+        self._session_sizes = weakref.WeakKeyDictionary()
+        self._caches = []
+        self._lock = threading.Lock()
+
+    def register_cache(self, cache):
+        with self._lock:
+            self._caches.append(cache)
+
+    def track_session(self, session):
+        """
+        Registra la sessione e ne misura subito i dati: chiamato dal thread di
+        caricamento a ogni fase, così il controllo periodico trova la misura pronta.
+        """
+        if session is not None:
+            self._sessions.add(session)
+            self.session_bytes(session)
+
+    def release_session(self, session):
+        """Rimuove esplicitamente i dati derivati di una sessione non più in uso."""
+        if session is None:
+            return
+        self._sessions.discard(session)
+        self._session_sizes.pop(session, None)
+        for cache in self._caches:
+            cache.discard(session)
+        gc.collect()
+
+    def session_bytes(self, session):
+        signature = tuple(id(_loaded(session, attr)) for attr in SESSION_DATA_ATTRS)
+        cached = self._session_sizes.get(session)
+        if cached is None or cached[0] != signature:
+            cached = (signature, session_bytes(session))
+            self._session_sizes[session] = cached
+        return cached[1]
+
+    def mark_displayed(self, fig):
+        self._displayed.add(fig)
+
+    def close_orphan_figures(self, keep=None):
+        """
+        Chiude le figure già mostrate tranne `keep`. Va chiamato dal thread Tk.
+        Ritorna il numero di figure chiuse.
+        """
+        orphans = [fig for fig in list(self._displayed) if fig is not keep and plt.fignum_exists(fig.number)]
+        for fig in orphans:
+            plt.close(fig)
+            self._displayed.discard(fig)
+        return len(orphans)
+
+    def clear_caches(self, keep_session=None):
+        for cache in self._caches:
+            cache.clear(keep_session)
+
+    def report(self):
+        sessions = list(self._sessions)
+        return {
+            'figures': len(plt.get_fignums()),
+            'sessions': len(sessions),
+            'session_bytes': sum(self.session_bytes(s) for s in sessions),
+            'cache_bytes': sum(cache.nbytes() for cache in self._caches),
+            'rss_bytes': process_rss_bytes(),
+        }
+
+    def used_bytes(self, report=None):
+        report = report or self.report()
+        return report['session_bytes'] + report['cache_bytes']
+
+    def enforce(self, keep_fig=None, keep_session=None):
+        """
+        Se i dati tracciati superano il limite chiude le figure orfane e svuota
+        le cache: prima quelle delle sessioni diverse da `keep_session`, poi,
+        se non si scende sotto la soglia bassa, tutte. Dopo un intervento si
+        attende il cooldown prima del successivo. Ritorna il report aggiornato.
+        """
+        report = self.report()
+        if self.used_bytes(report) <= self.limit_bytes:
+            return report
+        now = time.monotonic()
+        if self._last_enforce is not None and now - self._last_enforce < self.cooldown_s:
+            return report
+        self._last_enforce = now
+
+        closed = self.close_orphan_figures(keep=keep_fig)
+        cache_bytes = report['cache_bytes']
+        self.clear_caches(keep_session)
+        if self.used_bytes(self.report()) > self.low_bytes:
+            self.clear_caches()
+        gc.collect()
+        report = self.report()
+        print(f"Limite di memoria superato: chiuse {closed} figure, "
+              f"liberati {(cache_bytes - report['cache_bytes']) / MB:.0f} MB di cache.")
+        return report
+
+    def summary(self, report=None):
+        report = report or self.report()
+        used = self.used_bytes(report)
+        rss = f" (RSS {report['rss_bytes'] / MB:.0f} MB)" if report['rss_bytes'] is not None else ""
+        return (f"Memoria: {used / MB:.0f}/{self.limit_bytes / MB:.0f} MB{rss} | "
+                f"Figure: {report['figures']} | Sessioni: {report['sessions']} | "
+                f"Dati: {report['session_bytes'] / MB:.0f} MB | "
+                f"Cache: {report['cache_bytes'] / MB:.0f} MB")
+
+
+# Istanza condivisa dall'app e dalle cache dei moduli di analisi
+memory_tracker = MemoryTracker()
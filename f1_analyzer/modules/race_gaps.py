@@ -0,0 +1,150 @@
+import matplotlib.pyplot as plt
+import fastf1.plotting
+import numpy as np
+import mplcyberpunk
+
+from .lap_table import lap_table
+from .memory_tracker import SessionCache
+
+# Matrice piloti × giri del tempo di gara cumulato, calcolata una volta per sessione
+_race_time_cache = SessionCache('race_time_matrix')
+
+
+def _build_race_time_matrix(laps):
+    # Giri aggiunti da fastf1 per chi si ritira al primo giro (FastF1Generated) non sono giri reali
+    laps = laps[(laps['LapNumber'] > 0) & laps['Time'].notna() & ~laps['FastF1Generated']]
+    if laps.empty:
+        raise ValueError("Dati dei giri non disponibili per questa analisi.")
+
+    # Solo i piloti con almeno un giro valido, ricodificati da 0
+    used, codes = np.unique(laps['Driver'].cat.codes.to_numpy(), return_inverse=True)
+    drivers = list(laps['Driver'].cat.categories[used])
+    lap_idx = laps['LapNumber'].to_numpy(dtype=np.int64) - 1
+    race_start = np.nanmin(laps['LapStartTime'].to_numpy())
+
+    # NaN dove il giro non è stato completato (doppiati a fine gara, ritiri)
+    race_time = np.full((len(drivers), lap_idx.max() + 1), np.nan)
+    race_time[codes, lap_idx] = laps['Time'].to_numpy() - race_start
+    return drivers, race_time
+
+
+def race_time_matrix(session):
+    """Ritorna (piloti, matrice piloti × giri del tempo di gara cumulato in secondi)."""
+    return _race_time_cache.get_or_compute(session, lambda: _build_race_time_matrix(lap_table(session).frame))
+
+
+def race_evolution(session, reference_driver=None):
+    """
+    Gap dal leader, gap dall'auto davanti, posizione e gap dal pilota di
+    riferimento per ogni pilota e giro, tutti come matrici piloti × giri.
+    Solo il gap dal riferimento dipende dal pilota scelto: cambiarlo costa
+    una sottrazione sulla matrice in cache.
+    """
+    drivers, race_time = race_time_matrix(session)
+    return evolution_matrices(drivers, race_time, reference_driver)
+
+
+def evolution_matrices(drivers, race_time, reference_driver=None):
+    """Matrici di `race_evolution` dalla matrice piloti × giri del tempo di gara (NaN: giro non completato)."""
+    missing = np.isnan(race_time)
+
+    # Il leader del giro k è il primo a completarlo
+    gap_to_leader = race_time - np.nanmin(race_time, axis=0)
+
+    # Ordinamento per colonna: i NaN finiscono in fondo
+    order = np.argsort(race_time, axis=0, kind='stable')
+    sorted_time = np.take_along_axis(race_time, order, axis=0)
+    sorted_gap_ahead = np.vstack([np.full((1, race_time.shape[1]), np.nan), np.diff(sorted_time, axis=0)])
+
+    position = np.empty_like(race_time)
+    np.put_along_axis(position, order, np.arange(1, len(drivers) + 1, dtype=np.float64)[:, None], axis=0)
+    position[missing] = np.nan
+
+    gap_ahead = np.empty_like(race_time)
+    np.put_along_axis(gap_ahead, order, sorted_gap_ahead, axis=0)
+
+    gap_to_reference = None
+    if reference_driver in drivers:
+        gap_to_reference = race_time - race_time[drivers.index(reference_driver)]
+
+    return {
+        'drivers': drivers,
+        'laps': np.arange(1, race_time.shape[1] + 1),
+        'race_time': race_time,
+        'gap_to_leader': gap_to_leader,
+        'gap_ahead': gap_ahead,
+        'position': position,
+        'gap_to_reference': gap_to_reference,
+        'reference': reference_driver if gap_to_reference is not None else None,
+    }
+
+
+def _driver_styles(session, drivers):
+    """Colore del team per ogni pilota; il secondo pilota del team è tratteggiato."""
+    styles = {}
+    seen_teams = set()
+    table = lap_table(session)
+    teams = {driver: table.frame['Team'].iat[table.driver_rows(driver).start] for driver in drivers}
+    for driver in drivers:
+        team = teams.get(driver)
+        try:
+            color = fastf1.plotting.get_team_color(team, session)
+        except Exception:
+            color = None
+        styles[driver] = {'color': color, 'linestyle': '--' if team in seen_teams else 'solid'}
+        seen_teams.add(team)
+    return styles
+
+
+def create_plot(session, reference_driver=None):
+    """
+    Evoluzione della gara: gap dal leader, posizione e gap dal pilota di
+    riferimento giro per giro. Ritorna la figura e i dati per il cursore interattivo.
+    """
+    plt.style.use("cyberpunk")
+    fig = None
+
+    try:
+        data = race_evolution(session, reference_driver)
+        laps = data['laps']
+        styles = _driver_styles(session, data['drivers'])
+
+        n_axes = 3 if data['gap_to_reference'] is not None else 2
+        fig, axes = plt.subplots(n_axes, 1, figsize=(16, 5 * n_axes), sharex=True,
+                                 gridspec_kw={'height_ratios': [3, 2, 2][:n_axes]})
+
+        for i, driver in enumerate(data['drivers']):
+            style = styles[driver]
+            axes[0].plot(laps, data['gap_to_leader'][i], label=driver, linewidth=1.2, **style)
+            axes[1].plot(laps, data['position'][i], linewidth=1.2, **style)
+            if n_axes == 3:
+                axes[2].plot(laps, data['gap_to_reference'][i], linewidth=1.2, **style)
+
+        axes[0].set_ylabel('Gap dal leader (s)')
+        axes[0].invert_yaxis()
+        axes[0].legend(loc='upper left', bbox_to_anchor=(1.0, 1.0), frameon=True, facecolor='black', framealpha=0.7, fontsize=9)
+        axes[1].set_ylabel('Posizione')
+        axes[1].set_ylim(len(data['drivers']) + 0.5, 0.5)
+        axes[1].set_yticks(range(1, len(data['drivers']) + 1, 2))
+        if n_axes == 3:
+            axes[2].axhline(0, color='white', linestyle='--', linewidth=0.8)
+            axes[2].set_ylabel(f"Gap da {data['reference']} (s)")
+            axes[2].invert_yaxis()
+        axes[-1].set_xlabel('Giro')
+        axes[0].set_title(f"{session.event.year} {session.event['EventName']} - {session.name}\nEvoluzione della Gara", fontsize=14)
+
+        fig.tight_layout()
+
+        return fig, data
+
+    except Exception as e:
+        print(f"Errore durante la creazione del grafico dei distacchi: {e}")
+        # Chiude l'eventuale figura parziale, altrimenti resterebbe orfana in pyplot
+        if fig is not None:
+            plt.close(fig)
+        plt.style.use("cyberpunk")
+        fig, ax = plt.subplots(figsize=(16, 8))
+        ax.text(0.5, 0.5, f"Impossibile generare il grafico:\n{e}",
+                ha='center', va='center', fontsize=16, wrap=True)
+        fig.analysis_error = str(e)
+        return fig, None
@@ -0,0 +1,133 @@
+import matplotlib.pyplot as plt
+from matplotlib.patches import Patch
+import numpy as np
+import mplcyberpunk
+
+from ..config import COMPOUND_COLORS, CANONICAL_COMPOUND_ORDER, FUEL_EFFECT_S_PER_KG
+from ..ml.features import fuel_load_kg
+from .lap_table import lap_table
+
+MIN_STINT_LAPS = 3
+
+
+def stint_fits(group, tyre_life, corrected):
+    """
+    Retta tempo corretto = a + b · vita gomma per ogni gruppo (pilota, stint)
+    con indici 0..n_groups-1. Ritorna giri per gruppo, passo medio e i
+    coefficienti (a, b), NaN per i gruppi troppo corti o degeneri.
+    """
+    # Somme per gruppo con bincount
+    n_groups = group.max() + 1
+    n = np.bincount(group, minlength=n_groups).astype(np.float64)
+    sx = np.bincount(group, tyre_life, n_groups)
+    sy = np.bincount(group, corrected, n_groups)
+    sxx = np.bincount(group, tyre_life * tyre_life, n_groups)
+    sxy = np.bincount(group, tyre_life * corrected, n_groups)
+
+    # Equazioni normali di tutti gli stint risolte in un'unica chiamata batch:
+    # [[n, Σx], [Σx, Σx²]] · [a, b] = [Σy, Σxy]
+    A = np.stack([np.stack([n, sx], -1), np.stack([sx, sxx], -1)], -2)
+    rhs = np.stack([sy, sxy], -1)[..., None]
+    solvable = (n >= MIN_STINT_LAPS) & (np.abs(np.linalg.det(A)) > 1e-9)
+    coef = np.full((n_groups, 2), np.nan)
+    if solvable.any():
+        coef[solvable] = np.linalg.solve(A[solvable], rhs[solvable])[..., 0]
+    return n, sy / n, coef
+
+
+def stint_degradation(session):
+    """
+    Segmenta i giri di ogni pilota in stint e stima, per tutti gli stint
+    insieme, passo medio e degrado (s/giro) sui tempi corretti per il carburante.
+    Ritorna un DataFrame con una riga per stint.
+    """
+    laps = lap_table(session).frame
+
+    # Solo giri cronometrati in pista libera, esclusi giri di entrata/uscita box
+    mask = (laps['LapTime'].notna() & (laps['TyreLife'] >= 0) & (laps['Stint'] >= 0)
+            & ~laps['PitInLap'] & ~laps['PitOutLap'] & laps['IsGreen'])
+    laps = laps.loc[mask, ['Driver', 'Stint', 'Compound', 'LapNumber', 'TyreLife', 'LapTime']]
+    lap_time = laps['LapTime'].to_numpy(dtype=np.float64)
+
+    # Stesso criterio di box_plot.filter_laps
+    fastest = laps.groupby(['Driver', 'Compound'], observed=True)['LapTime'].transform('min')
+    keep = lap_time <= fastest.to_numpy(dtype=np.float64) * 1.07
+    laps, lap_time = laps[keep], lap_time[keep]
+    if laps.empty:
+        raise ValueError("Nessun giro consistente trovato dopo il filtraggio.")
+
+    lap_number = laps['LapNumber'].to_numpy(dtype=np.float64)
+    total_laps = getattr(session, 'total_laps', None) or lap_number.max()
+    corrected = lap_time - fuel_load_kg(lap_number, total_laps) * FUEL_EFFECT_S_PER_KG
+    tyre_life = laps['TyreLife'].to_numpy(dtype=np.float64)
+
+    group = laps.groupby(['Driver', 'Stint'], sort=True, observed=True).ngroup().to_numpy()
+    n, pace, coef = stint_fits(group, tyre_life, corrected)
+
+    keys = laps.groupby(['Driver', 'Stint'], sort=True, observed=True).agg(
+        Compound=('Compound', 'first'), StartLap=('LapNumber', 'min'), EndLap=('LapNumber', 'max'))
+    stints = keys.reset_index()
+    stints['Driver'] = stints['Driver'].astype(str)
+    stints['Compound'] = stints['Compound'].astype(str)
+    stints['Laps'] = n.astype(int)
+    stints['Pace'] = pace
+    stints['Degradation'] = coef[:, 1]
+    return stints
+
+
+def create_plot(session):
+    """
+    Passo gara (corretto per il carburante) e degrado gomme per ogni stint
+    di ogni pilota, disegnati con una sola chiamata `bar` per pannello.
+    """
+    plt.style.use("cyberpunk")
+    fig = None
+
+    try:
+        stints = stint_degradation(session)
+
+        # Ordine dei piloti per passo medio del loro stint migliore
+        driver_order = stints.groupby('Driver')['Pace'].min().sort_values().index.tolist()
+        stints['DriverIdx'] = stints['Driver'].map({d: i for i, d in enumerate(driver_order)})
+        stints['StintIdx'] = stints.groupby('Driver').cumcount()
+        n_stints = stints.groupby('Driver')['Stint'].transform('size')
+        width = 0.8 / n_stints.max()
+        x = stints['DriverIdx'] + (stints['StintIdx'] - (n_stints - 1) / 2) * width
+        colors = stints['Compound'].map(COMPOUND_COLORS).fillna(COMPOUND_COLORS['UNKNOWN'])
+
+        fig, (ax_pace, ax_deg) = plt.subplots(2, 1, figsize=(16, 10), sharex=True)
+
+        ax_pace.bar(x, stints['Pace'], width=width, color='none', edgecolor=colors, linewidth=1.5)
+        pace_min, pace_max = stints['Pace'].min(), stints['Pace'].max()
+        ax_pace.set_ylim(pace_min - 0.5, pace_max + 0.5)
+        ax_pace.set_ylabel('Passo medio (s)\ncorretto carburante')
+        ax_pace.set_title('Passo per stint')
+
+        degradation = stints['Degradation'].fillna(0)
+        ax_deg.bar(x, degradation, width=width, color=colors, alpha=0.8)
+        ax_deg.axhline(0, color='white', linewidth=0.8)
+        ax_deg.set_ylabel('Degrado (s/giro)')
+        ax_deg.set_title('Degrado gomme per stint')
+        ax_deg.set_xticks(range(len(driver_order)))
+        ax_deg.set_xticklabels(driver_order)
+
+        compounds_used = set(stints['Compound'])
+        handles = [Patch(color=COMPOUND_COLORS[c], label=c) for c in CANONICAL_COMPOUND_ORDER if c in compounds_used]
+        ax_pace.legend(handles=handles, loc='upper left', frameon=True, facecolor='black', framealpha=0.7)
+
+        fig.suptitle(f"{session.event['EventName']} {session.event.year} - {session.name}\nPasso Gara e Degrado Gomme", fontsize=14)
+        fig.tight_layout(rect=[0, 0, 1, 0.95])
+
+        return fig
+
+    except Exception as e:
+        print(f"Errore durante la creazione del grafico del passo gara: {e}")
+        # Chiude l'eventuale figura parziale, altrimenti resterebbe orfana in pyplot
+        if fig is not None:
+            plt.close(fig)
+        plt.style.use("cyberpunk")
+        fig, ax = plt.subplots(figsize=(16, 8))
+        ax.text(0.5, 0.5, f"Errore nella creazione del grafico:\n{e}", ha='center', va='center', fontsize=16, wrap=True)
+        fig.analysis_error = str(e)
+
+        return fig
@@ -0,0 +1,176 @@
+import gc
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fastf1 as ff1
+import matplotlib.pyplot as plt
+import numpy as np
+import mplcyberpunk
+
+from ..config import COMPOUND_COLORS, CANONICAL_COMPOUND_ORDER, SEASON_WORKERS
+from ..ml.dataset import season_sessions
+from .cache_manager import cache_manager
+from .lap_table import LapTable
+
+# Istogrammi del rapporto tempo/giro più veloce della gara, da 1.00 a 1.07
+# (oltre il 107% i giri sono scartati come nel box plot)
+BIN_EDGES = np.linspace(1.0, 1.07, 141)
+N_BINS = len(BIN_EDGES) - 1
+
+
+def summarize_laps(laps):
+    """
+    Riduce i giri di una sessione a un istogramma per (pilota, mescola).
+    Gli istogrammi di sessioni diverse si uniscono semplicemente sommandoli.
+    """
+    if laps is None or laps.empty:
+        return {}
+    # Stessa tabella compatta delle altre analisi: categorie e tempi in secondi float32
+    table = LapTable.from_laps(laps).frame
+    table = table[table['LapTime'].notna() & table['IsGreen'] & ~table['PitInLap'] & ~table['PitOutLap']
+                  & table['Compound'].notna()]
+    if table.empty:
+        return {}
+    lap_time = table['LapTime'].to_numpy(dtype=np.float64)
+    ratio = lap_time / lap_time.min()
+    keep = ratio < BIN_EDGES[-1]
+    ratio = ratio[keep]
+
+    # Un gruppo per coppia di codici (pilota, mescola): la riga i di counts è la coppia keys[i]
+    drivers, compounds = table['Driver'].cat.categories, table['Compound'].cat.categories
+    pair = (table['Driver'].cat.codes.to_numpy().astype(np.int64) * len(compounds)
+            + table['Compound'].cat.codes.to_numpy())[keep]
+    pairs, group = np.unique(pair, return_inverse=True)
+    keys = [(drivers[p // len(compounds)], compounds[p % len(compounds)]) for p in pairs]
+    bins = np.clip(np.searchsorted(BIN_EDGES, ratio, side='right') - 1, 0, N_BINS - 1)
+    counts = np.bincount(group * N_BINS + bins, minlength=len(keys) * N_BINS).reshape(len(keys), N_BINS)
+    return {key: counts[i] for i, key in enumerate(keys)}
+
+
+def summarize_session(year, event_name, session_name='Race'):
+    """Carica una gara (solo i giri), la riduce a istogrammi e la scarta."""
+    cache_manager.enable()
+    session = ff1.get_session(year, event_name, session_name)
+    cache_manager.prepare(session)
+    session.load(laps=True, telemetry=False, weather=False, messages=False)
+    cache_manager.touch(session)
+    summary = summarize_laps(session.laps)
+    del session
+    gc.collect()
+    return summary
+
+
+def merge_summaries(total, summary):
+    for key, counts in summary.items():
+        if key in total:
+            total[key] += counts
+        else:
+            total[key] = counts.astype(np.int64)
+    return total
+
+
+_season_cache = {}
+_season_lock = threading.Lock()
+
+
+def season_summary(year, session_name='Race', workers=SEASON_WORKERS, progress=None):
+    """
+    Scorre le gare già disputate di una stagione su un pool di processi. Ogni
+    processo tiene in memoria una sola sessione alla volta e restituisce solo
+    gli istogrammi, che vengono uniti man mano che arrivano. Il numero di gare
+    disputate fa parte della chiave della cache: a stagione in corso, ogni
+    nuova gara invalida il risultato precedente.
+    """
+    units = season_sessions(year, (session_name,), held_only=True)
+    key = (year, session_name, len(units))
+    with _season_lock:
+        if key in _season_cache:
+            return _season_cache[key]
+
+    total, done, failed = {}, 0, 0
+    # 'spawn': i processi non ereditano lo stato di Tk e dei thread dell'app (fork non è sicuro)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(summarize_session, *unit) for unit in units]
+        for future in as_completed(futures):
+            try:
+                merge_summaries(total, future.result())
+                done += 1
+            except Exception as e:
+                # Gare non ancora disputate o non disponibili
+                failed += 1
+                print(f"Stagione {year}: sessione saltata ({e})")
+            if progress:
+                progress(done + failed, len(units))
+
+    if not total:
+        raise ValueError(f"Nessuna gara disponibile per la stagione {year}.")
+    result = {'summary': total, 'races': done, 'skipped': failed}
+    with _season_lock:
+        _season_cache[key] = result
+    return result
+
+
+def histogram_stats(counts, label):
+    """Statistiche per `Axes.bxp` calcolate dall'istogramma (baffi al 5° e 95° percentile)."""
+    cumulative = np.cumsum(counts) / counts.sum()
+    centers = (BIN_EDGES[:-1] + BIN_EDGES[1:]) / 2
+    q = lambda p: (centers[np.searchsorted(cumulative, p)] - 1.0) * 100
+    return {'label': label, 'med': q(0.5), 'q1': q(0.25), 'q3': q(0.75), 'whislo': q(0.05), 'whishi': q(0.95), 'fliers': []}
+
+
+def create_plot(session, workers=SEASON_WORKERS, progress=None):
+    """
+    Distribuzione stagionale del passo: per ogni pilota e mescola, il
+    distacco percentuale dal giro più veloce di ciascuna gara della stagione.
+    """
+    plt.style.use("cyberpunk")
+    fig = None
+
+    try:
+        year = session.event.year
+        season = season_summary(year, workers=workers, progress=progress)
+        summary = season['summary']
+
+        drivers_to_plot = sorted({driver for driver, _ in summary})
+        ncols = 4
+        nrows = (len(drivers_to_plot) + ncols - 1) // ncols
+        fig, axes = plt.subplots(nrows=nrows, ncols=ncols, figsize=(16, 4 * nrows), sharey=True)
+        axes_flat = np.atleast_1d(axes).flatten()
+
+        for i, driver in enumerate(drivers_to_plot):
+            ax = axes_flat[i]
+            compounds = [c for c in CANONICAL_COMPOUND_ORDER if (driver, c) in summary]
+            stats = [histogram_stats(summary[(driver, c)], c) for c in compounds]
+            artists = ax.bxp(stats, showfliers=False, patch_artist=True,
+                             medianprops={'color': '#FF55A3', 'linewidth': 2})
+            # Stesso effetto "neon outline" del box plot di sessione
+            for j, compound in enumerate(compounds):
+                color = COMPOUND_COLORS.get(compound, 'white')
+                artists['boxes'][j].set(facecolor='none', edgecolor=color, linewidth=1.5)
+                for artist in artists['whiskers'][2 * j:2 * j + 2] + artists['caps'][2 * j:2 * j + 2]:
+                    artist.set(color=color, linewidth=1.5)
+            ax.set_title(driver, fontsize=12, fontweight='bold')
+            ax.tick_params(axis='x', labelsize=9)
+
+        for i in range(len(drivers_to_plot), len(axes_flat)):
+            axes_flat[i].set_visible(False)
+
+        fig.suptitle(f"Stagione {year} - {season['races']} gare\nDistribuzione del Passo (% dal giro più veloce di ogni gara)", fontsize=14, y=1.0)
+        fig.text(0.01, 0.5, 'Distacco dal giro più veloce (%)', va='center', rotation='vertical', fontsize=12)
+        fig.subplots_adjust(hspace=0.6)
+        fig.tight_layout(rect=[0.02, 0, 1, 0.96])
+
+        return fig
+
+    except Exception as e:
+        print(f"Errore durante la creazione del grafico stagionale: {e}")
+        # Chiude l'eventuale figura parziale, altrimenti resterebbe orfana in pyplot
+        if fig is not None:
+            plt.close(fig)
+        plt.style.use("cyberpunk")
+        fig, ax = plt.subplots(figsize=(16, 8))
+        ax.text(0.5, 0.5, f"Errore nella creazione del grafico:\n{e}", ha='center', va='center', fontsize=16, wrap=True)
+        fig.analysis_error = str(e)
+
+        return fig
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from .lap_table import lap_table
+
+TIME_COLUMNS = ['BestS1', 'BestS2', 'BestS3', 'IdealLap', 'BestLap']
+SPEED_COLUMNS = ['MaxI1', 'MaxI2', 'MaxFL', 'MaxST']
+# Intestazioni mostrate nella tabella dell'app
+COLUMN_LABELS = {
+    'Rank': 'Pos', 'Driver': 'Pilota', 'Team': 'Team',
+    'BestS1': 'S1', 'BestS2': 'S2', 'BestS3': 'S3',
+    'IdealLap': 'Giro ideale', 'BestLap': 'Miglior giro', 'Gap': 'Gap',
+    'MaxI1': 'V. I1', 'MaxI2': 'V. I2', 'MaxFL': 'V. FL', 'MaxST': 'V. ST',
+}
+
+
+def create_table(session):
+    """
+    Migliori settori, giro ideale (somma dei migliori settori), miglior giro
+    reale, distacco tra i due e velocità massime alle speed trap, per pilota.
+    Tutto in una sola groupby sulla tabella compatta dei giri (tempi già in secondi).
+    """
+    laps = lap_table(session).frame
+
+    table = laps.groupby('Driver', observed=True).agg(
+        Team=('Team', 'first'),
+        BestS1=('Sector1Time', 'min'),
+        BestS2=('Sector2Time', 'min'),
+        BestS3=('Sector3Time', 'min'),
+        BestLap=('LapTime', 'min'),
+        MaxI1=('SpeedI1', 'max'),
+        MaxI2=('SpeedI2', 'max'),
+        MaxFL=('SpeedFL', 'max'),
+        MaxST=('SpeedST', 'max'),
+    )
+    for col in ['BestS1', 'BestS2', 'BestS3', 'BestLap']:
+        # I tempi di fastf1 sono al millesimo: si tolgono gli arrotondamenti del float32
+        table[col] = table[col].astype(np.float64).round(3)
+    table['IdealLap'] = table['BestS1'] + table['BestS2'] + table['BestS3']
+    table['Gap'] = table['BestLap'] - table['IdealLap']
+
+    table = table.dropna(subset=['IdealLap']).sort_values('IdealLap').reset_index()
+    table['Driver'] = table['Driver'].astype(str)
+    table['Team'] = table['Team'].astype(str)
+    table.insert(0, 'Rank', np.arange(1, len(table) + 1))
+    return table[list(COLUMN_LABELS)]
+
+
+def format_value(column, value):
+    """Testo di una cella: tempi come m:ss.sss, velocità in km/h intere."""
+    if pd.isna(value):
+        return '-'
+    if column in TIME_COLUMNS:
+        minutes, seconds = divmod(value, 60)
+        return f"{int(minutes)}:{seconds:06.3f}" if minutes else f"{seconds:.3f}"
+    if column == 'Gap':
+        return f"+{value:.3f}"
+    if column in SPEED_COLUMNS:
+        return f"{value:.0f}"
+    return str(value)
+
+
+def sort_orders(table):
+    """
+    Ordinamento crescente di ogni colonna, calcolato una volta sola: quando
+    l'utente riordina la tabella si riusano questi indici senza ricalcolare nulla.
+    """
+    return {col: np.argsort(table[col].to_numpy(), kind='stable') for col in table.columns}
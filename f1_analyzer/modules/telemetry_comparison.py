@@ -4,46 +4,51 @@ import fastf1.utils
 import pandas as pd
 import mplcyberpunk
 
-def create_plot(session, driver1_code, driver2_code):
+from .lap_table import fastest_lap
+
+def align_telemetry(session, driver1_code, driver2_code):
     """
-    Funzione che crea il confronto telemetrico usando i dati di telemetria
-    restituiti direttamente da `delta_time` per garantire un allineamento perfetto.
+    Telemetria dei giri più veloci dei due piloti allineata da `delta_time`:
+    ritorna i due giri, `ref_tel` (pilota 1) e `com_tel` (pilota 2, con la
+    colonna DeltaTime del gap rispetto al pilota 1).
     """
-    plt.style.use("cyberpunk")
-    
-    try:
-        fastf1.plotting.setup_mpl()
-        
-        laps_d1 = session.laps.pick_driver(driver1_code)
-        laps_d2 = session.laps.pick_driver(driver2_code)
-        
-        fastest_d1 = laps_d1.pick_fastest()
-        fastest_d2 = laps_d2.pick_fastest()
+    # Il giro più veloce si cerca nella fetta del pilota della tabella compatta
+    fastest_d1 = fastest_lap(session, driver1_code)
+    fastest_d2 = fastest_lap(session, driver2_code)
 
-        if fastest_d1 is None or pd.isna(fastest_d1.LapTime):
-            raise ValueError(f"{driver1_code} non ha un giro veloce valido.")
-        if fastest_d2 is None or pd.isna(fastest_d2.LapTime):
-            raise ValueError(f"{driver2_code} non ha un giro veloce valido.")
-        
-        # `delta_time` calcola il gap, `ref_tel` è la telemetria allineata del pilota 1,
-        # `com_tel` è la telemetria allineata del pilota 2.
-        # Questi dataframe contengono già tutti i canali (Speed, RPM, etc.)
-        delta_time, ref_tel, com_tel = fastf1.utils.delta_time(fastest_d1, fastest_d2)
-        
-        # Aggiungiamo il delta time calcolato al dataframe del pilota di confronto
-        # per averlo a disposizione nel tooltip interattivo.
-        com_tel['DeltaTime'] = delta_time
+    if fastest_d1 is None or pd.isna(fastest_d1.LapTime):
+        raise ValueError(f"{driver1_code} non ha un giro veloce valido.")
+    if fastest_d2 is None or pd.isna(fastest_d2.LapTime):
+        raise ValueError(f"{driver2_code} non ha un giro veloce valido.")
 
-        team_d1_color = fastf1.plotting.get_team_color(fastest_d1['Team'], session)
-        team_d2_color = fastf1.plotting.get_team_color(fastest_d2['Team'], session)
+    # `delta_time` calcola il gap, `ref_tel` è la telemetria allineata del pilota 1,
+    # `com_tel` è la telemetria allineata del pilota 2.
+    # Questi dataframe contengono già tutti i canali (Speed, RPM, etc.)
+    delta_time, ref_tel, com_tel = fastf1.utils.delta_time(fastest_d1, fastest_d2)
 
-        linestyle_d2 = '--' if fastest_d1['Team'] == fastest_d2['Team'] else 'solid'
-        
-        plot_ratios = [1, 3, 2, 1, 1, 2, 1]
-        fig, axes = plt.subplots(7, 1, figsize=(16, 18), 
-                                 gridspec_kw={'height_ratios': plot_ratios}, 
-                                 sharex=True)
+    # Aggiungiamo il delta time calcolato al dataframe del pilota di confronto
+    # per averlo a disposizione nel tooltip interattivo.
+    com_tel['DeltaTime'] = delta_time
+    return fastest_d1, fastest_d2, ref_tel, com_tel
+
+
+def draw_comparison(session, driver1_code, driver2_code, fastest_d1, fastest_d2, ref_tel, com_tel):
+    """Disegna il confronto a partire dalla telemetria già allineata (vedi `align_telemetry`)."""
+    fastf1.plotting.setup_mpl()
+    delta_time = com_tel['DeltaTime']
+
+    team_d1_color = fastf1.plotting.get_team_color(fastest_d1['Team'], session)
+    team_d2_color = fastf1.plotting.get_team_color(fastest_d2['Team'], session)
+
+    linestyle_d2 = '--' if fastest_d1['Team'] == fastest_d2['Team'] else 'solid'
+    
+    plot_ratios = [1, 3, 2, 1, 1, 2, 1]
+    fig, axes = plt.subplots(7, 1, figsize=(16, 18), 
+                             gridspec_kw={'height_ratios': plot_ratios}, 
+                             sharex=True)
 
+    # Se il disegno fallisce la figura va chiusa qui: il chiamante non la riceve mai
+    try:
         plot_title = (f"{session.event.year} {session.event.EventName} - {session.name}\n"
                       f"{driver1_code} ({str(fastest_d1.LapTime).split(' ')[-1][:-3]}) vs "
                       f"{driver2_code} ({str(fastest_d2.LapTime).split(' ')[-1][:-3]})")
@@ -70,12 +75,12 @@ def create_plot(session, driver1_code, driver2_code):
         axes[3].plot(ref_tel['Distance'], ref_tel['Brake'], color=team_d1_color)
         axes[3].plot(com_tel['Distance'], com_tel['Brake'], color=team_d2_color, linestyle=linestyle_d2)
         axes[3].set_ylabel('Freno')
-        
+    
         # 5. Marcia
         axes[4].plot(ref_tel['Distance'], ref_tel['nGear'], color=team_d1_color)
         axes[4].plot(com_tel['Distance'], com_tel['nGear'], color=team_d2_color, linestyle=linestyle_d2)
         axes[4].set_ylabel('Marcia')
-        
+    
         # 6. RPM
         axes[5].plot(ref_tel['Distance'], ref_tel['RPM'], color=team_d1_color)
         axes[5].plot(com_tel['Distance'], com_tel['RPM'], color=team_d2_color, linestyle=linestyle_d2)
@@ -88,15 +93,36 @@ def create_plot(session, driver1_code, driver2_code):
         axes[6].set_yticks([0, 1]); axes[6].set_yticklabels(['OFF', 'ON'])
 
         axes[6].set_xlabel('Distanza (m)')
-        plt.tight_layout()
+        fig.tight_layout()
+    except Exception:
+        plt.close(fig)
+        raise
+    return fig
+
+
+def create_plot(session, driver1_code, driver2_code):
+    """
+    Funzione che crea il confronto telemetrico usando i dati di telemetria
+    restituiti direttamente da `delta_time` per garantire un allineamento perfetto.
+    """
+    plt.style.use("cyberpunk")
+    fig = None
+    
+    try:
+        fastest_d1, fastest_d2, ref_tel, com_tel = align_telemetry(session, driver1_code, driver2_code)
+        fig = draw_comparison(session, driver1_code, driver2_code, fastest_d1, fastest_d2, ref_tel, com_tel)
         
         # Restituisci i dataframe corretti e allineati per l'interattività
         return fig, ref_tel, com_tel
         
     except Exception as e:
         print(f"Errore durante la creazione del grafico di telemetria: {e}")
+        # Chiude l'eventuale figura parziale, altrimenti resterebbe orfana in pyplot
+        if fig is not None:
+            plt.close(fig)
         plt.style.use("cyberpunk")
         fig, ax = plt.subplots(figsize=(15, 10))
         ax.text(0.5, 0.5, f"Impossibile generare il grafico:\n{e}", 
                 ha='center', va='center', fontsize=16, wrap=True)
+        fig.analysis_error = str(e)
         return fig, None, None
\ No newline at end of file
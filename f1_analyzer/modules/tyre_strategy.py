@@ -0,0 +1,104 @@
+import matplotlib.pyplot as plt
+from matplotlib.patches import Patch
+import numpy as np
+import pandas as pd
+import mplcyberpunk
+
+from ..config import COMPOUND_COLORS, CANONICAL_COMPOUND_ORDER
+from .lap_table import lap_table
+
+
+def stint_table(laps):
+    """
+    Ricava gli stint di tutti i piloti con un'unica codifica run-length sulla
+    sequenza (Driver, Stint, Compound) della tabella compatta dei giri, già
+    ordinata per pilota e giro: i confronti avvengono sui codici interi.
+    """
+    laps = laps[laps['LapNumber'] >= 0]
+    driver = laps['Driver'].cat.codes.to_numpy()
+    stint = laps['Stint'].to_numpy()
+    compound = laps['Compound'].cat.codes.to_numpy()
+    lap_number = laps['LapNumber'].to_numpy(dtype=np.int64)
+
+    # Un nuovo segmento inizia dove cambia pilota, stint o mescola
+    change = np.ones(len(laps), dtype=bool)
+    change[1:] = (driver[1:] != driver[:-1]) | (stint[1:] != stint[:-1]) | (compound[1:] != compound[:-1])
+    starts = np.flatnonzero(change)
+    ends = np.append(starts[1:], len(laps)) - 1
+
+    # Il codice -1 (mescola mancante) indicizza l'ultima etichetta, UNKNOWN
+    driver_labels = laps['Driver'].cat.categories.to_numpy(dtype=object)
+    compound_labels = np.append(laps['Compound'].cat.categories.to_numpy(dtype=object), 'UNKNOWN')
+    return pd.DataFrame({
+        'Driver': driver_labels[driver[starts]],
+        'Stint': stint[starts],
+        'Compound': compound_labels[compound[starts]],
+        'StartLap': lap_number[starts],
+        'EndLap': lap_number[ends],
+        'Laps': lap_number[ends] - lap_number[starts] + 1,
+    })
+
+
+def driver_order(session, stints):
+    """Ordine di arrivo se disponibile, altrimenti ordine alfabetico."""
+    try:
+        results = session.results.dropna(subset=['Position']).sort_values('Position')
+        order = [d for d in results['Abbreviation'] if d in set(stints['Driver'])]
+    except Exception:
+        order = []
+    missing = sorted(set(stints['Driver']) - set(order))
+    return order + missing
+
+
+def draw_strategy(ax, stints, order):
+    """Un solo `broken_barh` per pilota, con tutti i suoi stint come segmenti."""
+    y_of = {d: i for i, d in enumerate(order)}
+    colors = stints['Compound'].map(COMPOUND_COLORS).fillna(COMPOUND_COLORS['UNKNOWN']).to_numpy()
+    for driver, rows in stints.groupby('Driver', sort=False).indices.items():
+        if driver not in y_of:
+            continue
+        segments = np.column_stack([stints['StartLap'].to_numpy()[rows] - 1, stints['Laps'].to_numpy()[rows]])
+        ax.broken_barh(segments, (y_of[driver] - 0.4, 0.8), facecolors=colors[rows], edgecolor='black', linewidth=1)
+
+    ax.set_yticks(range(len(order)))
+    ax.set_yticklabels(order)
+    ax.set_ylim(len(order) - 0.5, -0.5)
+    ax.set_xlim(0, stints['EndLap'].max())
+    ax.set_xlabel('Giro')
+    ax.grid(False)
+
+    compounds_used = set(stints['Compound'])
+    handles = [Patch(color=COMPOUND_COLORS[c], label=c) for c in CANONICAL_COMPOUND_ORDER if c in compounds_used]
+    ax.legend(handles=handles, loc='lower right', frameon=True, facecolor='black', framealpha=0.7)
+
+
+def create_plot(session):
+    """
+    Diagramma di Gantt della strategia gomme: una riga per pilota, un
+    segmento colorato per ogni stint.
+    """
+    plt.style.use("cyberpunk")
+    fig = None
+
+    try:
+        stints = stint_table(lap_table(session).frame)
+        order = driver_order(session, stints)
+
+        fig, ax = plt.subplots(figsize=(16, max(6, 0.45 * len(order))))
+        draw_strategy(ax, stints, order)
+        ax.set_title(f"{session.event['EventName']} {session.event.year} - {session.name}\nStrategia Gomme", fontsize=14)
+        fig.tight_layout()
+
+        return fig
+
+    except Exception as e:
+        print(f"Errore durante la creazione del grafico della strategia: {e}")
+        # Chiude l'eventuale figura parziale, altrimenti resterebbe orfana in pyplot
+        if fig is not None:
+            plt.close(fig)
+        plt.style.use("cyberpunk")
+        fig, ax = plt.subplots(figsize=(16, 8))
+        ax.text(0.5, 0.5, f"Errore nella creazione del grafico:\n{e}", ha='center', va='center', fontsize=16, wrap=True)
+        fig.analysis_error = str(e)
+
+        return fig
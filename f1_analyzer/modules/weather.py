@@ -0,0 +1,135 @@
+import threading
+
+import matplotlib.pyplot as plt
+from matplotlib.lines import Line2D
+import numpy as np
+import pandas as pd
+import mplcyberpunk
+
+from ..config import COMPOUND_COLORS, CANONICAL_COMPOUND_ORDER
+from .lap_table import lap_table
+from .memory_tracker import SessionCache
+
+WEATHER_COLUMNS = ['AirTemp', 'TrackTemp', 'Humidity', 'Rainfall', 'WindSpeed']
+LAP_COLUMNS = ['Driver', 'LapNumber', 'LapTime', 'Time', 'Compound', 'IsGreen', 'PitInLap', 'PitOutLap']
+
+# Giri con il meteo associato, calcolati una volta per sessione
+_laps_weather_cache = SessionCache('laps_with_weather')
+_weather_lock = threading.Lock()
+
+
+def ensure_weather(session):
+    """
+    Carica i dati meteo della sessione solo alla prima richiesta: l'app carica
+    le sessioni con `weather=False` e li recupera qui quando servono.
+    """
+    with _weather_lock:
+        try:
+            return session.weather_data
+        except Exception:
+            pass
+        # Carica solo il meteo, senza ricaricare giri e telemetria già in memoria
+        session._load_weather_data()
+        try:
+            weather = session.weather_data
+        except Exception:
+            weather = None
+        if weather is None or weather.empty:
+            raise ValueError("Dati meteo non disponibili per questa sessione.")
+        return weather
+
+
+def _join_laps_weather(session):
+    weather = ensure_weather(session)
+    # Giri dalla tabella compatta condivisa: tempi già in secondi
+    laps = lap_table(session).frame[LAP_COLUMNS].dropna(subset=['Time']).sort_values('Time')
+    weather = weather[['Time'] + WEATHER_COLUMNS].dropna(subset=['Time'])
+    weather = weather.assign(Time=weather['Time'].dt.total_seconds()).sort_values('Time')
+    # As-of join: a ogni giro il campione meteo più vicino all'istante in cui è stato chiuso
+    return pd.merge_asof(laps, weather, on='Time', direction='nearest').reset_index(drop=True)
+
+
+def laps_with_weather(session):
+    """
+    Tutti i giri della sessione (righe della tabella compatta, tempi in secondi)
+    con le colonne meteo aggiunte (in cache per sessione).
+    """
+    return _laps_weather_cache.get_or_compute(session, lambda: _join_laps_weather(session))
+
+
+def create_plot(session):
+    """
+    Relazione tra tempo sul giro e condizioni meteo: tempi vs temperatura
+    dell'asfalto (giri sotto la pioggia evidenziati) e andamento nel tempo
+    di tempi sul giro, temperatura e pioggia.
+    """
+    plt.style.use("cyberpunk")
+    fig = None
+
+    try:
+        laps = laps_with_weather(session)
+        laps = laps[laps['LapTime'].notna() & ~laps['PitInLap'] & ~laps['PitOutLap'] & laps['IsGreen']]
+        laps = laps[laps['LapTime'] <= laps['LapTime'].min() * 1.07]
+        lap_time = laps['LapTime'].to_numpy(dtype=np.float64)
+        if laps.empty:
+            raise ValueError("Nessun giro consistente trovato dopo il filtraggio.")
+
+        track_temp = laps['TrackTemp'].to_numpy(dtype=np.float64)
+        rain = laps['Rainfall'].fillna(False).astype(bool).to_numpy()
+        colors = laps['Compound'].astype(object).map(COMPOUND_COLORS).fillna(COMPOUND_COLORS['UNKNOWN']).to_numpy()
+
+        fig, (ax_temp, ax_time) = plt.subplots(2, 1, figsize=(16, 12))
+
+        ax_temp.scatter(track_temp[~rain], lap_time[~rain], c=colors[~rain], s=14, alpha=0.7)
+        if rain.any():
+            ax_temp.scatter(track_temp[rain], lap_time[rain], c=colors[rain], s=30, marker='x')
+        valid = ~np.isnan(track_temp)
+        if np.unique(track_temp[valid]).size > 1:
+            slope, intercept = np.polyfit(track_temp[valid], lap_time[valid], 1)
+            xs = np.array([track_temp[valid].min(), track_temp[valid].max()])
+            ax_temp.plot(xs, slope * xs + intercept, color='white', linestyle='--', linewidth=1)
+            ax_temp.set_title(f"Tempo sul giro vs temperatura asfalto ({slope:+.3f} s/°C)")
+        else:
+            ax_temp.set_title("Tempo sul giro vs temperatura asfalto")
+        ax_temp.set_xlabel('Temperatura asfalto (°C)')
+        ax_temp.set_ylabel('Tempo sul giro (s)')
+        compounds_used = set(laps['Compound'])
+        handles = [Line2D([], [], marker='o', linestyle='', color=COMPOUND_COLORS[c], label=c)
+                   for c in CANONICAL_COMPOUND_ORDER if c in compounds_used]
+        if rain.any():
+            handles.append(Line2D([], [], marker='x', linestyle='', color='white', label='Pioggia'))
+        ax_temp.legend(handles=handles, loc='upper right', frameon=True, facecolor='black', framealpha=0.7)
+
+        session_minutes = laps['Time'].to_numpy() / 60
+        ax_time.scatter(session_minutes, lap_time, c=colors, s=10, alpha=0.6)
+        ax_time.set_xlabel('Tempo di sessione (min)')
+        ax_time.set_ylabel('Tempo sul giro (s)')
+        ax_time.set_title('Andamento nella sessione')
+
+        weather = ensure_weather(session)
+        weather_minutes = weather['Time'].dt.total_seconds().to_numpy() / 60
+        ax_track = ax_time.twinx()
+        ax_track.plot(weather_minutes, weather['TrackTemp'], color='#FF8C00', linewidth=1.5)
+        ax_track.set_ylabel('Temperatura asfalto (°C)', color='#FF8C00')
+        ax_track.grid(False)
+        raining = weather['Rainfall'].fillna(False).astype(bool).to_numpy()
+        if raining.any():
+            ax_time.fill_between(weather_minutes, 0, 1, where=raining, transform=ax_time.get_xaxis_transform(),
+                                 color='#0090FF', alpha=0.2, step='post')
+
+        fig.suptitle(f"{session.event['EventName']} {session.event.year} - {session.name}\nTempi sul Giro e Meteo", fontsize=14)
+        fig.tight_layout(rect=[0, 0, 1, 0.95])
+
+        return fig
+
+    except Exception as e:
+        print(f"Errore durante la creazione del grafico meteo: {e}")
+        # Chiude l'eventuale figura parziale, altrimenti resterebbe orfana in pyplot
+        if fig is not None:
+            plt.close(fig)
+        plt.style.use("cyberpunk")
+        fig, ax = plt.subplots(figsize=(16, 8))
+        ax.text(0.5, 0.5, f"Errore nella creazione del grafico:\n{e}", ha='center', va='center', fontsize=16, wrap=True)
+        fig.analysis_error = str(e)
+
+        return fig
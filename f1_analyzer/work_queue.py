@@ -0,0 +1,370 @@
+# File: f1_analyzer/work_queue.py
+"""
+Coda di lavoro su file system condiviso per elaborare intere stagioni su
+più processi e più macchine.
+
+Ogni unità (anno, evento, sessione, analisi) è un file JSON che passa tra le
+cartelle `pending/`, `leased/`, `done/` e `failed/` con rename atomici: chi
+riesce a spostare il file in `leased/` si aggiudica l'unità. Il worker
+rinnova il lease aggiornando il mtime del file; un lease scaduto torna in
+`pending/` (o in `failed/` dopo troppi tentativi). In `pending/` il mtime
+indica invece quando l'unità può essere ritentata. Gli output vengono
+scritti in un file temporaneo e rinominati, quindi rieseguire un'unità è
+innocuo.
+
+In `leased/` il nome del file contiene il token del lease (`<uid>.<token>.json`):
+completare, far fallire o recuperare un lease è un rename del proprio file,
+che riesce solo a chi lo detiene ancora. Le scadenze confrontano solo mtime
+del file system condiviso, mai l'orologio locale: l'ora corrente è il mtime
+di un file toccato nella coda, così gli orologi sfasati tra le macchine non
+fanno scadere lease sani né tengono in vita quelli morti.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+import fastf1 as ff1
+
+from .config import (DATASET_DIR, LEASE_HEARTBEAT_S, LEASE_TIMEOUT_S, QUEUE_DIR, QUEUE_MAX_ATTEMPTS,
+                     QUEUE_RETRY_DELAY_S, REPORTS_DIR)
+from .ml.dataset import slug, season_sessions
+
+STATES = ('pending', 'leased', 'done', 'failed')
+
+# Analisi eseguibili dai worker: nome -> (modulo, funzione). 'dataset' scrive
+# la partizione di feature per il machine learning invece di un grafico.
+ANALYSES = {
+    'dataset': ('.ml.dataset', 'process_session'),
+    'box-plot': ('.modules.box_plot', 'create_plot'),
+    'race-pace': ('.modules.race_pace', 'create_plot'),
+    'tyre-strategy': ('.modules.tyre_strategy', 'create_plot'),
+    'race-gaps': ('.modules.race_gaps', 'create_plot'),
+    'weather': ('.modules.weather', 'create_plot'),
+    'sector-ranking': ('.modules.sector_ranking', 'create_table'),
+}
+
+
+def unit_id(year, event_name, session_name, analysis):
+    return f"{year}__{slug(event_name)}__{slug(session_name)}__{analysis}"
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _rewrite_json(path, data):
+    # Sul posto, a differenza di _write_json: se il file è stato spostato da un
+    # altro processo si ha FileNotFoundError invece di ricrearlo
+    with open(path, 'r+', encoding='utf-8') as f:
+        f.truncate()
+        json.dump(data, f, indent=2)
+
+
+class WorkQueue:
+    def __init__(self, root=QUEUE_DIR, lease_timeout=LEASE_TIMEOUT_S, max_attempts=QUEUE_MAX_ATTEMPTS,
+                 retry_delay=QUEUE_RETRY_DELAY_S):
+        self.root = root
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        for state in STATES:
+            os.makedirs(self._dir(state), exist_ok=True)
+
+    def _dir(self, state):
+        return os.path.join(self.root, state)
+
+    def _path(self, state, uid):
+        return os.path.join(self._dir(state), f"{uid}.json")
+
+    def _lease_path(self, uid, token):
+        # token None: lease scritto prima dei token (`<uid>.json`), recuperabile alla scadenza
+        name = f"{uid}.json" if token is None else f"{uid}.{token}.json"
+        return os.path.join(self._dir('leased'), name)
+
+    def _leases(self):
+        """Lease in corso come coppie (uid, token); gli uid non contengono punti."""
+        names = (name[:-5].split('.', 1) for name in os.listdir(self._dir('leased')) if name.endswith('.json'))
+        return sorted(((parts[0], parts[1] if len(parts) == 2 else None) for parts in names), key=lambda lease: lease[0])
+
+    def _list(self, state):
+        if state == 'leased':
+            return sorted({uid for uid, _ in self._leases()})
+        return sorted(name[:-5] for name in os.listdir(self._dir(state)) if name.endswith('.json'))
+
+    def state_of(self, uid):
+        for state in STATES:
+            if state == 'leased':
+                if uid in self._list(state):
+                    return state
+            elif os.path.exists(self._path(state, uid)):
+                return state
+        return None
+
+    def now(self):
+        """Ora corrente del file system condiviso: il mtime di un file appena toccato nella coda."""
+        path = os.path.join(self.root, '.clock')
+        with open(path, 'a'):
+            pass
+        os.utime(path)
+        return os.path.getmtime(path)
+
+    # --- Produzione ---
+
+    def enqueue(self, units, force=False):
+        """
+        Aggiunge le unità non ancora presenti in coda. Con `force` rimette in
+        `pending/` anche quelle completate o fallite.
+        """
+        added = 0
+        for year, event_name, session_name, analysis in units:
+            uid = unit_id(year, event_name, session_name, analysis)
+            state = self.state_of(uid)
+            if state in ('pending', 'leased') or (state is not None and not force):
+                continue
+            if state is not None:
+                os.remove(self._path(state, uid))
+            _write_json(self._path('pending', uid), {
+                'year': year, 'event': event_name, 'session': session_name, 'analysis': analysis,
+                'attempts': 0, 'last_error': None,
+            })
+            added += 1
+        return added
+
+    # --- Consumo ---
+
+    def claim(self, worker_id):
+        """
+        Si aggiudica la prima unità libera; ritorna (uid, unità) oppure None.
+        `unità['lease']` è il token da passare a heartbeat, complete e fail.
+        """
+        now = self.now()
+        for uid in self._list('pending'):
+            pending_path = self._path('pending', uid)
+            token = uuid.uuid4().hex[:12]
+            leased_path = self._lease_path(uid, token)
+            try:
+                if os.path.getmtime(pending_path) > now:
+                    # In attesa del prossimo tentativo
+                    continue
+                os.rename(pending_path, leased_path)
+                # Il rename conserva il mtime (l'ora del tentativo, magari vecchia): il lease
+                # parte da adesso, altrimenti recover_expired lo vedrebbe già scaduto
+                os.utime(leased_path)
+                unit = _read_json(leased_path)
+                unit['attempts'] += 1
+                unit['worker'] = worker_id
+                unit['lease'] = token
+                _rewrite_json(leased_path, unit)
+            except (FileNotFoundError, json.JSONDecodeError):
+                # Presa da un altro worker, o rimessa in coda nel frattempo: si passa alla successiva
+                continue
+            return uid, unit
+        return None
+
+    def heartbeat(self, uid, unit):
+        try:
+            os.utime(self._lease_path(uid, unit['lease']))
+            return True
+        except FileNotFoundError:
+            # Lease scaduto e riassegnato: l'output resta comunque idempotente
+            return False
+
+    def complete(self, uid, unit):
+        """Sposta l'unità in `done/` se il lease è ancora del chiamante; ritorna se ci è riuscito."""
+        try:
+            os.replace(self._lease_path(uid, unit['lease']), self._path('done', uid))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def fail(self, uid, unit, error):
+        """
+        Rimette l'unità in coda, o la sposta in `failed/` se i tentativi sono
+        esauriti, purché il lease sia ancora del chiamante.
+        """
+        unit['last_error'] = error
+        path = self._lease_path(uid, unit['lease'])
+        try:
+            _rewrite_json(path, unit)
+            if unit['attempts'] >= self.max_attempts:
+                os.replace(path, self._path('failed', uid))
+                return True
+            retry_at = self.now() + self.retry_delay * unit['attempts']
+            os.utime(path, (retry_at, retry_at))
+            os.replace(path, self._path('pending', uid))
+            return True
+        except FileNotFoundError:
+            # Lease scaduto e recuperato da un altro worker
+            return False
+
+    def recover_expired(self):
+        """
+        Rimette in coda i lease non rinnovati entro il timeout (worker morti o
+        bloccati). Il lease scaduto viene prima rinominato con un token nuovo:
+        resta un lease come gli altri, quindi se chi lo recupera si ferma a metà
+        scadrà di nuovo e verrà ripreso da un altro worker.
+        """
+        recovered = 0
+        now = self.now()
+        for uid, token in self._leases():
+            expired_path = self._lease_path(uid, token)
+            unit = {'lease': uuid.uuid4().hex[:12]}
+            path = self._lease_path(uid, unit['lease'])
+            try:
+                if now - os.path.getmtime(expired_path) < self.lease_timeout:
+                    continue
+                os.rename(expired_path, path)
+                os.utime(path)
+                unit = {**_read_json(path), 'lease': unit['lease']}
+            except (FileNotFoundError, json.JSONDecodeError):
+                # Rinnovato, completato o recuperato da un altro worker nel frattempo
+                continue
+            if self.fail(uid, unit, f"Lease scaduto (worker {unit.get('worker')})"):
+                recovered += 1
+        return recovered
+
+    def counts(self):
+        return {state: len(self._list(state)) for state in STATES}
+
+    def failures(self):
+        return {uid: _read_json(self._path('failed', uid)).get('last_error') for uid in self._list('failed')}
+
+
+class _Heartbeat(threading.Thread):
+    def __init__(self, queue, uid, unit, interval=LEASE_HEARTBEAT_S):
+        super().__init__(daemon=True)
+        self.queue, self.uid, self.unit, self.interval = queue, uid, unit, interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            if not self.queue.heartbeat(self.uid, self.unit):
+                break
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def build_units(years, session_names=('Race',), analyses=tuple(ANALYSES)):
+    """Unità di lavoro (anno, evento, sessione, analisi) per le stagioni indicate."""
+    unknown = set(analyses) - set(ANALYSES)
+    if unknown:
+        raise ValueError(f"Analisi sconosciute: {', '.join(sorted(unknown))}")
+    return [(year, event_name, session_name, analysis)
+            for year in years
+            for _, event_name, session_name in season_sessions(year, session_names, held_only=True)
+            for analysis in analyses]
+
+
+def report_path(reports_dir, year, event_name, session_name, analysis, extension):
+    return os.path.join(reports_dir, str(year), slug(event_name), slug(session_name), f"{analysis}{extension}")
+
+
+class _SessionLoader:
+    """Tiene caricata l'ultima sessione: le unità della stessa sessione arrivano di seguito."""
+    def __init__(self):
+        self.key, self.session = None, None
+
+    def get(self, year, event_name, session_name):
+        if self.key != (year, event_name, session_name):
+            from .modules.cache_manager import cache_manager
+            self.key, self.session = None, None
+            cache_manager.enable()
+            session = ff1.get_session(year, event_name, session_name)
+            cache_manager.prepare(session)
+            session.load(laps=True, telemetry=False, weather=False, messages=False)
+            cache_manager.touch(session)
+            if session.laps is None or session.laps.empty:
+                raise ValueError(f"Dati non trovati per {event_name} - {session_name}.")
+            self.key, self.session = (year, event_name, session_name), session
+        return self.session
+
+
+def run_unit(unit, loader, reports_dir=REPORTS_DIR, dataset_dir=DATASET_DIR):
+    """Esegue una unità con le funzioni di analisi esistenti e ne scrive l'output."""
+    import importlib
+    import matplotlib.pyplot as plt
+    from .modules.export import export_figure, frame_chunks, write_chunks
+
+    year, event_name, session_name, analysis = unit['year'], unit['event'], unit['session'], unit['analysis']
+    module_name, function_name = ANALYSES[analysis]
+    function = getattr(importlib.import_module(module_name, __package__), function_name)
+    if analysis == 'dataset':
+        return function(year, event_name, session_name, root=dataset_dir)
+
+    result = function(loader.get(year, event_name, session_name))
+    if analysis == 'sector-ranking':
+        path = report_path(reports_dir, year, event_name, session_name, analysis, '.csv')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_chunks(frame_chunks(result), path)
+        return path
+    fig = result[0] if isinstance(result, tuple) else result
+    # Le analisi non sollevano eccezioni ma disegnano una figura con il messaggio
+    # d'errore (e ne impostano analysis_error): l'unità deve fallire, non finire in done/
+    error = getattr(fig, 'analysis_error', None)
+    if error is not None:
+        plt.close(fig)
+        raise RuntimeError(error)
+    path = report_path(reports_dir, year, event_name, session_name, analysis, '.png')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path[:-4]}.tmp-{os.getpid()}.png"
+    try:
+        export_figure(fig, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        plt.close(fig)
+    return path
+
+
+def run_worker(root=QUEUE_DIR, reports_dir=REPORTS_DIR, dataset_dir=DATASET_DIR, worker_id=None, poll_s=5.0):
+    """
+    Svuota la coda: prende un'unità alla volta finché non restano unità in
+    attesa né lease attivi di altri worker. Ritorna (completate, fallite).
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    ff1.set_log_level('WARNING')
+
+    queue = WorkQueue(root)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    loader = _SessionLoader()
+    done = failed = 0
+    while True:
+        queue.recover_expired()
+        claimed = queue.claim(worker_id)
+        if claimed is None:
+            counts = queue.counts()
+            if not counts['pending'] and not counts['leased']:
+                return done, failed
+            # Unità in attesa di un nuovo tentativo o in lavorazione da altri worker
+            time.sleep(poll_s)
+            continue
+
+        uid, unit = claimed
+        heartbeat = _Heartbeat(queue, uid, unit)
+        heartbeat.start()
+        try:
+            run_unit(unit, loader, reports_dir, dataset_dir)
+            if queue.complete(uid, unit):
+                done += 1
+                print(f"[{worker_id}] {uid}: completata")
+            else:
+                print(f"[{worker_id}] {uid}: lease scaduto, l'unità resta a chi l'ha ripresa")
+        except Exception as e:
+            if queue.fail(uid, unit, f"{type(e).__name__}: {e}"):
+                failed += 1
+            print(f"[{worker_id}] {uid}: errore (tentativo {unit['attempts']}): {e}")
+        finally:
+            heartbeat.stop()
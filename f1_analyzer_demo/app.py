@@ -1,7 +1,8 @@
 import streamlit as st
 import fastf1 as ff1
 from datetime import datetime
-import os
+import sys
+from pathlib import Path
 import pandas as pd
 import plotly.graph_objects as go
 import matplotlib.pyplot as plt
@@ -13,6 +14,11 @@ import matplotlib.pyplot as plt
 from modules.box_plot import create_plot as create_box_plot
 from modules.telemetry_comparison import create_plot as create_telemetry_plot
 
+# La cache di fastf1 è gestita dallo stesso CacheManager dell'app desktop:
+# i due front end condividono così un'unica cartella (vedi CACHE_DIR in config).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from f1_analyzer.modules.cache_manager import cache_manager
+
 # --- Funzioni di caching per ottimizzare le prestazioni ---
 # Streamlit ha un sistema di cache potentissimo. Con @st.cache_data,
 # i dati vengono scaricati una sola volta e riutilizzati,
@@ -21,6 +27,7 @@ from modules.telemetry_comparison import create_plot as create_telemetry_plot
 @st.cache_data(show_spinner="Recupero calendario...")
 def get_schedule(year):
     """Carica il calendario per un dato anno e lo mette in cache."""
+    cache_manager.enable()
     try:
         schedule = ff1.get_event_schedule(year, include_testing=True)
         return schedule
@@ -31,22 +38,27 @@ def get_schedule(year):
 @st.cache_data(show_spinner="Caricamento dati sessione... (potrebbe richiedere tempo)")
 def load_session_data(year, event, session_name):
     """Carica i dati di una specifica sessione e li mette in cache."""
-    # Assicura che la cartella cache esista
-    cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
-    os.makedirs(cache_path, exist_ok=True)
-    ff1.Cache.enable_cache(cache_path)
+    cache_manager.enable()
     
     try:
         session = ff1.get_session(year, event, session_name)
+        cache_manager.prepare(session)
         session.load(laps=True, telemetry=True, weather=False, messages=False)
         if session.laps is None or session.laps.empty:
             st.warning(f"Nessun dato trovato per {event} - {session_name}.")
             return None
-        return session
     except Exception as e:
         st.error(f"Errore durante il caricamento della sessione: {e}")
         return None
 
+    # Manutenzione della cache: un suo errore non invalida la sessione appena caricata
+    try:
+        cache_manager.touch(session)
+        cache_manager.enforce_budget(protect={cache_manager.entry_key(session)})
+    except Exception as e:
+        print(f"Errore nella manutenzione della cache: {e}")
+    return session
+
 # --- Configurazione della Pagina ---
 st.set_page_config(layout="wide", page_title="F1 Analysis Hub")
 st.title("🏎️ F1 Analysis Hub")
@@ -0,0 +1,52 @@
+import numpy as np
+
+from f1_analyzer.modules.delta_matrix import delta_matrices, pair_telemetry
+
+DRIVERS = ['VER', 'NOR', 'LEC', 'HAM']
+
+
+def _resampled(seed):
+    """Giri sulla griglia comune come in resampled_laps: tempo trascorso per punto e confini delle curve."""
+    rng = np.random.default_rng(seed)
+    distance = np.arange(0.0, 5000.0, 5.0)
+    time = np.cumsum(0.06 + rng.uniform(0, 0.01, (len(DRIVERS), len(distance))), axis=1)
+    time -= time[:, :1]
+    return {
+        'drivers': DRIVERS,
+        'laps': [f"lap {driver}" for driver in DRIVERS],
+        'lap_time': time[:, -1] + 0.05,
+        'distance': distance,
+        'time': time,
+        'channels': {'Speed': rng.uniform(80, 320, time.shape), 'nGear': rng.integers(1, 9, time.shape).astype(float)},
+        'corner_labels': ['1', '2', '3', '4'],
+        'bound_idx': np.array([0, 150, 420, 700, 860, len(distance) - 1]),
+    }
+
+
+def test_delta_matrices_match_pairwise_loop():
+    data = _resampled(seed=7)
+    final, corners = delta_matrices(data)
+
+    n, bounds = len(DRIVERS), data['bound_idx']
+    assert final.shape == (n, n) and corners.shape == (n, n, len(bounds) - 1)
+    for i in range(n):
+        for j in range(n):
+            assert np.isclose(final[i, j], data['lap_time'][i] - data['lap_time'][j])
+            for c in range(len(bounds) - 1):
+                lost_i = data['time'][i, bounds[c + 1]] - data['time'][i, bounds[c]]
+                lost_j = data['time'][j, bounds[c + 1]] - data['time'][j, bounds[c]]
+                assert np.isclose(corners[i, j, c], lost_i - lost_j)
+    # Antisimmetria: il distacco di i da j è l'opposto di quello di j da i
+    np.testing.assert_allclose(final, -final.T)
+    np.testing.assert_allclose(corners, -corners.transpose(1, 0, 2))
+
+
+def test_pair_telemetry_takes_the_two_rows():
+    data = _resampled(seed=8)
+    lap1, lap2, ref_tel, com_tel = pair_telemetry(data, 'LEC', 'NOR')
+
+    assert (lap1, lap2) == ('lap LEC', 'lap NOR')
+    np.testing.assert_array_equal(ref_tel['Speed'], data['channels']['Speed'][2])
+    np.testing.assert_array_equal(com_tel['nGear'], data['channels']['nGear'][1])
+    np.testing.assert_allclose(com_tel['DeltaTime'], data['time'][1] - data['time'][2])
+    assert 'DeltaTime' not in ref_tel
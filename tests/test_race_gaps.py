@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from f1_analyzer.modules.race_gaps import _build_race_time_matrix, evolution_matrices
+
+DRIVERS = ['ALO', 'HAM', 'LEC', 'VER', 'ZHO']
+
+
+def _race_time(seed):
+    """Tempi di gara cumulati (piloti × giri) con un ritiro, un doppiato e un pilota fermo al primo giro."""
+    rng = np.random.default_rng(seed)
+    race_time = np.cumsum(90 + rng.normal(0, 1.5, (len(DRIVERS), 12)), axis=1)
+    race_time[1, 7:] = np.nan
+    race_time[3, -1] = np.nan
+    race_time[4, 1:] = np.nan
+    return race_time
+
+
+def _expected(race_time, reference):
+    """Le stesse matrici giro per giro e pilota per pilota."""
+    shape = race_time.shape
+    gap_to_leader, gap_ahead, position = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+    for lap in range(shape[1]):
+        completed = [i for i in range(shape[0]) if not np.isnan(race_time[i, lap])]
+        ranked = sorted(completed, key=lambda i: race_time[i, lap])
+        for rank, i in enumerate(ranked):
+            position[i, lap] = rank + 1
+            gap_to_leader[i, lap] = race_time[i, lap] - race_time[ranked[0], lap]
+            if rank > 0:
+                gap_ahead[i, lap] = race_time[i, lap] - race_time[ranked[rank - 1], lap]
+    gap_to_reference = race_time - race_time[reference]
+    return gap_to_leader, gap_ahead, position, gap_to_reference
+
+
+def test_evolution_matches_per_lap_loop():
+    race_time = _race_time(seed=3)
+    data = evolution_matrices(DRIVERS, race_time, 'LEC')
+
+    gap_to_leader, gap_ahead, position, gap_to_reference = _expected(race_time, DRIVERS.index('LEC'))
+    np.testing.assert_allclose(data['gap_to_leader'], gap_to_leader)
+    np.testing.assert_allclose(data['gap_ahead'], gap_ahead)
+    np.testing.assert_array_equal(data['position'], position)
+    np.testing.assert_allclose(data['gap_to_reference'], gap_to_reference)
+    assert data['reference'] == 'LEC'
+    # I giri non completati restano NaN in tutte le matrici
+    missing = np.isnan(race_time)
+    for name in ('gap_to_leader', 'gap_ahead', 'position'):
+        assert np.isnan(data[name][missing]).all()
+
+
+def test_unknown_reference_has_no_reference_gap():
+    data = evolution_matrices(DRIVERS, _race_time(seed=4), 'XXX')
+    assert data['gap_to_reference'] is None and data['reference'] is None
+
+
+def test_race_time_matrix_from_lap_table():
+    race_time = _race_time(seed=5)
+    driver, lap = np.nonzero(~np.isnan(race_time))
+    # Righe della tabella compatta dei giri, in ordine sparso, con un pilota senza giri
+    # (categoria inutilizzata) e un giro generato da fastf1 da scartare
+    frame = pd.DataFrame({
+        'Driver': pd.Categorical(np.array(DRIVERS)[driver], categories=['AAA'] + DRIVERS),
+        'LapNumber': lap + 1,
+        'Time': 1000.0 + race_time[driver, lap],
+        'LapStartTime': 1000.0 + np.where(lap == 0, 0.0, race_time[driver, np.maximum(lap - 1, 0)]),
+        'FastF1Generated': False,
+    }).sample(frac=1, random_state=0)
+    generated = pd.DataFrame({'Driver': pd.Categorical(['ZHO'], categories=['AAA'] + DRIVERS), 'LapNumber': [2],
+                              'Time': [5000.0], 'LapStartTime': [4900.0], 'FastF1Generated': [True]})
+    drivers, matrix = _build_race_time_matrix(pd.concat([frame, generated], ignore_index=True))
+
+    assert drivers == DRIVERS
+    np.testing.assert_allclose(matrix, race_time)
@@ -0,0 +1,31 @@
+import numpy as np
+
+from f1_analyzer.modules.race_pace import MIN_STINT_LAPS, stint_fits
+
+
+def _stints(seed):
+    """Giri di cinque stint in ordine sparso: uno troppo corto e uno con la vita gomma costante."""
+    rng = np.random.default_rng(seed)
+    lengths = [12, 8, MIN_STINT_LAPS - 1, 15, 5]
+    group = np.repeat(np.arange(len(lengths)), lengths)
+    tyre_life = np.concatenate([np.arange(1, n + 1, dtype=np.float64) for n in lengths])
+    tyre_life[group == 4] = 3.0
+    slope = rng.uniform(0.02, 0.15, len(lengths))
+    corrected = 92 + slope[group] * tyre_life + rng.normal(0, 0.2, len(group))
+    order = rng.permutation(len(group))
+    return group[order], tyre_life[order], corrected[order]
+
+
+def test_batched_fits_match_per_stint_polyfit():
+    group, tyre_life, corrected = _stints(seed=11)
+    n, pace, coef = stint_fits(group, tyre_life, corrected)
+
+    for g in range(group.max() + 1):
+        x, y = tyre_life[group == g], corrected[group == g]
+        assert n[g] == len(x)
+        assert np.isclose(pace[g], y.mean())
+        if len(x) < MIN_STINT_LAPS or np.unique(x).size < 2:
+            assert np.isnan(coef[g]).all()
+        else:
+            slope, intercept = np.polyfit(x, y, 1)
+            np.testing.assert_allclose(coef[g], [intercept, slope], rtol=1e-9)
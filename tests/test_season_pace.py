@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from f1_analyzer.modules.season_pace import BIN_EDGES, merge_summaries, summarize_laps
+
+COMPOUNDS = ['SOFT', 'MEDIUM', 'HARD']
+
+
+def _laps(drivers, seed):
+    """Giri sintetici con le colonne di session.laps: qualche giro ai box e qualche giro lento."""
+    rng = np.random.default_rng(seed)
+    n_laps = 30
+    driver = np.repeat(drivers, n_laps)
+    lap_number = np.tile(np.arange(1, n_laps + 1), len(drivers))
+    lap_time = np.round(90 + rng.gamma(2.0, 0.8, len(driver)), 3)
+    lap_time[rng.random(len(driver)) < 0.05] += 20
+    pit_in = np.where(lap_number == 15, 1.0, np.nan)
+    n = len(driver)
+    return pd.DataFrame({
+        'Driver': driver,
+        'Team': 'Team',
+        'Compound': rng.choice(COMPOUNDS, n),
+        'LapNumber': lap_number,
+        'Stint': np.where(lap_number < 15, 1, 2),
+        'TyreLife': lap_number,
+        'TrackStatus': np.where(rng.random(n) < 0.1, '4', '1'),
+        'PitInTime': pd.to_timedelta(pit_in, unit='s'),
+        'PitOutTime': pd.to_timedelta(np.full(n, np.nan), unit='s'),
+        'LapTime': pd.to_timedelta(lap_time, unit='s'),
+        'Sector1Time': pd.to_timedelta(lap_time / 3, unit='s'),
+        'Sector2Time': pd.to_timedelta(lap_time / 3, unit='s'),
+        'Sector3Time': pd.to_timedelta(lap_time / 3, unit='s'),
+        'Time': pd.to_timedelta(lap_number * 95.0, unit='s'),
+        'LapStartTime': pd.to_timedelta((lap_number - 1) * 95.0, unit='s'),
+        'SpeedI1': 300.0, 'SpeedI2': 300.0, 'SpeedFL': 300.0, 'SpeedST': 300.0,
+    })
+
+
+def _expected(frames):
+    """Istogramma diretto per (pilota, mescola) dei rapporti dal giro più veloce di ogni sessione."""
+    ratios = []
+    for laps in frames:
+        laps = laps[laps['PitInTime'].isna() & laps['PitOutTime'].isna() & laps['TrackStatus'].eq('1')]
+        # Secondi float32 come nella tabella compatta dei giri
+        seconds = laps['LapTime'].dt.total_seconds().to_numpy().astype(np.float32).astype(np.float64)
+        ratios.append(laps[['Driver', 'Compound']].assign(Ratio=seconds / seconds.min()))
+    combined = pd.concat(ratios)
+    combined = combined[combined['Ratio'] < BIN_EDGES[-1]]
+    return {key: np.histogram(group['Ratio'], bins=BIN_EDGES)[0]
+            for key, group in combined.groupby(['Driver', 'Compound'])}
+
+
+def test_merged_histograms_match_direct_histogram():
+    # Piloti diversi tra le due sessioni: i codici delle categorie non coincidono
+    first = _laps(['ALB', 'HAM', 'VER'], seed=1)
+    second = _laps(['BOT', 'HAM', 'NOR', 'VER'], seed=2)
+
+    total = {}
+    for laps in (first, second):
+        merge_summaries(total, summarize_laps(laps))
+
+    expected = _expected([first, second])
+    assert set(total) == set(expected)
+    for key, counts in expected.items():
+        np.testing.assert_array_equal(total[key], counts, err_msg=str(key))
+
+
+def test_empty_laps_give_empty_summary():
+    assert summarize_laps(_laps(['VER'], seed=0).iloc[:0]) == {}
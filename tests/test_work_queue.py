@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pytest
+
+from f1_analyzer import work_queue
+from f1_analyzer.work_queue import WorkQueue, run_unit
+
+LEASE_TIMEOUT_S = 1.0
+
+
+def _units(n, analysis='box-plot'):
+    return [(2024, f"Event {i}", 'Race', analysis) for i in range(n)]
+
+
+def _queue(root):
+    return WorkQueue(root, lease_timeout=LEASE_TIMEOUT_S, max_attempts=3, retry_delay=0)
+
+
+def _worker(root, crash_events):
+    """
+    Worker di prova con lo stesso ciclo di run_worker: le unità degli eventi in
+    `crash_events` al primo tentativo restano in leased/ senza heartbeat, come
+    se il processo fosse morto, e vengono riprese dopo la scadenza del lease.
+    """
+    queue = _queue(root)
+    claims = []
+    while True:
+        queue.recover_expired()
+        claimed = queue.claim(f"worker-{os.getpid()}")
+        if claimed is None:
+            counts = queue.counts()
+            if not counts['pending'] and not counts['leased']:
+                return claims
+            time.sleep(0.05)
+            continue
+        uid, unit = claimed
+        claims.append((uid, unit['attempts']))
+        if unit['event'] in crash_events and unit['attempts'] == 1:
+            continue
+        queue.complete(uid, unit)
+
+
+def test_workers_share_the_queue(tmp_path):
+    root = str(tmp_path / 'queue')
+    queue = _queue(root)
+    units = _units(40)
+    assert queue.enqueue(units) == 40
+    crash_events = ('Event 3', 'Event 17')
+
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(3) as pool:
+        results = pool.starmap(_worker, [(root, crash_events)] * 3)
+
+    claims = [claim for result in results for claim in result]
+    first = [uid for uid, attempts in claims if attempts == 1]
+    # Ogni unità è aggiudicata una sola volta per tentativo
+    assert len(first) == len(set(first)) == 40
+    retried = sorted(uid for uid, attempts in claims if attempts > 1)
+    assert retried == sorted(work_queue.unit_id(*unit) for unit in units if unit[1] in crash_events)
+    assert queue.counts() == {'pending': 0, 'leased': 0, 'done': 40, 'failed': 0}
+
+
+def test_claim_restarts_the_lease(tmp_path):
+    queue = _queue(str(tmp_path))
+    queue.enqueue(_units(1))
+    uid = work_queue.unit_id(*_units(1)[0])
+    # mtime vecchio in pending/ (unità pronta da tempo): dopo il claim il lease non è scaduto
+    old = time.time() - 10 * LEASE_TIMEOUT_S
+    os.utime(queue._path('pending', uid), (old, old))
+    assert queue.claim('w1')[0] == uid
+    assert queue.recover_expired() == 0
+    assert queue.state_of(uid) == 'leased'
+
+
+def test_expired_lease_stays_with_the_new_owner(tmp_path):
+    queue = _queue(str(tmp_path))
+    queue.enqueue(_units(1))
+    uid, stale = queue.claim('w1')
+    time.sleep(LEASE_TIMEOUT_S + 0.1)
+    assert queue.recover_expired() == 1
+    uid, unit = queue.claim('w2')
+    assert unit['attempts'] == 2
+    # Il primo worker si risveglia: non può più chiudere né rinnovare l'unità
+    assert not queue.heartbeat(uid, stale)
+    assert not queue.complete(uid, stale)
+    assert not queue.fail(uid, stale, 'errore')
+    assert queue.state_of(uid) == 'leased'
+    assert queue.complete(uid, unit)
+    assert queue.counts() == {'pending': 0, 'leased': 0, 'done': 1, 'failed': 0}
+
+
+def test_interrupted_recovery_is_recovered_again(tmp_path):
+    queue = _queue(str(tmp_path))
+    queue.enqueue(_units(1))
+    uid, unit = queue.claim('w1')
+    # Chi recupera il lease lo rinomina con un nuovo token e si ferma prima di rimetterlo in coda
+    path = queue._lease_path(uid, 'recovering')
+    os.rename(queue._lease_path(uid, unit['lease']), path)
+    old = queue.now() - 10 * LEASE_TIMEOUT_S
+    os.utime(path, (old, old))
+    assert queue.counts()['leased'] == 1
+    assert queue.recover_expired() == 1
+    assert queue.claim('w2')[1]['attempts'] == 2
+
+
+def test_expired_lease_goes_to_failed_after_max_attempts(tmp_path):
+    queue = _queue(str(tmp_path))
+    queue.enqueue(_units(1))
+    for attempt in range(1, 4):
+        uid, unit = queue.claim('w1')
+        assert unit['attempts'] == attempt
+        time.sleep(LEASE_TIMEOUT_S + 0.1)
+        assert queue.recover_expired() == 1
+    assert queue.claim('w1') is None
+    assert queue.counts()['failed'] == 1
+    assert 'Lease scaduto' in queue.failures()[uid]
+
+
+def error_plot(session):
+    fig, ax = plt.subplots()
+    ax.text(0.5, 0.5, "Errore nella creazione del grafico:\nNessun giro")
+    fig.analysis_error = "Nessun giro"
+    return fig
+
+
+class _Loader:
+    def get(self, year, event_name, session_name):
+        return None
+
+
+def test_error_figure_fails_the_unit(tmp_path, monkeypatch):
+    monkeypatch.setitem(work_queue.ANALYSES, 'error', (__name__, 'error_plot'))
+    unit = {'year': 2024, 'event': 'Event 0', 'session': 'Race', 'analysis': 'error'}
+    with pytest.raises(RuntimeError, match="Nessun giro"):
+        run_unit(unit, _Loader(), reports_dir=str(tmp_path))
+    assert not any(files for _, _, files in os.walk(tmp_path))
+    assert not plt.get_fignums()